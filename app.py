@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 from PySide6.QtWidgets import QApplication
 
+from core import LOG_BUFFER
 from ui import MainWindow, Theme
 
+# The file log rolls over at this size, keeping a few older files beside it.
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
 
 def configure_logging() -> Path:
     log_dir = Path.home() / ".log-trimmer" / "logs"
@@ -17,8 +24,9 @@ def configure_logging() -> Path:
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
         handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
+            RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"),
             logging.StreamHandler(),
+            LOG_BUFFER,
         ],
     )
     return log_file
@@ -35,4 +43,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Lets the spawned scan workers of a frozen (PyInstaller) build run instead of opening the app again.
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,50 @@
+"""Compare the legacy two-pass log open against the single-pass scan.
+
+Usage: python -m benchmarks.bench_open path/to/log.BIN [--repeat N] [--dfreader]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from core.log_parser import DataFlashParser
+
+
+def _two_pass(parser: DataFlashParser) -> None:
+    parser.summarize()
+    parser.collect_channels()
+
+
+def _single_pass(parser: DataFlashParser) -> None:
+    parser.load()
+
+
+def _best_of(fn, parser: DataFlashParser, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(parser)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dfreader", action="store_true", help="decode through pymavlink instead of the raw scanner")
+    args = parser.parse_args()
+
+    log_parser = DataFlashParser(args.log, raw_scanner=not args.dfreader)
+    size_mb = args.log.stat().st_size / (1024 * 1024)
+    two_pass = _best_of(_two_pass, log_parser, args.repeat)
+    single_pass = _best_of(_single_pass, log_parser, args.repeat)
+    print(f"log: {args.log} ({size_mb:.1f} MB, {'DFReader' if args.dfreader else 'raw scanner'})")
+    print(f"summarize + collect_channels: {two_pass:.3f}s")
+    print(f"load (single pass):           {single_pass:.3f}s")
+    print(f"speedup:                      {two_pass / single_pass:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
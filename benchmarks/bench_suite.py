@@ -0,0 +1,212 @@
+"""Throughput and peak-memory benchmarks of the core parsing and export paths.
+
+Usage: python -m benchmarks.bench_suite [LOG] [--size-mb N] [--repeat N] [--only NAME...]
+                                        [--save results.json] [--compare baseline.json]
+
+Without LOG a synthetic log of ``--size-mb`` is generated. Every benchmark
+runs in a fresh process so its peak RSS is its own. ``--save`` writes the
+results as a baseline; ``--compare`` prints the change against one and exits
+with status 1 when any benchmark got slower than ``--tolerance``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from benchmarks.synthetic import seconds_for_size, write_log
+from core.exporter import DataFlashExporter
+from core.log_parser import DataFlashParser
+from core.segments import Segment, normalize_segments
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_VERSION = 1
+SEGMENT_COUNT = 200_000
+PLOT_CHANNELS = ("BARO.Alt", "GPS.Spd", "ATT.Roll")
+
+
+def _iter_messages(path: Path) -> int:
+    return sum(1 for _ in DataFlashParser(path).iter_messages())
+
+
+def _iter_records(path: Path) -> int:
+    return sum(1 for _ in DataFlashParser(path).iter_records())
+
+
+def _summarize(path: Path) -> int:
+    return DataFlashParser(path).summarize().message_count
+
+
+def _collect_series(path: Path) -> int:
+    channels = DataFlashParser(path).collect_channels()
+    for channel in PLOT_CHANNELS:
+        if channel in channels:
+            channels.series(channel)
+    return sum(len(channels.times(name)) for name in channels.message_types())
+
+
+def _build_index(path: Path) -> int:
+    return DataFlashParser(path).build_index().message_count
+
+
+def _load(path: Path) -> int:
+    return DataFlashParser(path).load().info.message_count
+
+
+def _export(path: Path, byte_ranges: bool = True) -> Tuple[int, float]:
+    index = DataFlashParser(path).build_index()
+    span = index.end - index.start
+    cuts = [Segment(index.start + span * k / 10, index.start + span * (k + 0.5) / 10) for k in range(1, 9, 2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        DataFlashExporter(path).export(Path(tmp) / "out.bin", cuts, index=index, byte_ranges=byte_ranges)
+        return index.message_count, time.perf_counter() - started
+
+
+def _export_streaming(path: Path) -> Tuple[int, float]:
+    return _export(path, byte_ranges=False)
+
+
+def _normalize_segments(path: Path) -> Tuple[int, float]:
+    rng = random.Random(42)
+    segments = []
+    for _ in range(SEGMENT_COUNT):
+        start = rng.uniform(0.0, 10_000.0)
+        segments.append(Segment(start, start + rng.uniform(0.01, 5.0)))
+    started = time.perf_counter()
+    normalize_segments(segments)
+    return SEGMENT_COUNT, time.perf_counter() - started
+
+
+# name -> benchmark returning the items it processed, or ``(items, seconds)``
+# when only part of its work (not the setup) should be timed.
+BENCHMARKS: Dict[str, Callable[[Path], Union[int, Tuple[int, float]]]] = {
+    "iter_messages": _iter_messages,
+    "iter_records": _iter_records,
+    "summarize": _summarize,
+    "collect_series": _collect_series,
+    "build_index": _build_index,
+    "load": _load,
+    "export": _export,
+    "export_streaming": _export_streaming,
+    "normalize_segments": _normalize_segments,
+}
+# Benchmarks that do not read the log, so MB/s is meaningless for them.
+NO_IO = {"normalize_segments"}
+
+
+def _rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(name: str, path: Path, repeat: int) -> Dict[str, object]:
+    benchmark = BENCHMARKS[name]
+    rss_before = _rss_mb()
+    best = float("inf")
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outcome = benchmark(path)
+        elapsed = time.perf_counter() - started
+        items, elapsed = outcome if isinstance(outcome, tuple) else (outcome, elapsed)
+        best = min(best, elapsed)
+    size = 0 if name in NO_IO else path.stat().st_size
+    return {
+        "seconds": best,
+        "items": items,
+        "items_per_s": items / best if best > 0 else 0.0,
+        "mb_per_s": size / (1024 * 1024) / best if best > 0 and size else None,
+        "peak_rss_mb": _rss_mb(),
+        "start_rss_mb": rss_before,
+    }
+
+
+def run_suite(path: Path, names: List[str], repeat: int) -> Dict[str, Dict[str, object]]:
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(_run, name, path, repeat).result()
+        _print_row(name, results[name])
+    return results
+
+
+def _print_row(name: str, result: Dict[str, object], baseline: Optional[Dict[str, object]] = None) -> None:
+    mb_per_s = f"{result['mb_per_s']:8.1f} MB/s" if result["mb_per_s"] else " " * 13
+    rss = f"{result['peak_rss_mb']:7.0f} MB peak" if result["peak_rss_mb"] is not None else ""
+    line = f"{name:<20}{result['seconds']:9.3f}s {result['items_per_s']:>12,.0f}/s {mb_per_s} {rss}"
+    if baseline is not None:
+        line += f"  {result['seconds'] / baseline['seconds']:6.2f}x time"
+    print(line, flush=True)
+
+
+def compare(results: Dict[str, Dict[str, object]], baseline_path: Path, tolerance: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("version") != BASELINE_VERSION:
+        print(f"{baseline_path}: unsupported baseline version", file=sys.stderr)
+        return 2
+    print(f"\ncompared with {baseline_path} ({baseline.get('log', {}).get('size_bytes', 0) / (1024 * 1024):.1f} MB log)")
+    regressions = []
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        _print_row(name, result, reference)
+        if result["seconds"] > reference["seconds"] * (1.0 + tolerance):
+            regressions.append(name)
+    if regressions:
+        print(f"slower than baseline by more than {tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", type=Path, nargs="?", help="log to benchmark (default: a synthetic one)")
+    parser.add_argument("--size-mb", type=float, default=32.0, help="size of the synthetic log")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--save", type=Path, help="write results to this baseline file")
+    parser.add_argument("--compare", type=Path, help="baseline file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.log
+        if path is None:
+            path = write_log(Path(tmp) / "synthetic.bin", seconds_for_size(int(args.size_mb * 1024 * 1024)))
+        size = path.stat().st_size
+        print(f"log: {path} ({size / (1024 * 1024):.1f} MB)")
+        results = run_suite(path, args.only or list(BENCHMARKS), args.repeat)
+
+    if args.save:
+        payload = {
+            "version": BASELINE_VERSION,
+            "log": {"path": str(args.log) if args.log else None, "size_bytes": size},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        args.save.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"saved {args.save}")
+    if args.compare:
+        sys.exit(compare(results, args.compare, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
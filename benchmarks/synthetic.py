@@ -0,0 +1,173 @@
+"""Deterministic synthetic ArduPilot DataFlash logs for tests and benchmarks.
+
+Usage: python -m benchmarks.synthetic OUT.BIN [--size-mb N | --seconds S] [--imu-hz HZ] [--gps-hz HZ] ...
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import struct
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import BinaryIO, Dict, Tuple
+
+HEADER = b"\xa3\x95"
+FMT_TYPE = 128
+
+# name -> (type id, DataFlash format, columns)
+MESSAGE_FORMATS = {
+    "PARM": (129, "QNf", "TimeUS,Name,Value"),
+    "MODE": (130, "QMBB", "TimeUS,Mode,ModeNum,Rsn"),
+    "IMU": (131, "QBffffff", "TimeUS,I,GyrX,GyrY,GyrZ,AccX,AccY,AccZ"),
+    "ATT": (132, "QccC", "TimeUS,Roll,Pitch,Yaw"),
+    "BARO": (133, "QBff", "TimeUS,I,Alt,Press"),
+    "GPS": (134, "QBIHBLLff", "TimeUS,Status,GMS,GWk,NSats,Lat,Lng,Alt,Spd"),
+    "RCOU": (135, "QHHHH", "TimeUS,C1,C2,C3,C4"),
+}
+# Only written when a log has a firmware banner (see ``MessageMix.firmware``).
+MSG_FORMAT = (136, "QZ", "TimeUS,Message")
+
+_STRUCT_CHARS = {
+    "B": "B",
+    "C": "H",
+    "H": "H",
+    "I": "I",
+    "L": "i",
+    "M": "B",
+    "N": "16s",
+    "Q": "Q",
+    "Z": "64s",
+    "c": "h",
+    "f": "f",
+    "n": "4s",
+}
+
+PARAM_NAMES = (b"ARMING_CHECK", b"BATT_CAPACITY", b"WPNAV_SPEED")
+START_US = 1_000_000
+# Generated bytes buffered before each write to the output file.
+WRITE_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class MessageMix:
+    """Message rates of a synthetic log.
+
+    IMU drives the clock: every other type is written on every
+    ``imu_hz / rate``-th IMU sample, so rates should divide ``imu_hz``.
+    A rate of 0 leaves the type out.
+    """
+
+    imu_hz: float = 50.0
+    att_hz: float = 10.0
+    baro_hz: float = 10.0
+    rcou_hz: float = 10.0
+    gps_hz: float = 5.0
+    params: int = 3
+    mode_changes: int = 1
+    # Text of the leading MSG record, e.g. "ArduCopter V4.5.1"; empty leaves MSG out.
+    firmware: str = ""
+
+    def every(self, rate: float) -> int:
+        return max(1, round(self.imu_hz / rate)) if rate > 0 else 0
+
+
+def _struct_for(fmt: str) -> struct.Struct:
+    return struct.Struct("<" + "".join(_STRUCT_CHARS[c] for c in fmt))
+
+
+def _fmt_record(type_id: int, name: str, fmt: str, columns: str) -> bytes:
+    length = 3 + _struct_for(fmt).size
+    body = struct.pack("<BB4s16s64s", type_id, length, name.encode(), fmt.encode(), columns.encode())
+    return HEADER + bytes([FMT_TYPE]) + body
+
+
+def _record_sizes() -> Dict[str, int]:
+    return {name: 3 + _struct_for(fmt).size for name, (_, fmt, _) in MESSAGE_FORMATS.items()}
+
+
+def seconds_for_size(size_bytes: int, mix: MessageMix = MessageMix()) -> float:
+    """Return the duration whose log under ``mix`` is about ``size_bytes`` long."""
+    sizes = _record_sizes()
+    per_tick = sizes["IMU"]
+    for name, rate in (("ATT", mix.att_hz), ("BARO", mix.baro_hz), ("RCOU", mix.rcou_hz), ("GPS", mix.gps_hz)):
+        every = mix.every(rate)
+        if every:
+            per_tick += sizes[name] / every
+    return max(size_bytes / (per_tick * mix.imu_hz), 1.0 / mix.imu_hz)
+
+
+def write_log(path: Path, seconds: float = 20.0, mix: MessageMix = MessageMix()) -> Path:
+    """Write a deterministic log of ``seconds`` of flight at the rates of ``mix``."""
+    with open(path, "wb") as fp:
+        _write(fp, seconds, mix)
+    return path
+
+
+def _write(fp: BinaryIO, seconds: float, mix: MessageMix) -> None:
+    out = bytearray()
+    out += _fmt_record(FMT_TYPE, "FMT", "BBnNZ", "Type,Length,Name,Format,Columns")
+    structs: Dict[str, Tuple[int, struct.Struct]] = {}
+    for name, (type_id, fmt, columns) in MESSAGE_FORMATS.items():
+        out += _fmt_record(type_id, name, fmt, columns)
+        structs[name] = (type_id, _struct_for(fmt))
+
+    def emit(name: str, *values) -> None:
+        type_id, packer = structs[name]
+        out.extend(HEADER + bytes([type_id]) + packer.pack(*values))
+
+    if mix.firmware:
+        out += _fmt_record(MSG_FORMAT[0], "MSG", *MSG_FORMAT[1:])
+        structs["MSG"] = (MSG_FORMAT[0], _struct_for(MSG_FORMAT[1]))
+        emit("MSG", 1_000, mix.firmware.encode())
+    for index in range(mix.params):
+        name = PARAM_NAMES[index] if index < len(PARAM_NAMES) else b"PARAM_%d" % index
+        emit("PARM", 1_000 + index, name, float(index + 1))
+
+    imu_hz = int(mix.imu_hz)
+    step_us = 1_000_000 // imu_hz
+    ticks = int(seconds * imu_hz)
+    att, baro, rcou, gps = (mix.every(rate) for rate in (mix.att_hz, mix.baro_hz, mix.rcou_hz, mix.gps_hz))
+    mode_ticks: Dict[int, int] = {}
+    for change in range(mix.mode_changes + 1):
+        mode_ticks.setdefault(ticks * change // (mix.mode_changes + 1), 10 + change)
+    for tick in range(ticks):
+        now = START_US + tick * step_us
+        phase = tick / imu_hz
+        mode = mode_ticks.get(tick)
+        if mode is not None:
+            emit("MODE", now, mode, mode, 1)
+        emit("IMU", now, 0, 0.01, -0.02, 0.03, 0.1, 0.2, -9.8)
+        if att and tick % att == 0:
+            emit("ATT", now, int(math.sin(phase) * 1000), int(math.cos(phase) * 500), int(phase * 100) % 36000)
+        if baro and tick % baro == 0:
+            emit("BARO", now, 0, 50.0 * math.sin(phase / seconds * math.pi), 1013.0)
+        if rcou and tick % rcou == 0:
+            emit("RCOU", now, 1500, 1500, 1100 + tick % 800, 1500)
+        if gps and tick % gps == 0:
+            gps_ms = 200_000_000 + now // 1000
+            emit("GPS", now, 3, gps_ms, 2300, 12, 473_977_420, 85_455_940, 500.0, 12.0 + math.sin(phase))
+        if len(out) >= WRITE_CHUNK:
+            fp.write(out)
+            out.clear()
+    fp.write(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path)
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument("--size-mb", type=float, help="approximate output size")
+    length.add_argument("--seconds", type=float, default=60.0, help="flight duration")
+    defaults = MessageMix()
+    for option in fields(MessageMix):
+        default = getattr(defaults, option.name)
+        parser.add_argument(f"--{option.name.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args()
+    mix = MessageMix(**{option.name: getattr(args, option.name) for option in fields(MessageMix)})
+    seconds = seconds_for_size(int(args.size_mb * 1024 * 1024), mix) if args.size_mb else args.seconds
+    write_log(args.output, seconds, mix)
+    print(f"wrote {args.output} ({args.output.stat().st_size / (1024 * 1024):.1f} MB, {seconds:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
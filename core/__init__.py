@@ -1,15 +1,101 @@
-from .exporter import DataFlashExporter
-from .log_parser import DataFlashParser, LogInfo, LogIndex, TimeSeries
-from .segments import Segment, normalize_segments, remove_segments, validate_segments
-
-__all__ = [
-    "DataFlashExporter",
-    "DataFlashParser",
-    "LogInfo",
-    "LogIndex",
-    "TimeSeries",
-    "Segment",
-    "normalize_segments",
-    "remove_segments",
-    "validate_segments",
-]
+"""Log parsing, indexing and export for DataFlash logs.
+
+Names are resolved on first access so ``import core`` stays cheap: NumPy is
+only loaded with the channel and pyramid modules, pymavlink only when a log
+falls back to DFReader.
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+_EXPORTS = {
+    "BinnedChannelStore": ".channels",
+    "ChannelStore": ".channels",
+    "TimeSeries": ".channels",
+    "BlockReader": ".compressed",
+    "BlockWriter": ".compressed",
+    "CancelToken": ".exporter",
+    "DataFlashExporter": ".exporter",
+    "ExportCancelled": ".exporter",
+    "ExportProgress": ".exporter",
+    "SplitOutput": ".exporter",
+    "TypePolicy": ".exporter",
+    "IndexCache": ".index_cache",
+    "DataFlashParser": ".log_parser",
+    "LoadBatch": ".log_parser",
+    "LoadedLog": ".log_parser",
+    "LogFollower": ".log_parser",
+    "LogIndex": ".log_parser",
+    "LogInfo": ".log_parser",
+    "LogScan": ".log_parser",
+    "MemoryPlan": ".log_parser",
+    "ScanSubscriber": ".log_parser",
+    "LOG_BUFFER": ".logbuffer",
+    "LogBuffer": ".logbuffer",
+    "LogEntry": ".logbuffer",
+    "tail_lines": ".logbuffer",
+    "METRICS": ".metrics",
+    "MetricsLog": ".metrics",
+    "RunMetrics": ".metrics",
+    "parallel_load": ".parallel_scan",
+    "LodSlice": ".pyramid",
+    "MinMaxBins": ".pyramid",
+    "MinMaxPyramid": ".pyramid",
+    "Query": ".query",
+    "QueryError": ".query",
+    "parse_query": ".query",
+    "Segment": ".segments",
+    "SegmentSet": ".segments",
+    "normalize_segments": ".segments",
+    "remove_segments": ".segments",
+    "validate_segments": ".segments",
+    "TypeStats": ".type_stats",
+    "TypeTable": ".type_stats",
+}
+
+__all__ = sorted(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .channels import BinnedChannelStore, ChannelStore, TimeSeries
+    from .compressed import BlockReader, BlockWriter
+    from .exporter import (
+        CancelToken,
+        DataFlashExporter,
+        ExportCancelled,
+        ExportProgress,
+        SplitOutput,
+        TypePolicy,
+    )
+    from .index_cache import IndexCache
+    from .log_parser import (
+        DataFlashParser,
+        LoadBatch,
+        LoadedLog,
+        LogFollower,
+        LogIndex,
+        LogInfo,
+        LogScan,
+        MemoryPlan,
+        ScanSubscriber,
+    )
+    from .logbuffer import LOG_BUFFER, LogBuffer, LogEntry, tail_lines
+    from .metrics import METRICS, MetricsLog, RunMetrics
+    from .parallel_scan import parallel_load
+    from .pyramid import LodSlice, MinMaxBins, MinMaxPyramid
+    from .query import Query, QueryError, parse_query
+    from .segments import Segment, SegmentSet, normalize_segments, remove_segments, validate_segments
+    from .type_stats import TypeStats, TypeTable
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,495 @@
+from __future__ import annotations
+
+import logging
+import math
+import mmap
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .dataflash import HEADER_TYPES, DataFlashScanner, MessageFormat, RecordView
+from .metrics import METRICS
+from .pyramid import MinMaxBins, MinMaxPyramid
+
+logger = logging.getLogger(__name__)
+
+# Records buffered in Python arrays before they are copied into NumPy columns.
+BATCH_SIZE = 4096
+# Records gathered from the mapped file per NumPy fancy-indexing step.
+GATHER_CHUNK = 1 << 20
+# Bins per channel of a BinnedChannelStore, before its budget shrinks them, and the floor it stops at.
+DEFAULT_BINS = 8192
+MIN_BINS = 256
+# Bytes one min/max bin costs: its time, minimum and maximum.
+BIN_BYTES = 24
+# Span of the file one page fault can map in: fault-around and large page-cache
+# folios reach well past the faulting page, up to a 2 MiB huge page.
+FAULT_WINDOW = 2 * 1024 * 1024
+
+NUMERIC_CHARS = frozenset("bBhHiIfdqQcCeELMg")
+SCALED_CHARS = {"c": 100.0, "C": 100.0, "e": 100.0, "E": 100.0, "L": 1.0e7}
+STRUCT_TO_DTYPE = {
+    "b": "i1",
+    "B": "u1",
+    "h": "<i2",
+    "H": "<u2",
+    "i": "<i4",
+    "I": "<u4",
+    "e": "<f2",
+    "f": "<f4",
+    "d": "<f8",
+    "q": "<i8",
+    "Q": "<u8",
+}
+
+RecordSource = Callable[[], Iterable[Tuple[int, float, object]]]
+
+
+@dataclass(eq=False)
+class TimeSeries:
+    name: str
+    times: np.ndarray
+    values: np.ndarray
+
+
+class GrowableArray:
+    """Contiguous NumPy buffer that grows geometrically as batches are appended."""
+
+    def __init__(self, dtype, capacity: int = BATCH_SIZE) -> None:
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, values) -> None:
+        batch = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(batch)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = batch
+        self._size = needed
+
+    def view(self) -> np.ndarray:
+        return self._data[: self._size]
+
+
+class MessageColumns:
+    """Timestamps and record offsets of one message type, plus decoded fields.
+
+    ``fmt`` is the raw scanner's :class:`MessageFormat`; it is ``None`` when
+    the log was read through DFReader, in which case ``offsets`` stays empty
+    and fields are decoded by rescanning the log.
+    """
+
+    def __init__(self, name: str, columns: Sequence[str], chars: str, fmt: Optional[MessageFormat]) -> None:
+        self.name = name
+        self.format = chars
+        self.fmt = fmt
+        self.fields = [column for column, char in zip(columns, chars) if char in NUMERIC_CHARS]
+        self._times = GrowableArray(np.float64)
+        self._offsets = GrowableArray(np.int64)
+        self._pending_times = array("d")
+        self._pending_offsets = array("q")
+        self.values: Dict[str, np.ndarray] = {}
+        self._decoded: Dict[str, GrowableArray] = {}
+
+    def __len__(self) -> int:
+        return len(self._times) + len(self._pending_times)
+
+    def append(self, timestamp: float, offset: int) -> None:
+        self._pending_times.append(timestamp)
+        if offset >= 0:
+            self._pending_offsets.append(offset)
+        if len(self._pending_times) >= BATCH_SIZE:
+            self.flush()
+
+    def extend(self, times: np.ndarray, offsets: np.ndarray) -> None:
+        """Append records that are already columnar, e.g. from a parallel scan."""
+        self.flush()
+        self._times.extend(times)
+        self._offsets.extend(offsets)
+
+    def flush(self) -> None:
+        if self._pending_times:
+            self._times.extend(self._pending_times)
+            self._pending_times = array("d")
+        if self._pending_offsets:
+            self._offsets.extend(self._pending_offsets)
+            self._pending_offsets = array("q")
+
+    def add_values(self, field: str, values: np.ndarray) -> None:
+        """Append decoded ``values`` of ``field`` to those decoded before."""
+        decoded = self._decoded.get(field)
+        if decoded is None:
+            decoded = self._decoded[field] = GrowableArray(values.dtype, max(len(values), 1))
+        decoded.extend(values)
+        self.values[field] = decoded.view()
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times.view()
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets.view()
+
+
+class ChannelStore:
+    """Columnar store of every numeric message field in a log.
+
+    The scan only records, per message type, one ``float64`` time array and
+    the byte offset of each record. Field values are decoded the first time
+    a channel is requested, straight from the mapped file with vectorized
+    gathers, and kept as typed arrays. Channels are named ``"TYPE.Field"``.
+    """
+
+    def __init__(self, path: Path, reader: Optional[RecordSource] = None) -> None:
+        self.path = path
+        self._reader = reader
+        self._types: Dict[str, MessageColumns] = {}
+        self._pyramids: Dict[str, MinMaxPyramid] = {}
+
+    def add_type(self, columns: MessageColumns) -> None:
+        self._types[columns.name] = columns
+
+    def get_type(self, name: str) -> Optional[MessageColumns]:
+        return self._types.get(name)
+
+    def flush(self) -> None:
+        for columns in self._types.values():
+            columns.flush()
+
+    def message_types(self) -> List[str]:
+        return sorted(name for name in self._types if name not in HEADER_TYPES)
+
+    def all_types(self) -> List[str]:
+        """Every message type, header types included."""
+        return sorted(self._types)
+
+    def fields(self, msg_type: str) -> List[str]:
+        columns = self._types.get(msg_type)
+        return list(columns.fields) if columns else []
+
+    def channels(self) -> List[str]:
+        return [f"{msg_type}.{field}" for msg_type in self.message_types() for field in self.fields(msg_type)]
+
+    def __contains__(self, channel: str) -> bool:
+        msg_type, _, field = channel.partition(".")
+        return field in self.fields(msg_type)
+
+    def times(self, msg_type: str) -> np.ndarray:
+        return self._types[msg_type].times
+
+    def values(self, msg_type: str, field: str) -> np.ndarray:
+        """Decoded ``field`` of every ``msg_type`` record.
+
+        Records appended since the last call (see :class:`LogFollower`)
+        are decoded on their own and added to the cached values.
+        """
+        columns = self._types[msg_type]
+        if field not in columns.fields:
+            raise KeyError(f"{msg_type}.{field}")
+        decoded = len(columns.values.get(field, ()))
+        if field not in columns.values or (decoded < len(columns.times) and columns.fmt is not None):
+            with METRICS.run("series", self.path, f"{msg_type}.{field}") as metrics:
+                if columns.fmt is not None and len(columns.offsets) == len(columns.times):
+                    with metrics.stage("gather"):
+                        columns.add_values(field, self._gather(columns, field, columns.offsets[decoded:]))
+                    metrics.bytes = (len(columns.times) - decoded) * 8
+                else:
+                    with metrics.stage("rescan"):
+                        self._rescan(columns)
+                    metrics.bytes = self.path.stat().st_size
+                metrics.messages = len(columns.times) - decoded
+                metrics.type_counts = {msg_type: metrics.messages}
+        return columns.values[field]
+
+    def decode_slice(self, msg_type: str, field: str, start: int, stop: int) -> TimeSeries:
+        """Decode records ``start:stop`` of one field without caching them.
+
+        Used while the scan is still appending, to hand out chunks of a
+        growing channel; requires record offsets (the raw scanner).
+        """
+        columns = self._types[msg_type]
+        if field not in columns.fields:
+            raise KeyError(f"{msg_type}.{field}")
+        if columns.fmt is None:
+            raise RuntimeError(f"{msg_type} has no record offsets to decode from")
+        columns.flush()
+        times = columns.times[start:stop].copy()
+        return TimeSeries(f"{msg_type}.{field}", times, self._gather(columns, field, columns.offsets[start:stop]))
+
+    def series(self, channel: str) -> TimeSeries:
+        msg_type, _, field = channel.partition(".")
+        return TimeSeries(channel, self.times(msg_type), self.values(msg_type, field))
+
+    def pyramid(self, channel: str) -> MinMaxPyramid:
+        """Return the level-of-detail pyramid of ``channel``, building it on first use.
+
+        A pyramid handed out earlier is extended in place once its channel has grown.
+        """
+        pyramid = self._pyramids.get(channel)
+        if pyramid is None:
+            series = self.series(channel)
+            pyramid = MinMaxPyramid(series.times, series.values)
+            self._pyramids[channel] = pyramid
+        elif len(pyramid.values) < len(self.times(channel.partition(".")[0])):
+            series = self.series(channel)
+            pyramid.extend(series.times, series.values)
+        return pyramid
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for columns in self._types.values():
+            total += columns.times.nbytes + columns.offsets.nbytes
+            total += sum(values.nbytes for values in columns.values.values())
+        total += sum(pyramid.memory_bytes() for pyramid in self._pyramids.values())
+        return total
+
+    def _gather(self, columns: MessageColumns, field: str, offsets: Optional[np.ndarray] = None) -> np.ndarray:
+        if offsets is None:
+            offsets = columns.offsets
+        if not len(offsets):
+            return gather_field(np.empty(0, dtype=np.uint8), columns.fmt, field, offsets)
+        with open(self.path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            raw = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                return gather_field(raw, columns.fmt, field, offsets)
+            finally:
+                del raw
+
+    def _rescan(self, columns: MessageColumns) -> None:
+        if self._reader is None:
+            raise RuntimeError(f"No record source to decode {columns.name}")
+        collected: Dict[str, array] = {field: array("d") for field in columns.fields}
+        for _, _, msg in self._reader():
+            if msg.get_type() == columns.name:
+                for field, values in collected.items():
+                    values.append(float(getattr(msg, field)))
+        for field, values in collected.items():
+            columns.values[field] = np.frombuffer(values, dtype=np.float64).copy()
+
+
+class BinnedColumns:
+    """Min/max bins of every numeric field of one message type, filled while the scan streams.
+
+    Records are buffered ``BATCH_SIZE`` at a time; each batch is decoded
+    (gathered from the mapped file when the records have offsets in it),
+    folded into the bins and dropped.
+    """
+
+    def __init__(self, store: "BinnedChannelStore", fmt, mapped: bool) -> None:
+        self.store = store
+        self.name = fmt.name
+        self.format = fmt.format
+        self.fmt = fmt if mapped else None
+        self.fields = [column for column, char in zip(fmt.columns, fmt.format) if char in NUMERIC_CHARS]
+        self.bins = {field: MinMaxBins(store.capacity) for field in self.fields}
+        self.count = 0
+        # Time range of the binned records, for the load's TypeTable.
+        self.first_time = math.inf
+        self.last_time = -math.inf
+        self._times = array("d")
+        self._offsets = array("q")
+        self._rows = {field: array("d") for field in self.fields}
+
+    def __len__(self) -> int:
+        return self.count + len(self._times)
+
+    def append(self, timestamp: float, msg) -> None:
+        self._times.append(timestamp)
+        if self.fmt is not None:
+            self._offsets.append(msg.offset)
+        else:
+            values = msg.decode(self.fields) if isinstance(msg, RecordView) else [getattr(msg, f) for f in self.fields]
+            for column, value in zip(self._rows.values(), values):
+                column.append(float(value))
+        if len(self._times) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._times:
+            return
+        times = np.frombuffer(self._times, dtype=np.float64)
+        self.first_time = min(self.first_time, float(times.min()))
+        self.last_time = max(self.last_time, float(times.max()))
+        if self.fmt is not None:
+            offsets = np.frombuffer(self._offsets, dtype=np.int64)
+            for field, bins in self.bins.items():
+                values = self.store.gather(self.fmt, field, offsets)
+                bins.append(times, values)
+                self.store.keep_streamed(self.name, field, times, values)
+            self.store.release(int(offsets[0]), int(offsets[-1]) + self.fmt.length)
+        else:
+            for field, bins in self.bins.items():
+                values = np.frombuffer(self._rows[field], dtype=np.float64)
+                bins.append(times, values)
+                self.store.keep_streamed(self.name, field, times, values)
+        self.count += len(times)
+        self._times = array("d")
+        self._offsets = array("q")
+        self._rows = {field: array("d") for field in self.fields}
+
+
+class BinnedChannelStore:
+    """Bounded-memory stand-in for :class:`ChannelStore` on logs too large to keep whole.
+
+    Every numeric field is reduced to :class:`MinMaxBins` as the scan
+    streams, so nothing kept grows with the log. All channels share
+    ``budget`` bytes: as message types appear, every channel's bin limit
+    shrinks to fit (down to ``MIN_BINS``). It answers the same queries as
+    :class:`ChannelStore`, but a series is its min/max envelope rather than
+    the raw samples, and nothing can be decoded again later. The raw
+    samples of channels passed to :meth:`stream` are held back for
+    :meth:`take_streamed` as their batches are binned.
+    """
+
+    def __init__(self, path: Path, budget: int, bins: int = DEFAULT_BINS) -> None:
+        self.path = path
+        self.budget = budget
+        self.capacity = bins
+        self._types: Dict[str, BinnedColumns] = {}
+        self._pyramids: Dict[str, MinMaxPyramid] = {}
+        self._channel_count = 0
+        self._source: Optional[DataFlashScanner] = None
+        self._view: Optional[memoryview] = None
+        self._raw: Optional[np.ndarray] = None
+        self._streamed: Dict[str, List[TimeSeries]] = {}
+
+    def stream(self, channels: Sequence[str]) -> None:
+        """Hold back the raw samples of ``channels`` from now on, until :meth:`take_streamed` collects them."""
+        self._streamed = {channel: [] for channel in channels}
+
+    def keep_streamed(self, msg_type: str, field: str, times: np.ndarray, values: np.ndarray) -> None:
+        pending = self._streamed.get(f"{msg_type}.{field}")
+        if pending is not None:
+            pending.append(TimeSeries(f"{msg_type}.{field}", times, values))
+
+    def take_streamed(self) -> Dict[str, TimeSeries]:
+        """Return and forget the samples held back since the last call, buffered batches included."""
+        for channel in self._streamed:
+            columns = self._types.get(channel.partition(".")[0])
+            if columns is not None:
+                columns.flush()
+        chunks = {}
+        for channel, pending in self._streamed.items():
+            if pending:
+                times = np.concatenate([chunk.times for chunk in pending])
+                chunks[channel] = TimeSeries(channel, times, np.concatenate([chunk.values for chunk in pending]))
+                pending.clear()
+        return chunks
+
+    def add_type(self, fmt, mapped: bool) -> BinnedColumns:
+        columns = BinnedColumns(self, fmt, mapped)
+        self._types[columns.name] = columns
+        self._channel_count += len(columns.fields)
+        fitting = max(self.budget // (BIN_BYTES * max(self._channel_count, 1)), MIN_BINS)
+        if fitting < self.capacity:
+            self.capacity = fitting
+            for other in self._types.values():
+                for bins in other.bins.values():
+                    bins.set_capacity(fitting)
+        return columns
+
+    def get_type(self, name: str) -> Optional[BinnedColumns]:
+        return self._types.get(name)
+
+    def all_types(self) -> List[str]:
+        """Every message type, header types included."""
+        return sorted(self._types)
+
+    def flush(self) -> None:
+        for columns in self._types.values():
+            columns.flush()
+
+    def close(self) -> None:
+        """Flush every type and unmap the file; the bins stay queryable."""
+        self.flush()
+        self._raw = None
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def gather(self, fmt: MessageFormat, field: str, offsets: np.ndarray) -> np.ndarray:
+        if self._raw is None:
+            self._source = DataFlashScanner(self.path)
+            self._view = self._source.span(0, self._source.size)
+            self._raw = np.frombuffer(self._view, dtype=np.uint8)
+        return gather_field(self._raw, fmt, field, offsets)
+
+    def release(self, start: int, end: int) -> None:
+        """Drop the pages a batch gathered from the resident set."""
+        if self._source is not None:
+            # Widened to the window the kernel may have mapped around the gathered records.
+            self._source.release(start - start % FAULT_WINDOW, end + FAULT_WINDOW)
+
+    def message_types(self) -> List[str]:
+        return sorted(name for name in self._types if name not in HEADER_TYPES)
+
+    def fields(self, msg_type: str) -> List[str]:
+        columns = self._types.get(msg_type)
+        return list(columns.fields) if columns else []
+
+    def channels(self) -> List[str]:
+        return [f"{msg_type}.{field}" for msg_type in self.message_types() for field in self.fields(msg_type)]
+
+    def __contains__(self, channel: str) -> bool:
+        msg_type, _, field = channel.partition(".")
+        return field in self.fields(msg_type)
+
+    def series(self, channel: str) -> TimeSeries:
+        msg_type, _, field = channel.partition(".")
+        columns = self._types[msg_type]
+        if field not in columns.fields:
+            raise KeyError(channel)
+        return TimeSeries(channel, *columns.bins[field].envelope())
+
+    def times(self, msg_type: str) -> np.ndarray:
+        columns = self._types[msg_type]
+        if not columns.fields:
+            return np.empty(0, dtype=np.float64)
+        return columns.bins[columns.fields[0]].envelope()[0]
+
+    def values(self, msg_type: str, field: str) -> np.ndarray:
+        return self.series(f"{msg_type}.{field}").values
+
+    def pyramid(self, channel: str) -> MinMaxPyramid:
+        pyramid = self._pyramids.get(channel)
+        if pyramid is None:
+            series = self.series(channel)
+            pyramid = MinMaxPyramid(series.times, series.values)
+            self._pyramids[channel] = pyramid
+        return pyramid
+
+    def memory_bytes(self) -> int:
+        total = sum(bins.memory_bytes() for columns in self._types.values() for bins in columns.bins.values())
+        return total + sum(pyramid.memory_bytes() for pyramid in self._pyramids.values())
+
+
+def gather_field(raw: np.ndarray, fmt: MessageFormat, field: str, offsets: np.ndarray) -> np.ndarray:
+    """Decode ``field`` of the records at ``offsets`` in ``raw`` (the mapped log) with vectorized gathers."""
+    field_offset, code, char = fmt.field_layout(field)
+    dtype = np.dtype(STRUCT_TO_DTYPE[code])
+    out = np.empty(len(offsets), dtype=dtype)
+    width = np.arange(dtype.itemsize)
+    for start in range(0, len(offsets), GATHER_CHUNK):
+        chunk = offsets[start : start + GATHER_CHUNK] + field_offset
+        out[start : start + len(chunk)] = raw[chunk[:, None] + width].view(dtype).ravel()
+    return _scale(out, char)
+
+
+def _scale(values: np.ndarray, char: str) -> np.ndarray:
+    divisor = SCALED_CHARS.get(char)
+    if divisor is None:
+        return values
+    # Divide like DFReader does so scaled values match it exactly.
+    return values.astype(np.float64) / divisor
@@ -0,0 +1,281 @@
+"""Headless batch summarizing and trimming of DataFlash logs.
+
+Usage:
+    python -m core summarize LOG... [--jobs N]
+    python -m core trim LOG... [--remove START:END]... [--keep START:END]...
+                               [--type TYPE=drop|keep|HZ]... [--compress zlib|lzma]
+                               [--segments SPEC.json] [--relative] [--output-dir DIR] [--jobs N]
+
+Each processed log is reported on stdout as one JSON line with its timings
+and throughput. Only the ``core`` package is imported: no Qt, no plotting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .compressed import CODECS
+from .exporter import DataFlashExporter, TypePolicy
+from .log_parser import DataFlashParser
+from .segments import Segment, normalize_segments, remove_segments, validate_segments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUFFIX = "_trimmed"
+# Appended to the output name when it is written as a block-compressed container.
+COMPRESSED_SUFFIX = ".ltbz"
+
+
+@dataclass(frozen=True)
+class TrimJob:
+    """One log to process; ``remove``, ``keep`` and ``policy`` are applied together."""
+
+    source: Path
+    destination: Optional[Path] = None
+    remove: Tuple[Segment, ...] = ()
+    keep: Tuple[Segment, ...] = ()
+    relative: bool = False
+    stride: int = 50
+    policy: Optional[TypePolicy] = None
+    compression: Optional[str] = None
+
+
+@dataclass
+class JobSpec:
+    remove: List[Segment] = field(default_factory=list)
+    keep: List[Segment] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+
+
+def parse_segment(text: str) -> Segment:
+    """Parse ``START:END`` (seconds) into a :class:`Segment`."""
+    start, sep, end = text.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected START:END, got {text!r}")
+    try:
+        return Segment(float(start), float(end))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid segment {text!r}: {exc}") from exc
+
+
+def parse_type_rule(text: str) -> str:
+    """Validate one ``TYPE=drop|keep|HZ`` item of a :class:`TypePolicy`."""
+    try:
+        TypePolicy.parse([text])
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+    return text
+
+
+def _segments_from_json(items: Iterable) -> List[Segment]:
+    segments = []
+    for item in items:
+        if isinstance(item, dict):
+            segments.append(Segment(float(item["start"]), float(item["end"])))
+        else:
+            start, end = item
+            segments.append(Segment(float(start), float(end)))
+    return segments
+
+
+def load_spec_file(path: Path) -> Tuple[JobSpec, Dict[str, JobSpec]]:
+    """Read a segment spec file.
+
+    The file holds either one spec object applied to every log, e.g.
+    ``{"remove": [[0, 30]], "keep": [{"start": 60, "end": 900}]}``, or a
+    list of such objects that each name their ``"log"``. A ``"types"``
+    object maps message types to ``"drop"``, ``"keep"`` or a rate in Hz.
+    """
+    data = json.loads(path.read_text(encoding="utf-8"))
+    shared = JobSpec()
+    per_log: Dict[str, JobSpec] = {}
+    entries = data if isinstance(data, list) else [data]
+    for entry in entries:
+        spec = JobSpec(
+            _segments_from_json(entry.get("remove", ())),
+            _segments_from_json(entry.get("keep", ())),
+            [f"{name}={rule}" for name, rule in entry.get("types", {}).items()],
+        )
+        if "log" in entry:
+            per_log[str(Path(entry["log"]))] = spec
+        elif isinstance(data, list):
+            raise ValueError(f"{path}: list entries need a 'log' key")
+        else:
+            shared = spec
+    return shared, per_log
+
+
+def _offset(segments: Iterable[Segment], origin: float) -> List[Segment]:
+    return [Segment(seg.start + origin, seg.end + origin) for seg in segments]
+
+
+def _default_destination(source: Path, output_dir: Optional[Path], compression: Optional[str] = None) -> Path:
+    name = source.stem + DEFAULT_SUFFIX + source.suffix + (COMPRESSED_SUFFIX if compression else "")
+    return (output_dir or source.parent) / name
+
+
+def summarize_job(job: TrimJob) -> Dict[str, object]:
+    started = time.perf_counter()
+    info = DataFlashParser(job.source).summarize()
+    elapsed = time.perf_counter() - started
+    return {
+        "log": str(job.source),
+        "status": "ok",
+        "messages": info.message_count,
+        "start_time": info.start_time,
+        "end_time": info.end_time,
+        **_throughput(info.size_bytes, info.message_count, elapsed),
+    }
+
+
+def trim_job(job: TrimJob) -> Dict[str, object]:
+    """Index, validate and export one log; runs in a worker process."""
+    started = time.perf_counter()
+    parser = DataFlashParser(job.source)
+    index = parser.build_index(job.stride)
+    info = parser.info_from_index(index)
+    scanned = time.perf_counter()
+    origin = info.start_time if job.relative else 0.0
+    remove = _offset(job.remove, origin)
+    if job.keep:
+        remove += remove_segments(info.start_time, info.end_time, _offset(job.keep, origin))
+    remove = normalize_segments(remove)
+    validate_segments(remove, info.start_time, info.end_time)
+    destination = job.destination or _default_destination(job.source, None, job.compression)
+    DataFlashExporter(job.source).export(
+        destination,
+        remove,
+        total_messages=info.message_count,
+        index=index,
+        policy=job.policy,
+        compression=job.compression,
+    )
+    finished = time.perf_counter()
+    return {
+        "log": str(job.source),
+        "output": str(destination),
+        "status": "ok",
+        "messages": info.message_count,
+        "removed": [[seg.start, seg.end] for seg in remove],
+        "types": dict(job.policy.rates) if job.policy else {},
+        "compression": job.compression,
+        "output_bytes": destination.stat().st_size,
+        "scan_seconds": scanned - started,
+        "export_seconds": finished - scanned,
+        **_throughput(info.size_bytes, info.message_count, finished - started),
+    }
+
+
+def _throughput(size_bytes: int, messages: int, seconds: float) -> Dict[str, float]:
+    return {
+        "input_bytes": size_bytes,
+        "seconds": seconds,
+        "mb_per_s": size_bytes / (1024 * 1024) / seconds if seconds > 0 else 0.0,
+        "msgs_per_s": messages / seconds if seconds > 0 else 0.0,
+    }
+
+
+def run_jobs(worker, jobs: Sequence[TrimJob], processes: int) -> Iterator[Dict[str, object]]:
+    """Run ``worker`` over ``jobs``, yielding one report per job as it completes."""
+    if processes <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _guarded(worker, job)
+        return
+    with ProcessPoolExecutor(max_workers=min(processes, len(jobs))) as pool:
+        futures = {pool.submit(_guarded, worker, job): job for job in jobs}
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _guarded(worker, job: TrimJob) -> Dict[str, object]:
+    try:
+        return worker(job)
+    except Exception as exc:  # noqa: BLE001 - one bad log must not stop the batch
+        logger.exception("Failed to process %s: %s", job.source, exc)
+        return {"log": str(job.source), "status": "error", "error": str(exc)}
+
+
+def build_jobs(args: argparse.Namespace) -> List[TrimJob]:
+    shared, per_log = load_spec_file(args.segments) if getattr(args, "segments", None) else (JobSpec(), {})
+    sources = [Path(log) for log in args.logs] or [Path(name) for name in per_log]
+    output_dir = getattr(args, "output_dir", None)
+    jobs = []
+    for source in sources:
+        spec = per_log.get(str(source), shared)
+        remove = list(getattr(args, "remove", None) or ()) + spec.remove
+        keep = list(getattr(args, "keep", None) or ()) + spec.keep
+        # Command-line rules come last so they override the spec file's.
+        types = spec.types + list(getattr(args, "types", None) or ())
+        jobs.append(
+            TrimJob(
+                source=source,
+                destination=_default_destination(source, output_dir, getattr(args, "compress", None)),
+                remove=tuple(remove),
+                keep=tuple(keep),
+                relative=getattr(args, "relative", False),
+                policy=TypePolicy.parse(types) if types else None,
+                compression=getattr(args, "compress", None),
+            )
+        )
+    return jobs
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m core", description=__doc__.splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summarize = commands.add_parser("summarize", help="report message counts and time range")
+    summarize.add_argument("logs", nargs="+")
+    summarize.add_argument("-j", "--jobs", type=int, default=1, help="worker processes")
+
+    trim = commands.add_parser("trim", help="export logs without the removed time ranges")
+    trim.add_argument("logs", nargs="*", help="logs to trim (default: the logs named in --segments)")
+    trim.add_argument("--remove", action="append", type=parse_segment, metavar="START:END")
+    trim.add_argument("--keep", action="append", type=parse_segment, metavar="START:END")
+    trim.add_argument(
+        "--type",
+        dest="types",
+        action="append",
+        type=parse_type_rule,
+        metavar="TYPE=drop|keep|HZ",
+        help="drop or decimate a message type (patterns such as PID* allowed)",
+    )
+    trim.add_argument(
+        "--compress",
+        choices=sorted(CODECS),
+        help=f"write a seekable block-compressed container (<name>{DEFAULT_SUFFIX}.BIN{COMPRESSED_SUFFIX})",
+    )
+    trim.add_argument("--segments", type=Path, help="JSON segment spec, shared or per log")
+    trim.add_argument("--relative", action="store_true", help="times are seconds from each log's start")
+    trim.add_argument("-o", "--output-dir", type=Path, help=f"where to write <name>{DEFAULT_SUFFIX}.BIN")
+    trim.add_argument("-j", "--jobs", type=int, default=1, help="worker processes")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+        stream=sys.stderr,
+    )
+    jobs = build_jobs(args)
+    if not jobs:
+        print("no logs given", file=sys.stderr)
+        return 2
+    if getattr(args, "output_dir", None):
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+    worker = summarize_job if args.command == "summarize" else trim_job
+    failed = 0
+    for report in run_jobs(worker, jobs, args.jobs):
+        failed += report["status"] != "ok"
+        print(json.dumps(report), flush=True)
+    return 1 if failed else 0
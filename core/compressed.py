@@ -0,0 +1,284 @@
+"""Block-compressed container for exported logs.
+
+Layout (all integers little-endian)::
+
+    header   MAGIC, version u8, codec u8, reserved u16, block size u32
+    blocks   compressed blocks, back to back
+    footer   the log's FMT records (uncompressed), then per block
+             (file offset u64, compressed length u32, raw length u32)
+    trailer  footer offset u64, FMT bytes u32, block count u32, MAGIC
+
+Every block holds ``block size`` bytes of the original log (the last one
+fewer) and is compressed on its own, so a reader can decompress any block
+without the ones before it. Records may straddle blocks; readers resync on
+record headers, and the FMT records in the footer let them decode from any
+block onwards.
+"""
+from __future__ import annotations
+
+import bisect
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .dataflash import (
+    FMT_FORMAT,
+    FMT_TYPE,
+    DataFlashFormatError,
+    DataFlashScanner,
+    MessageFormat,
+    RecordView,
+    find_sync,
+)
+
+MAGIC = b"LTBZ"
+VERSION = 1
+CODECS = {"zlib": 1, "lzma": 2}
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+# Longest possible DataFlash record: its length is a single byte.
+MAX_RECORD_LENGTH = 255
+
+_HEADER = struct.Struct("<4sBBHI")
+_BLOCK = struct.Struct("<QII")
+_TRAILER = struct.Struct("<QII4s")
+
+
+def is_block_compressed(path: Path) -> bool:
+    try:
+        with open(path, "rb") as fp:
+            return fp.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _compressor(codec: str, level: Optional[int]) -> Callable[[bytes], bytes]:
+    if codec == "zlib":
+        level = 6 if level is None else level
+        return lambda raw: zlib.compress(raw, level)
+    if codec == "lzma":
+        preset = 6 if level is None else level
+        return lambda raw: lzma.compress(raw, preset=preset)
+    raise ValueError(f"Unknown codec {codec!r}; expected one of {', '.join(CODECS)}")
+
+
+class BlockWriter:
+    """File-like sink that compresses fixed-size blocks in a thread pool.
+
+    zlib and lzma release the GIL while they work, so blocks compress in
+    parallel while the caller keeps writing; finished blocks are written to
+    ``fp`` in order. At most two blocks per worker are in flight, which
+    bounds memory. Bytes added to ``formats`` are stored in the footer; the
+    exporter puts the log's FMT records there. Use as a context manager, or
+    call :meth:`close` to write the footer and :meth:`abort` on failure.
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        codec: str = "zlib",
+        level: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        workers: Optional[int] = None,
+    ) -> None:
+        self._compress = _compressor(codec, level)
+        self._fp = fp
+        self.codec = codec
+        self.block_size = block_size
+        self.formats = bytearray()
+        self.raw_bytes = 0
+        workers = workers or min(8, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compress")
+        self._max_pending = 2 * workers
+        self._pending: Deque[Tuple[Future, int]] = deque()
+        self._buffer = bytearray()
+        self._blocks: List[Tuple[int, int, int]] = []
+        self._offset = _HEADER.size
+        self._closed = False
+        fp.write(_HEADER.pack(MAGIC, VERSION, CODECS[codec], 0, block_size))
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast("B")
+        count = len(view)
+        while view:
+            room = self.block_size - len(self._buffer)
+            self._buffer += view[:room]
+            view = view[room:]
+            if len(self._buffer) >= self.block_size:
+                self._submit()
+        self.raw_bytes += count
+        return count
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            if self._buffer:
+                self._submit()
+            while self._pending:
+                self._write_next()
+            footer = self._offset
+            self._fp.write(self.formats)
+            for block in self._blocks:
+                self._fp.write(_BLOCK.pack(*block))
+            self._fp.write(_TRAILER.pack(footer, len(self.formats), len(self._blocks), MAGIC))
+        finally:
+            self._closed = True
+            self._pool.shutdown(wait=True)
+
+    def abort(self) -> None:
+        """Stop without writing the footer, leaving an unreadable container."""
+        self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "BlockWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _submit(self) -> None:
+        raw = bytes(self._buffer)
+        self._buffer.clear()
+        self._pending.append((self._pool.submit(self._compress, raw), len(raw)))
+        while len(self._pending) >= self._max_pending:
+            self._write_next()
+
+    def _write_next(self) -> None:
+        future, raw_length = self._pending.popleft()
+        data = future.result()
+        self._fp.write(data)
+        self._blocks.append((self._offset, len(data), raw_length))
+        self._offset += len(data)
+
+
+class BlockReader:
+    """Random access to the blocks of a container written by :class:`BlockWriter`."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._read_layout()
+        except (struct.error, ValueError) as exc:
+            self._file.close()
+            raise DataFlashFormatError(f"{path} is not a block-compressed log: {exc}") from exc
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _read_layout(self) -> None:
+        magic, version, codec_id, _, self.block_size = _HEADER.unpack(self._read_at(0, _HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported header {magic!r} version {version}")
+        codecs = {number: name for name, number in CODECS.items()}
+        if codec_id not in codecs:
+            raise ValueError(f"unknown codec {codec_id}")
+        self.codec = codecs[codec_id]
+        self._decompress = zlib.decompress if self.codec == "zlib" else lzma.decompress
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size + _TRAILER.size:
+            raise ValueError("truncated container")
+        footer, formats_length, count, magic = _TRAILER.unpack(self._read_at(size - _TRAILER.size, _TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError("missing trailer; the container was not closed")
+        self.formats = self._read_at(footer, formats_length)
+        table = self._read_at(footer + formats_length, count * _BLOCK.size)
+        self.blocks: List[Tuple[int, int, int]] = [block for block in _BLOCK.iter_unpack(table)]
+        # Offset of each block's first byte in the original log.
+        self.raw_starts: List[int] = []
+        raw = 0
+        for _, _, raw_length in self.blocks:
+            self.raw_starts.append(raw)
+            raw += raw_length
+        self.raw_size = raw
+
+    def _read_at(self, offset: int, count: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(count)
+
+    @property
+    def block_count(self) -> int:
+        return len(self.blocks)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "BlockReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def block_of(self, raw_offset: int) -> int:
+        """Return the block holding byte ``raw_offset`` of the original log."""
+        if not 0 <= raw_offset < self.raw_size:
+            raise IndexError(f"offset {raw_offset} outside the log's {self.raw_size} bytes")
+        return bisect.bisect_right(self.raw_starts, raw_offset) - 1
+
+    def read_block(self, block: int) -> bytes:
+        offset, length, raw_length = self.blocks[block]
+        data = self._decompress(self._read_at(offset, length))
+        if len(data) != raw_length:
+            raise DataFlashFormatError(f"Block {block} of {self.path} decompressed to {len(data)} bytes")
+        return data
+
+    def read(self, raw_offset: int, size: int) -> bytes:
+        """Return ``size`` bytes of the original log from ``raw_offset``, decompressing only their blocks."""
+        out = bytearray()
+        end = min(raw_offset + size, self.raw_size)
+        block = self.block_of(raw_offset) if raw_offset < end else self.block_count
+        while raw_offset < end and block < self.block_count:
+            data = self.read_block(block)
+            start = raw_offset - self.raw_starts[block]
+            out += data[start : start + end - raw_offset]
+            raw_offset = self.raw_starts[block] + len(data)
+            block += 1
+        return bytes(out)
+
+    def iter_records(self, first_block: int = 0) -> Iterator[Tuple[int, float, RecordView]]:
+        """Yield ``(index, timestamp, view)`` like ``DataFlashScanner.iter_records``, from ``first_block`` on.
+
+        Views point into the current decompressed window, so their
+        ``offset`` is not a position in any file. When starting past the
+        first block, the scan resyncs on the first run of well-formed
+        records and numbers messages from there.
+        """
+        formats: Dict[int, MessageFormat] = {FMT_TYPE: FMT_FORMAT}
+        if self.formats:
+            for _ in DataFlashScanner.from_buffer(self.formats, formats).iter_records():
+                pass
+        elif first_block:
+            # Without stored FMT records, the blocks before the seek point are scanned for them.
+            for _ in self._iter_windows(0, first_block, formats, True):
+                pass
+        yield from self._iter_windows(first_block, self.block_count, formats, first_block == 0)
+
+    def _iter_windows(
+        self, first_block: int, end_block: int, formats: Dict[int, MessageFormat], synced: bool
+    ) -> Iterator[Tuple[int, float, RecordView]]:
+        carry = b""
+        next_index = 0
+        for block in range(first_block, end_block):
+            window = carry + self.read_block(block)
+            last = block == self.block_count - 1
+            start = 0
+            if not synced:
+                start = find_sync(window, 0, {type_id: fmt.length for type_id, fmt in formats.items()})
+                synced = True
+            # Records starting before ``limit`` always end inside the window.
+            limit = len(window) if last else max(len(window) - MAX_RECORD_LENGTH, start)
+            scanner = DataFlashScanner.from_buffer(window, formats)
+            for record in scanner.iter_records(start, limit, next_index):
+                next_index = record[0] + 1
+                yield record
+            scanner.close()
+            # Keep a possible header byte split across the block boundary.
+            carry = window[min(scanner.stop_offset, len(window) - 1) :]
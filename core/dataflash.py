@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import array
+import logging
+import mmap
+import struct
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEAD1 = 0xA3
+HEAD2 = 0x95
+HEADER = bytes((HEAD1, HEAD2))
+FMT_TYPE = 0x80
+FMT_LENGTH = 89
+
+# Bytes scanned between drops of the mapped pages behind the cursor, which
+# keeps the resident size of a scan flat whatever the size of the log.
+RELEASE_BYTES = 16 * 1024 * 1024
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+# Message types that describe the log rather than the flight; exports always keep them.
+HEADER_TYPES = frozenset({"FMT", "FMTU", "UNIT", "MULT", "PARM"})
+
+# Consecutive well-formed records required before a resync point is trusted.
+SYNC_DEPTH = 16
+
+# DataFlash format character -> (struct code, multiplier), mirroring pymavlink.DFReader.
+FORMAT_TO_STRUCT: Dict[str, Tuple[str, Optional[float]]] = {
+    "a": ("64s", None),
+    "b": ("b", None),
+    "B": ("B", None),
+    "g": ("e", None),
+    "h": ("h", None),
+    "H": ("H", None),
+    "i": ("i", None),
+    "I": ("I", None),
+    "f": ("f", None),
+    "n": ("4s", None),
+    "N": ("16s", None),
+    "Z": ("64s", None),
+    "c": ("h", 0.01),
+    "C": ("H", 0.01),
+    "e": ("i", 0.01),
+    "E": ("I", 0.01),
+    "L": ("i", 1.0e-7),
+    "d": ("d", None),
+    "M": ("b", None),
+    "q": ("q", None),
+    "Q": ("Q", None),
+}
+
+# Same precedence as extract_timestamp(): field name -> divisor to seconds.
+TIME_FIELDS = (("TimeUS", 1_000_000.0), ("time_usec", 1_000_000.0), ("time_boot_ms", 1_000.0), ("TimeMS", 1_000.0))
+
+Decoder = Callable[[object, int], tuple]
+
+
+class DataFlashFormatError(ValueError):
+    pass
+
+
+def _null_term(raw: bytes) -> str:
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        text = raw.decode("ISO-8859-1")
+    index = text.find("\0")
+    return text[:index] if index != -1 else text
+
+
+def _converter(char: str, multiplier: Optional[float]) -> Optional[Callable[[object], object]]:
+    if char == "a":
+        return lambda raw: array.array("h", raw)
+    if char in "nNZ":
+        return _null_term
+    if multiplier is None:
+        return None
+    if 0.0 < multiplier < 1.0:
+        # Divide rather than multiply, like DFReader, so values match bit for bit.
+        divisor = 1 / multiplier
+        return lambda raw: raw / divisor
+    return lambda raw: raw * multiplier
+
+
+def record_length(chars: str) -> int:
+    """Bytes of one record with format characters ``chars``, header included."""
+    try:
+        return 3 + struct.calcsize("<" + "".join(FORMAT_TO_STRUCT[char][0] for char in chars))
+    except KeyError as exc:
+        raise DataFlashFormatError(f"Unsupported format char {exc.args[0]!r}") from exc
+
+
+def find_sync(buf, start: int, lengths: Dict[int, int], depth: int = SYNC_DEPTH) -> int:
+    """Return the first offset at or after ``start`` that begins ``depth`` chained records.
+
+    ``lengths`` maps type ids to record lengths. Used to resync mid-log, where a
+    header byte pair may also occur inside another record's payload.
+    """
+    size = len(buf)
+    offset = buf.find(HEADER, start)
+    while offset != -1:
+        cursor = offset
+        for _ in range(depth):
+            if cursor + 3 > size:
+                break
+            length = lengths.get(buf[cursor + 2]) if buf[cursor : cursor + 2] == HEADER else None
+            if length is None or cursor + length > size:
+                break
+            cursor += length
+        else:
+            return offset
+        if cursor + 3 > size and cursor > offset:
+            return offset
+        offset = buf.find(HEADER, offset + 1)
+    return size
+
+
+class MessageFormat:
+    """A FMT definition compiled into struct layouts for its fields."""
+
+    def __init__(self, type_id: int, name: str, length: int, fmt: str, columns: Sequence[str]) -> None:
+        self.type_id = type_id
+        self.name = name
+        self.length = length
+        self.format = fmt
+        self.columns = list(columns)
+        self._codes: List[str] = []
+        self._chars: Dict[str, str] = {}
+        self._offsets: Dict[str, int] = {}
+        self._converters: Dict[str, Optional[Callable[[object], object]]] = {}
+        offset = 3
+        for column, char in zip(self.columns, fmt):
+            try:
+                code, multiplier = FORMAT_TO_STRUCT[char]
+            except KeyError as exc:
+                raise DataFlashFormatError(f"Unsupported format char {char!r} in message {name}") from exc
+            self._codes.append(code)
+            self._chars[column] = char
+            self._offsets[column] = offset
+            self._converters[column] = _converter(char, multiplier)
+            offset += struct.calcsize("<" + code)
+        if offset != length:
+            raise DataFlashFormatError(f"Message {name} declares length {length}, format needs {offset}")
+        self._decoders: Dict[Tuple[str, ...], Decoder] = {}
+        self._time_decoder: Optional[Decoder] = None
+        self.time_divisor = 1.0
+        for field, divisor in TIME_FIELDS:
+            if field in self._offsets:
+                self._time_decoder = self.decoder((field,))
+                self.time_divisor = divisor
+                break
+
+    def decode(self, buf, offset: int) -> tuple:
+        return self.decoder(self.columns)(buf, offset)
+
+    def field_layout(self, field: str) -> Tuple[int, str, str]:
+        """Return ``(offset within the record, struct code, format char)`` of ``field``."""
+        if field not in self._offsets:
+            raise AttributeError(f"{self.name} has no field {field!r}")
+        return self._offsets[field], self._codes[self.columns.index(field)], self._chars[field]
+
+    @property
+    def has_time(self) -> bool:
+        return self._time_decoder is not None
+
+    def decoder(self, fields: Sequence[str]) -> Decoder:
+        """Return ``decode(buffer, record_offset) -> tuple`` for just ``fields``.
+
+        Unrequested columns are skipped with struct pad bytes, so only the
+        requested values are ever unpacked.
+        """
+        key = tuple(fields)
+        decoder = self._decoders.get(key)
+        if decoder is not None:
+            return decoder
+        missing = [field for field in key if field not in self._offsets]
+        if missing:
+            raise AttributeError(f"{self.name} has no field {missing[0]!r}")
+        wanted = sorted(key, key=self._offsets.__getitem__)
+        start = self._offsets[wanted[0]]
+        layout = "<"
+        cursor = start
+        for field in wanted:
+            gap = self._offsets[field] - cursor
+            if gap:
+                layout += f"{gap}x"
+            code = self._codes[self.columns.index(field)]
+            layout += code
+            cursor = self._offsets[field] + struct.calcsize("<" + code)
+        unpack_from = struct.Struct(layout).unpack_from
+        order = [wanted.index(field) for field in key]
+        converters = [self._converters[field] for field in key]
+        if order == list(range(len(key))) and not any(converters):
+
+            def decoder(buf, offset):
+                return unpack_from(buf, offset + start)
+
+        else:
+
+            def decoder(buf, offset):
+                raw = unpack_from(buf, offset + start)
+                return tuple(
+                    raw[index] if convert is None else convert(raw[index])
+                    for index, convert in zip(order, converters)
+                )
+
+        self._decoders[key] = decoder
+        return decoder
+
+    def timestamp(self, buf, offset: int, fallback_index: int) -> float:
+        if self._time_decoder is None:
+            return float(fallback_index)
+        return float(self._time_decoder(buf, offset)[0]) / self.time_divisor
+
+
+FMT_FORMAT = MessageFormat(FMT_TYPE, "FMT", FMT_LENGTH, "BBnNZ", ("Type", "Length", "Name", "Format", "Columns"))
+
+
+class RecordView:
+    """Flyweight over the record the scanner currently points at.
+
+    It quacks like a pymavlink ``DFMessage`` (``get_type()``, attribute
+    access, ``get_msgbuf()``) but decodes fields on demand. The view is
+    re-pointed for every record, so it is only valid until the scanner
+    advances.
+    """
+
+    __slots__ = ("_buf", "_view", "fmt", "offset")
+
+    def __init__(self, buf, view: Optional[memoryview] = None) -> None:
+        self._buf = buf
+        self._view = view
+        self.fmt: MessageFormat = FMT_FORMAT
+        self.offset = 0
+
+    def __getattr__(self, field: str):
+        return self.fmt.decoder((field,))(self._buf, self.offset)[0]
+
+    def get_type(self) -> str:
+        return self.fmt.name
+
+    def decode(self, fields: Sequence[str]) -> tuple:
+        return self.fmt.decoder(fields)(self._buf, self.offset)
+
+    def get_msgbuf(self) -> bytes:
+        return self._buf[self.offset : self.offset + self.fmt.length]
+
+    def get_msgview(self) -> memoryview:
+        """Return the record's bytes as a zero-copy slice of the mapped file.
+
+        Unlike the view itself the slice stays valid after the scanner
+        advances, for as long as the scanner is open.
+        """
+        if self._view is None:
+            return memoryview(self.get_msgbuf())
+        return self._view[self.offset : self.offset + self.fmt.length]
+
+
+class DataFlashScanner:
+    """Walks the 0xA3 0x95 record headers of a binary DataFlash log.
+
+    FMT records are compiled into :class:`MessageFormat` objects as they are
+    met; every other record is only located, and callers decode the fields
+    they need through the yielded :class:`RecordView`. Framing and resync
+    follow ``DFReader_binary`` so both readers see the same messages.
+    """
+
+    def __init__(self, path: Path, formats: Optional[Dict[int, MessageFormat]] = None) -> None:
+        """Map ``path``; ``formats`` shares FMT definitions with earlier scanners, as in :meth:`from_buffer`."""
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:
+            self._file.close()
+            raise DataFlashFormatError(f"Cannot map {path}: {exc}") from exc
+        self._attach(self._map, formats)
+
+    @classmethod
+    def from_buffer(cls, buf, formats: Optional[Dict[int, MessageFormat]] = None) -> "DataFlashScanner":
+        """Scan an in-memory buffer, e.g. a decompressed block.
+
+        Scanners given the same ``formats`` dict share the FMT definitions
+        they meet, so consecutive buffers can be scanned as one log.
+        """
+        scanner = cls.__new__(cls)
+        scanner.path = None
+        scanner._file = None
+        scanner._map = buf
+        scanner._attach(buf, formats)
+        return scanner
+
+    def _attach(self, buf, formats: Optional[Dict[int, MessageFormat]]) -> None:
+        self._view = memoryview(buf)
+        self.size = len(buf)
+        self.formats: Dict[int, MessageFormat] = {FMT_TYPE: FMT_FORMAT} if formats is None else formats
+        # Where the last exhausted iter_records() call would have continued.
+        self.stop_offset = 0
+
+    def close(self) -> None:
+        self._view.release()
+        if self._file is None:
+            return
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds a span; the mapping goes away with its last slice.
+            pass
+        self._file.close()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def span(self, start: int, end: int) -> memoryview:
+        """Return bytes ``[start, end)`` as a zero-copy slice of the mapped file."""
+        return self._view[start:end]
+
+    def release(self, start: int, end: int) -> None:
+        """Drop the mapped pages of ``[start, end)`` from this process's resident set.
+
+        The data stays in the OS page cache and is faulted back in if it is
+        read again, so this only bounds memory, never changes what is read.
+        """
+        if _MADV_DONTNEED is None or self._file is None:
+            return
+        start -= start % mmap.PAGESIZE
+        end = min(end, self.size)
+        if end > start:
+            self._map.madvise(_MADV_DONTNEED, start, end - start)
+
+    def __enter__(self) -> "DataFlashScanner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def format_by_name(self, name: str) -> Optional[MessageFormat]:
+        for fmt in self.formats.values():
+            if fmt.name == name:
+                return fmt
+        return None
+
+    def iter_records(
+        self, start: int = 0, end: Optional[int] = None, first_index: int = 0
+    ) -> Iterator[Tuple[int, float, RecordView]]:
+        """Yield ``(index, timestamp, view)`` for records starting in ``[start, end)``.
+
+        ``start`` must be a record boundary and every FMT record before it
+        must already have been scanned, e.g. by an earlier call. Once the
+        iterator is exhausted, ``stop_offset`` holds the offset the scan
+        would resume from (``size`` if it ran off the end of the file).
+        """
+        buf = self._map
+        size = self.size
+        limit = size if end is None else min(end, size)
+        formats = self.formats
+        find = buf.find
+        view = RecordView(buf, self._view)
+        offset = start
+        msg_index = first_index
+        released = start
+        next_release = start + RELEASE_BYTES
+        while offset + 3 <= size and offset < limit:
+            if offset >= next_release:
+                self.release(released, offset)
+                released, next_release = offset, offset + RELEASE_BYTES
+            fmt = formats.get(buf[offset + 2]) if buf[offset] == HEAD1 and buf[offset + 1] == HEAD2 else None
+            if fmt is None:
+                offset = find(HEADER, offset + 1)
+                if offset == -1:
+                    offset = size
+                    break
+                continue
+            record_end = offset + fmt.length
+            if record_end > size:
+                offset = size
+                break
+            if fmt.type_id == FMT_TYPE and not self._register_format(fmt, offset):
+                offset += 3
+                continue
+            view.fmt = fmt
+            view.offset = offset
+            yield msg_index, fmt.timestamp(buf, offset, msg_index), view
+            msg_index += 1
+            offset = record_end
+        self.release(released, offset)
+        self.stop_offset = size if offset + 3 > size else offset
+
+    def _register_format(self, fmt_format: MessageFormat, offset: int) -> bool:
+        try:
+            type_id, length, name, fmt, columns = fmt_format.decode(self._map, offset)
+        except AttributeError:
+            return False
+        try:
+            self.formats[type_id] = MessageFormat(type_id, name, length, fmt, columns.split(",") if columns else [])
+        except DataFlashFormatError as exc:
+            logger.warning("Skipping FMT for %s: %s", name, exc)
+            return False
+        return True
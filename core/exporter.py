@@ -1,20 +1,263 @@
 from __future__ import annotations
 
+import fnmatch
 import logging
-from dataclasses import dataclass
+import math
+import os
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
 
-from .log_parser import DataFlashParser
-from .segments import Segment, normalize_segments, remove_contains_time
+from .compressed import BlockWriter
+from .dataflash import HEADER_TYPES, DataFlashScanner, RecordView
+from .log_parser import DataFlashParser, LogIndex
+from .metrics import METRICS
+from .segments import Segment, SegmentSet
 
 logger = logging.getLogger(__name__)
 
+COPY_CHUNK = 8 * 1024 * 1024
+# Minimum spacing of progress callbacks, in seconds and in source bytes.
+PROGRESS_INTERVAL = 0.1
+PROGRESS_BYTES = 1024 * 1024
+# The record-by-record path checks for progress and cancellation this often.
+PROGRESS_RECORDS = 4096
+
+
+class ExportCancelled(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """Thread-safe flag an export polls between blocks, records and copy chunks."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise ExportCancelled("Export canceled")
+
 
 @dataclass
 class ExportProgress:
     current: int
     total: int
+    bytes_done: int = 0
+    bytes_total: int = 0
+    # Seconds spent exporting so far, excluding time spent in progress callbacks.
+    elapsed: float = 0.0
+
+    @property
+    def fraction(self) -> float:
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.total:
+            return min(self.current / self.total, 1.0)
+        return 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class TypePolicy:
+    """Which records of each message type an export keeps.
+
+    ``rates`` maps message types, or ``fnmatch`` patterns such as
+    ``"PID*"``, to the highest rate to keep in Hz: ``0`` drops the type and
+    ``None`` keeps it whole, as it does every unlisted type. The first
+    matching entry wins. Header types (``HEADER_TYPES``) are always kept so
+    the output still parses, and types without a time field cannot be
+    decimated, so they are only ever kept or dropped.
+    """
+
+    rates: Mapping[str, Optional[float]] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, items: Iterable[str]) -> "TypePolicy":
+        """Build a policy from ``TYPE=drop``, ``TYPE=keep`` or ``TYPE=HZ`` items."""
+        rates: Dict[str, Optional[float]] = {}
+        for item in items:
+            name, sep, value = item.partition("=")
+            value = value.strip().lower()
+            if not sep or not name:
+                raise ValueError(f"expected TYPE=drop|keep|HZ, got {item!r}")
+            if value == "keep":
+                rates[name] = None
+            elif value == "drop":
+                rates[name] = 0.0
+            else:
+                try:
+                    rate = float(value.removesuffix("hz"))
+                except ValueError:
+                    raise ValueError(f"invalid rate in {item!r}") from None
+                if not rate > 0.0:
+                    raise ValueError(f"rate must be positive in {item!r}; use {name}=drop to drop the type")
+                rates[name] = rate
+        return cls(rates)
+
+    def rate_for(self, msg_type: str) -> Optional[float]:
+        if msg_type in HEADER_TYPES:
+            return None
+        if msg_type in self.rates:
+            return self.rates[msg_type]
+        for pattern, rate in self.rates.items():
+            if fnmatch.fnmatchcase(msg_type, pattern):
+                return rate
+        return None
+
+    def affects(self, msg_types: Iterable[str]) -> bool:
+        """Whether the policy removes anything from a log holding ``msg_types``."""
+        return any(self.rate_for(msg_type) is not None for msg_type in msg_types)
+
+
+class _TypeFilter:
+    """Applies a :class:`TypePolicy` record by record.
+
+    A decimated type keeps the first record of every ``1 / rate`` period,
+    tracked separately per instance (the ``I`` column) so that interleaved
+    IMU or BARO instances are each thinned rather than starved.
+    """
+
+    def __init__(self, policy: TypePolicy) -> None:
+        self.policy = policy
+        # type -> (rate, has an instance column); resolved once per type.
+        self._rules: Dict[str, Tuple[Optional[float], bool]] = {}
+        self._due: Dict[Tuple[str, object], float] = {}
+
+    def keep(self, msg_type: str, timestamp: float, msg) -> bool:
+        rule = self._rules.get(msg_type)
+        if rule is None:
+            rule = self._rules[msg_type] = self._rule(msg_type, msg)
+        rate, instanced = rule
+        if rate is None:
+            return True
+        if rate <= 0.0:
+            return False
+        key = (msg_type, msg.I if instanced else None)
+        if timestamp < self._due.get(key, -math.inf):
+            return False
+        period = 1.0 / rate
+        self._due[key] = (math.floor(timestamp / period) + 1) * period
+        return True
+
+    def _rule(self, msg_type: str, msg) -> Tuple[Optional[float], bool]:
+        rate = self.policy.rate_for(msg_type)
+        fmt = getattr(msg, "fmt", None)
+        columns = getattr(fmt, "columns", ())
+        if rate and isinstance(msg, RecordView) and not fmt.has_time:
+            rate = None
+        return rate, "I" in columns
+
+
+class _ProgressReporter:
+    """Forwards progress at most every ``PROGRESS_INTERVAL`` seconds and ``PROGRESS_BYTES``."""
+
+    def __init__(self, callback, total: int, bytes_total: int, token: Optional[CancelToken]) -> None:
+        self.callback = callback
+        self.total = total
+        self.bytes_total = bytes_total
+        self.token = token
+        self.current = 0
+        self._started = time.perf_counter()
+        self._callback_time = 0.0
+        self._last_time = float("-inf")
+        self._last_bytes = -PROGRESS_BYTES
+
+    def update(self, current: Optional[int], bytes_done: int, force: bool = False) -> None:
+        if self.token is not None:
+            self.token.check()
+        if current is not None:
+            self.current = current
+        if self.callback is None:
+            return
+        if not force and bytes_done - self._last_bytes < PROGRESS_BYTES:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_time < PROGRESS_INTERVAL:
+            return
+        self._last_time = now
+        self._last_bytes = bytes_done
+        elapsed = now - self._started - self._callback_time
+        self.callback(ExportProgress(self.current, self.total, bytes_done, self.bytes_total, elapsed))
+        self._callback_time += time.perf_counter() - now
+
+
+@dataclass(frozen=True)
+class SplitOutput:
+    """One file of :meth:`DataFlashExporter.export_split`: the messages inside ``keep``."""
+
+    destination: Path
+    keep: Tuple[Segment, ...]
+
+
+class _Sink:
+    """One output of an export pass and the state that selects its records.
+
+    ``segments`` are the times to keep when ``inside`` is true and the
+    times to remove otherwise. Header records always pass.
+    """
+
+    def __init__(
+        self,
+        out,
+        segments: Iterable[Segment],
+        inside: bool,
+        policy: Optional[TypePolicy],
+        formats: Optional[bytearray],
+    ) -> None:
+        self.out = out
+        self.segments = SegmentSet(segments)
+        self.inside = inside
+        self.type_filter = _TypeFilter(policy) if policy is not None else None
+        self.formats = formats
+        self.copier: Optional[_SpanCopier] = None
+        self._cursor = self.segments.cursor()
+        # The segment answer holds for times in [_since, _until); only times outside re-query the cursor.
+        self._selected = False
+        self._since = math.inf
+        self._until = -math.inf
+
+    def classify(self, lo: float, hi: float) -> Tuple[bool, bool]:
+        """Return whether every and whether any time in ``[lo, hi]`` is selected."""
+        if self.inside:
+            return self.segments.covers(lo, hi), self.segments.overlaps(lo, hi)
+        return not self.segments.overlaps(lo, hi), not self.segments.covers(lo, hi)
+
+    def wants(self, msg_type: str, timestamp: float, msg, whole: bool = False) -> bool:
+        if msg_type in HEADER_TYPES:
+            return True
+        if not whole:
+            if not self._since <= timestamp < self._until:
+                self._recheck(timestamp)
+            if not self._selected:
+                return False
+        return self.type_filter is None or self.type_filter.keep(msg_type, timestamp, msg)
+
+    def _recheck(self, timestamp: float) -> None:
+        inside = self._cursor.contains(timestamp)
+        boundary = self._cursor.next_boundary()
+        self._selected = inside == self.inside
+        self._since = timestamp
+        # A segment's end is still inside it.
+        self._until = math.nextafter(boundary, math.inf) if inside else boundary
+
+    def write_record(self, msg_type: str, raw) -> None:
+        self.out.write(raw)
+        if self.formats is not None and msg_type == "FMT":
+            self.formats += raw
 
 
 class DataFlashExporter:
@@ -27,19 +270,252 @@ class DataFlashExporter:
         remove_segments: Iterable[Segment],
         progress_cb=None,
         total_messages: int | None = None,
+        index: Optional[LogIndex] = None,
+        byte_ranges: bool = True,
+        cancel_token: Optional[CancelToken] = None,
+        policy: Optional[TypePolicy] = None,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
     ) -> None:
-        remove_list = normalize_segments(remove_segments)
-        reader = DataFlashParser(self.source)
-        index = 0
-        total = total_messages or 0
-        with open(destination, "wb") as dest_fp:
-            for _, timestamp, msg in reader.iter_messages():
-                if not remove_contains_time(remove_list, timestamp):
-                    # DFReader exposes the raw bytes via the message for DataFlash logs.
-                    raw = getattr(msg, "_buf", None)
-                    if raw is not None:
-                        dest_fp.write(raw)
-                index += 1
-                if progress_cb:
-                    progress_cb(ExportProgress(current=index, total=total))
+        """Write the log without the messages inside ``remove_segments``.
+
+        Header records (``HEADER_TYPES``) are always kept so the output
+        parses. With ``byte_ranges`` the kept spans are located through a
+        :class:`LogIndex` (built here unless ``index`` is given) and copied
+        in bulk (together with any stray bytes between records); only index
+        blocks that straddle a cut or hold header records are decoded. Logs
+        the raw scanner cannot read are re-serialized message by message.
+
+        The output is written to a temporary file next to ``destination``
+        and renamed over it only on success. ``progress_cb`` receives
+        throttled :class:`ExportProgress` updates; cancelling
+        ``cancel_token`` stops the export with :class:`ExportCancelled`.
+
+        ``policy`` additionally drops or decimates message types in the same
+        pass; blocks it touches are walked record by record instead of
+        being copied whole. ``compression`` (``"zlib"`` or ``"lzma"``)
+        writes a block-compressed container (see :mod:`core.compressed`)
+        instead of a plain log, compressing in a thread pool as the export
+        streams.
+        """
+        self._run(
+            "export",
+            [(destination, remove_segments, False)],
+            progress_cb,
+            total_messages,
+            index,
+            byte_ranges,
+            cancel_token,
+            policy,
+            compression,
+            compression_level,
+        )
         logger.info("Exported trimmed log to %s", destination)
+
+    def export_split(
+        self,
+        outputs: Sequence[SplitOutput],
+        progress_cb=None,
+        index: Optional[LogIndex] = None,
+        byte_ranges: bool = True,
+        cancel_token: Optional[CancelToken] = None,
+        policy: Optional[TypePolicy] = None,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+    ) -> None:
+        """Write one log per :class:`SplitOutput`, each holding the messages inside its ``keep`` ranges.
+
+        All outputs are filled from a single read of the source, and each
+        gets every header record. Options behave as in :meth:`export`;
+        the outputs are renamed into place together once all of them are
+        complete.
+        """
+        if not outputs:
+            raise ValueError("export_split needs at least one output")
+        self._run(
+            "split",
+            [(output.destination, output.keep, True) for output in outputs],
+            progress_cb,
+            None,
+            index,
+            byte_ranges,
+            cancel_token,
+            policy,
+            compression,
+            compression_level,
+        )
+        logger.info("Split %s into %d logs", self.source, len(outputs))
+
+    def _run(
+        self,
+        kind: str,
+        targets: Sequence[Tuple[Path, Iterable[Segment], bool]],
+        progress_cb,
+        total_messages: Optional[int],
+        index: Optional[LogIndex],
+        byte_ranges: bool,
+        cancel_token: Optional[CancelToken],
+        policy: Optional[TypePolicy],
+        compression: Optional[str],
+        compression_level: Optional[int],
+    ) -> None:
+        detail = ", ".join(str(destination) for destination, _, _ in targets)
+        with METRICS.run(kind, self.source, detail) as metrics:
+            size = self.source.stat().st_size
+            reporter = _ProgressReporter(progress_cb, total_messages or 0, size, cancel_token)
+            if byte_ranges and index is None:
+                with metrics.stage("index"):
+                    index = DataFlashParser(self.source).build_index()
+            if index is not None:
+                metrics.messages = index.message_count
+                metrics.type_counts = dict(index.type_counts)
+                reporter.total = reporter.total or index.message_count
+                if policy is not None and not policy.affects(index.type_counts):
+                    policy = None
+            else:
+                metrics.messages = total_messages or 0
+            metrics.bytes = size
+            partials = [destination.with_name(f".{destination.name}.part") for destination, _, _ in targets]
+            reporter.update(0, 0)
+            try:
+                with ExitStack() as stack:
+                    sinks = []
+                    for (_, segments, inside), partial in zip(targets, partials):
+                        out = stack.enter_context(open(partial, "wb"))
+                        if compression:
+                            out = stack.enter_context(BlockWriter(out, compression, compression_level))
+                        # The container stores the FMT records so readers can start at any block.
+                        formats = out.formats if compression else None
+                        sinks.append(_Sink(out, segments, inside, policy, formats))
+                    if byte_ranges and index.has_offsets:
+                        with metrics.stage("copy ranges"):
+                            self._export_ranges(sinks, index, reporter)
+                    else:
+                        with metrics.stage("write records"):
+                            self._export_records(sinks, reporter)
+                for (destination, _, _), partial in zip(targets, partials):
+                    os.replace(partial, destination)
+            except BaseException:
+                for partial in partials:
+                    try:
+                        partial.unlink()
+                    except OSError:
+                        pass
+                raise
+            reporter.update(reporter.total, reporter.bytes_total, force=True)
+
+    def _export_records(self, sinks: Sequence[_Sink], reporter: _ProgressReporter) -> None:
+        count = 0
+        for _, timestamp, msg in DataFlashParser(self.source).iter_records():
+            msg_type = msg.get_type()
+            raw = None
+            for sink in sinks:
+                if sink.wants(msg_type, timestamp, msg):
+                    if raw is None:
+                        # Raw-scanner records are written as slices of the mapped file, without a copy.
+                        raw = msg.get_msgview() if isinstance(msg, RecordView) else msg.get_msgbuf()
+                        if raw is None:
+                            break
+                    sink.write_record(msg_type, raw)
+            count += 1
+            if count % PROGRESS_RECORDS == 0:
+                reporter.update(count, getattr(msg, "offset", 0))
+
+    def _export_ranges(self, sinks: Sequence[_Sink], index: LogIndex, reporter: _ProgressReporter) -> None:
+        with DataFlashScanner(self.source) as scanner:
+            for sink in sinks:
+                sink.copier = _SpanCopier(scanner, sink.out, reporter)
+            for block, first_index in enumerate(index.message_numbers):
+                start, end = index.block_span(block)
+                lo, hi = index.min_times[block], index.max_times[block]
+                pinned = index.pinned[block]
+                walking = []
+                for sink in sinks:
+                    whole, partly = sink.classify(lo, hi)
+                    if whole and not pinned and sink.type_filter is None:
+                        sink.copier.add(start, end)
+                    elif pinned or partly:
+                        # Pinned blocks are always walked so their FMT records reach the scanner.
+                        walking.append((sink, whole))
+                if walking:
+                    for _, timestamp, record in scanner.iter_records(start, end, first_index):
+                        name = record.fmt.name
+                        record_end = record.offset + record.fmt.length
+                        for sink, whole in walking:
+                            if sink.wants(name, timestamp, record, whole):
+                                sink.copier.add(record.offset, record_end)
+                                if sink.formats is not None and name == "FMT":
+                                    sink.formats += scanner.span(record.offset, record_end)
+                reporter.update(first_index, end)
+            for sink in sinks:
+                sink.copier.flush()
+
+
+class _SpanCopier:
+    """Coalesces adjacent byte ranges of the source and copies them in bulk.
+
+    Uses ``os.copy_file_range`` or ``os.sendfile`` where the platform
+    supports file-to-file copies. Otherwise, and for outputs that are not
+    files (a :class:`BlockWriter`), slices of the scanner's mapping are
+    written straight to the output and their pages released afterwards, so
+    neither a copy nor the resident size grows with the span.
+    """
+
+    def __init__(self, source: DataFlashScanner, dest, reporter: Optional[_ProgressReporter] = None) -> None:
+        self.source = source
+        self.src_fd = source.fileno()
+        self.dest = dest
+        self.dst_fd = dest.fileno() if hasattr(dest, "fileno") else None
+        self.reporter = reporter
+        self._start = 0
+        self._end = 0
+        in_kernel = self.dst_fd is not None
+        self._copy_file_range = getattr(os, "copy_file_range", None) if in_kernel else None
+        self._sendfile = getattr(os, "sendfile", None) if in_kernel else None
+
+    def add(self, start: int, end: int) -> None:
+        if start == self._end:
+            self._end = end
+        else:
+            self.flush()
+            self._start, self._end = start, end
+        # Copy as the scan goes rather than all at the end, so progress is real.
+        if self._end - self._start >= COPY_CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        offset, remaining = self._start, self._end - self._start
+        self._start = self._end = 0
+        while remaining > 0:
+            copied = self._copy(offset, min(remaining, COPY_CHUNK))
+            if copied <= 0:
+                raise OSError(f"Unexpected end of source while copying at offset {offset}")
+            offset += copied
+            remaining -= copied
+            if self.reporter is not None and remaining > 0:
+                self.reporter.update(None, offset)
+
+    def _copy(self, offset: int, count: int) -> int:
+        if self._copy_file_range is not None:
+            try:
+                return self._copy_file_range(self.src_fd, self.dst_fd, count, offset)
+            except OSError:
+                self._copy_file_range = None
+        if self._sendfile is not None:
+            try:
+                return self._sendfile(self.dst_fd, self.src_fd, offset, count)
+            except OSError:
+                self._sendfile = None
+        data = self.source.span(offset, offset + count)
+        count = len(data)
+        try:
+            if self.dst_fd is None:
+                self.dest.write(data)
+            else:
+                written = 0
+                while written < len(data):
+                    written += os.write(self.dst_fd, data[written:])
+        finally:
+            data.release()
+        self.source.release(offset, offset + count)
+        return count
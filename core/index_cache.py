@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .log_parser import LogIndex
+
+if TYPE_CHECKING:
+    from .channels import ChannelStore, MessageColumns
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LTIX"
+VERSION = 2
+SUFFIX = ".lti"
+HASH_BLOCK = 64 * 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Column name -> array typecode, in on-disk order.
+COLUMNS = (
+    ("timestamps", "d"),
+    ("min_times", "d"),
+    ("max_times", "d"),
+    ("message_numbers", "q"),
+    ("offsets", "q"),
+    ("pinned", "B"),
+)
+# Per-type columns of a ChannelStore, written after the index columns.
+TYPE_COLUMNS = (("times", "d"), ("offsets", "q"))
+
+_PREAMBLE = struct.Struct("<4sII")
+
+
+def default_cache_dir() -> Path:
+    return Path.home() / ".log-trimmer" / "cache"
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    size: int
+    mtime_ns: int
+    digest: str
+
+    @classmethod
+    def for_file(cls, path: Path) -> "CacheKey":
+        """Key a log by size, mtime and a hash of its first, middle and last 64 KiB."""
+        stat = path.stat()
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as fp:
+            for offset in sorted({0, max(0, stat.st_size // 2 - HASH_BLOCK // 2), max(0, stat.st_size - HASH_BLOCK)}):
+                fp.seek(offset)
+                hasher.update(fp.read(HASH_BLOCK))
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=hasher.hexdigest())
+
+    @property
+    def name(self) -> str:
+        return hashlib.blake2b(f"{self.size}:{self.mtime_ns}:{self.digest}".encode(), digest_size=16).hexdigest()
+
+
+class IndexCache:
+    """Persistent store of :class:`LogIndex` sidecars.
+
+    A sidecar is a small JSON header followed by the raw index columns,
+    each 8-byte aligned so the file can also be memory-mapped directly.
+    Given the :class:`ChannelStore` of the same load, it also keeps the
+    time and record offset columns of every message type, so a cached
+    open fills the store without scanning the log.
+    Entries live in ``directory`` (least recently used ones are evicted
+    once the directory grows past ``max_bytes``) or, with ``next_to_log``,
+    beside the log as ``<log>.lti``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        next_to_log: bool = False,
+    ) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.next_to_log = next_to_log
+
+    def load(self, log_path: Path, stride: int, channels: Optional["ChannelStore"] = None) -> Optional[LogIndex]:
+        """Return the cached index of an unchanged ``log_path``, or ``None``.
+
+        If the sidecar holds channel columns, they are added to an empty
+        ``channels``; otherwise ``channels`` is left empty.
+        """
+        key = CacheKey.for_file(log_path)
+        for candidate in self._candidates(log_path, key):
+            if not candidate.exists():
+                continue
+            try:
+                entry = _read_sidecar(candidate, key, stride, channels is not None)
+            except (OSError, ValueError) as exc:
+                logger.warning("Discarding unreadable index cache %s: %s", candidate, exc)
+                _unlink(candidate)
+                continue
+            if entry is None:
+                continue
+            index, types = entry
+            for columns in types:
+                channels.add_type(columns)
+            _touch(candidate)
+            logger.info("Loaded cached index for %s from %s", log_path, candidate)
+            return index
+        return None
+
+    def store(self, log_path: Path, index: LogIndex, channels: Optional["ChannelStore"] = None) -> Path:
+        key = CacheKey.for_file(log_path)
+        target = self._candidates(log_path, key)[0]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        _write_sidecar(tmp, key, index, _stored_types(channels))
+        os.replace(tmp, target)
+        if not self.next_to_log:
+            self.evict()
+        return target
+
+    def evict(self) -> None:
+        entries = []
+        for entry in self.directory.glob("*" + SUFFIX):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _unlink(entry)
+            total -= size
+
+    def _candidates(self, log_path: Path, key: CacheKey) -> list[Path]:
+        cached = self.directory / (key.name + SUFFIX)
+        beside = log_path.with_name(log_path.name + SUFFIX)
+        return [beside, cached] if self.next_to_log else [cached, beside]
+
+
+def _stored_types(channels: Optional["ChannelStore"]) -> List["MessageColumns"]:
+    """Every type of ``channels``, or none unless all of them can be decoded from record offsets."""
+    if channels is None:
+        return []
+    types = [channels.get_type(name) for name in channels.all_types()]
+    if any(columns.fmt is None or len(columns.offsets) != len(columns.times) for columns in types):
+        return []
+    return types
+
+
+def _write_sidecar(path: Path, key: CacheKey, index: LogIndex, types: List["MessageColumns"]) -> None:
+    header = {
+        "key": {"size": key.size, "mtime_ns": key.mtime_ns, "digest": key.digest},
+        "stride": index.stride,
+        "end_offset": index.end_offset,
+        "end_time": index.end_time,
+        "type_counts": index.type_counts,
+        "lengths": {name: len(getattr(index, name)) for name, _ in COLUMNS},
+        "types": [
+            {
+                "type_id": columns.fmt.type_id,
+                "name": columns.name,
+                "length": columns.fmt.length,
+                "format": columns.format,
+                "columns": columns.fmt.columns,
+                "count": len(columns.times),
+            }
+            for columns in types
+        ],
+    }
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    with open(path, "wb") as fp:
+        fp.write(_PREAMBLE.pack(MAGIC, VERSION, len(encoded)))
+        fp.write(encoded)
+        for name, typecode in COLUMNS:
+            fp.write(b"\0" * (-fp.tell() % 8))
+            column = getattr(index, name)
+            fp.write(column.tobytes() if isinstance(column, array) else array(typecode, column).tobytes())
+        for columns in types:
+            for name, _ in TYPE_COLUMNS:
+                fp.write(b"\0" * (-fp.tell() % 8))
+                fp.write(getattr(columns, name).tobytes())
+
+
+def _read_sidecar(
+    path: Path, key: CacheKey, stride: int, with_types: bool = False
+) -> Optional[Tuple[LogIndex, List["MessageColumns"]]]:
+    """Read a sidecar; ``None`` if it is for another file state or stride, ``ValueError`` if it is malformed."""
+    with open(path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < _PREAMBLE.size:
+            raise ValueError("truncated index sidecar")
+        magic, version, header_len = _PREAMBLE.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not an index sidecar")
+        if version != VERSION:
+            return None
+        cursor = _PREAMBLE.size + header_len
+        header = json.loads(data[_PREAMBLE.size : cursor])
+        try:
+            if CacheKey(**header["key"]) != key or header["stride"] != stride:
+                return None
+            columns = {}
+            for name, typecode in COLUMNS:
+                columns[name], cursor = _read_column(data, cursor, typecode, header["lengths"][name])
+            types = _read_types(data, cursor, header["types"]) if with_types else []
+            index = LogIndex(
+                type_counts=dict(header["type_counts"]),
+                stride=int(header["stride"]),
+                end_offset=int(header["end_offset"]),
+                end_time=float(header["end_time"]),
+                **columns,
+            )
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f"malformed index sidecar header: {exc!r}") from exc
+    return index, types
+
+
+def _read_types(data: mmap.mmap, cursor: int, entries: List[dict]) -> List["MessageColumns"]:
+    from .channels import MessageColumns
+    from .dataflash import MessageFormat
+
+    types = []
+    for entry in entries:
+        fmt = MessageFormat(entry["type_id"], entry["name"], entry["length"], entry["format"], entry["columns"])
+        stored = MessageColumns(fmt.name, fmt.columns, fmt.format, fmt)
+        parts = {}
+        for name, typecode in TYPE_COLUMNS:
+            parts[name], cursor = _read_column(data, cursor, typecode, entry["count"])
+        stored.extend(parts["times"], parts["offsets"])
+        types.append(stored)
+    return types
+
+
+def _read_column(data: mmap.mmap, cursor: int, typecode: str, length: int) -> Tuple[array, int]:
+    """Read an 8-byte aligned column of ``length`` items at ``cursor``; return it and the cursor past it."""
+    cursor += -cursor % 8
+    column = array(typecode)
+    end = cursor + length * column.itemsize
+    if length < 0 or end > len(data):
+        raise ValueError("truncated index sidecar")
+    column.frombytes(data[cursor:end])
+    return column, end
+
+
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        pass
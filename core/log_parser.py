@@ -1,36 +1,101 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
+import time
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field, replace
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import TYPE_CHECKING, Callable, Collection, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
 
-from pymavlink import DFReader
+from .dataflash import (
+    HEADER_TYPES,
+    DataFlashFormatError,
+    DataFlashScanner,
+    MessageFormat,
+    RecordView,
+)
+from .metrics import METRICS, RunMetrics, current_rss_bytes
+
+if TYPE_CHECKING:
+    from .channels import BinnedChannelStore, BinnedColumns, ChannelStore, MessageColumns, TimeSeries
+    from .index_cache import IndexCache
+    from .segments import Segment
+    from .type_stats import TypeTable
 
 logger = logging.getLogger(__name__)
 
+# A progressive load looks at the clock once per this many messages.
+PROGRESS_CHECK = 2048
+# Minimum spacing of LoadBatch updates, in seconds.
+PROGRESS_INTERVAL = 0.2
+# A budgeted load samples the resident size once per this many messages.
+MEMORY_CHECK = 1 << 16
+
+# Sizing of a memory budget (see DataFlashParser.load). Record counts are
+# estimated from the file size and the mean record length in the log's first
+# SAMPLE_BYTES; logs that cannot be sampled are taken to hold only the
+# smallest records in practice, so the plan errs towards using less memory.
+MIN_RECORD_BYTES = 16
+SAMPLE_BYTES = 4 * 1024 * 1024
+# Share of the budget the sparse index may use; the channels get the rest.
+INDEX_SHARE = 0.125
+# Bytes per index entry (four 8-byte columns, offsets and the pinned flag) and per
+# record a ChannelStore keeps (its time and offset).
+INDEX_ENTRY_BYTES = 41
+RECORD_BYTES = 16
+# Vehicles by the firmware name that opens a log's MSG records and by VER.BT (ArduPilot's APM_BUILD_* values).
+FIRMWARE_VEHICLES = {"ArduPlane": "plane", "ArduCopter": "copter", "ArduRover": "rover", "ArduSub": "sub"}
+BUILD_VEHICLES = {1: "rover", 2: "copter", 3: "plane", 7: "sub", 13: "copter"}
+# The firmware banner is among the first MSG records; later ones are flight events.
+BANNER_MESSAGES = 5
+
 
 @dataclass
 class LogInfo:
+    """Totals of a log; ``types`` breaks them down per message type once a load has counted them."""
+
     path: Path
     size_bytes: int
     message_count: int
     start_time: float
     end_time: float
     log_type: str
+    types: Optional[TypeTable] = field(default=None, compare=False, repr=False)
 
 
 @dataclass
-class TimeSeries:
-    name: str
-    times: List[float]
-    values: List[float]
+class LogIndex:
+    """Sparse index with one entry per block of ``stride`` messages.
 
+    Entry ``i`` covers the messages from ``message_numbers[i]`` up to the
+    next entry: ``timestamps`` holds the time of its first message,
+    ``min_times``/``max_times`` the range of all its timestamps and
+    ``pinned`` whether it contains header records (see ``HEADER_TYPES``).
+    ``offsets`` holds each block's byte offset and ``end_offset`` the end of
+    the last record; both stay empty when the log was read through DFReader.
+    ``type_counts`` counts messages per type over the whole log.
+    ``stride`` trades index size for how many extra records a
+    :meth:`DataFlashParser.read_window` decodes at each end of a window.
 
-@dataclass
-class LogIndex:
-    timestamps: List[float]
-    message_numbers: List[int]
+    Columns are typed arrays so the index stays compact and can be written
+    to and read from the sidecar cache without per-entry conversion.
+    """
+
+    timestamps: array = field(default_factory=lambda: array("d"))
+    message_numbers: array = field(default_factory=lambda: array("q"))
+    min_times: array = field(default_factory=lambda: array("d"))
+    max_times: array = field(default_factory=lambda: array("d"))
+    pinned: array = field(default_factory=lambda: array("B"))
+    offsets: array = field(default_factory=lambda: array("q"))
+    type_counts: Dict[str, int] = field(default_factory=dict)
+    stride: int = 50
+    end_offset: int = 0
+    end_time: float = 0.0
+    # Running max of ``max_times`` and running min of ``min_times`` from the end, for bisecting.
+    _bounds: Optional[Tuple[List[float], List[float]]] = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def start(self) -> float:
@@ -38,14 +103,575 @@ class LogIndex:
 
     @property
     def end(self) -> float:
-        return self.timestamps[-1] if self.timestamps else 0.0
+        return self.end_time
+
+    @property
+    def message_count(self) -> int:
+        return sum(self.type_counts.values())
 
+    @property
+    def has_offsets(self) -> bool:
+        return bool(self.offsets) and len(self.offsets) == len(self.timestamps)
 
-class DataFlashParser:
+    def memory_bytes(self) -> int:
+        columns = (self.timestamps, self.message_numbers, self.min_times, self.max_times, self.pinned, self.offsets)
+        return sum(len(column) * column.itemsize for column in columns)
+
+    def snapshot(self) -> "LogIndex":
+        """Return a copy that later :class:`LogFollower` growth does not reach."""
+        return replace(
+            self,
+            timestamps=array("d", self.timestamps),
+            message_numbers=array("q", self.message_numbers),
+            min_times=array("d", self.min_times),
+            max_times=array("d", self.max_times),
+            pinned=array("B", self.pinned),
+            offsets=array("q", self.offsets),
+            type_counts=dict(self.type_counts),
+        )
+
+    def block_span(self, block: int) -> Tuple[int, int]:
+        end = self.offsets[block + 1] if block + 1 < len(self.offsets) else self.end_offset
+        return self.offsets[block], end
+
+    def blocks_between(self, t0: float, t1: float) -> range:
+        """Return the blocks that can hold messages timed within ``[t0, t1]``.
+
+        Timestamps are only roughly ordered in a log, so the search bisects
+        monotonic envelopes of the block ranges: blocks before the result
+        end before ``t0`` and blocks after it start after ``t1``.
+        """
+        if self._bounds is None or len(self._bounds[0]) != len(self.max_times):
+            suffix_min = list(accumulate(reversed(self.min_times), min))
+            suffix_min.reverse()
+            self._bounds = (list(accumulate(self.max_times, max)), suffix_min)
+        running_max, suffix_min = self._bounds
+        first = bisect_left(running_max, t0)
+        return range(first, max(first, bisect_right(suffix_min, t1)))
+
+
+@dataclass
+class LoadedLog:
+    info: LogInfo
+    channels: Union[ChannelStore, BinnedChannelStore]
+    index: LogIndex
+
+    def vehicle(self) -> Optional[str]:
+        """Return the vehicle (``"plane"``, ``"copter"``, …) named by the log's VER or MSG records.
+
+        Only the VER record and the first ``BANNER_MESSAGES`` MSG records
+        are read, so this stops early in a log that names no vehicle.
+        """
+        left = {"VER": min(self.index.type_counts.get("VER", 0), 1),
+                "MSG": min(self.index.type_counts.get("MSG", 0), BANNER_MESSAGES)}
+        if not any(left.values()):
+            return None
+        for _, _, msg in DataFlashParser(self.info.path).iter_records():
+            msg_type = msg.get_type()
+            if not left.get(msg_type):
+                continue
+            if msg_type == "VER":
+                vehicle = BUILD_VEHICLES.get(int(getattr(msg, "BT", 0) or 0))
+            else:
+                vehicle = FIRMWARE_VEHICLES.get(str(getattr(msg, "Message", "")).split(" ", 1)[0])
+            if vehicle is not None:
+                return vehicle
+            left[msg_type] -= 1
+            if not any(left.values()):
+                break
+        return None
+
+    def query(self, text: str, vehicle: Optional[str] = None) -> List[Segment]:
+        """Return the time ranges where the condition ``text`` holds (see :mod:`core.query`).
+
+        Mode names stand for the mode numbers of ``vehicle``, by default the
+        one the log names (see :meth:`vehicle`).
+        """
+        from .query import parse_query
+
+        if vehicle is None:
+            vehicle = self.vehicle()
+        with METRICS.run("query", self.info.path, text) as metrics:
+            stats: Dict[str, int] = {}
+            query = parse_query(text)
+            segments = query.evaluate(self.channels, self.info.start_time, self.info.end_time, vehicle, stats)
+            metrics.messages = stats["samples"]
+        return segments
+
+
+@dataclass(frozen=True)
+class MemoryPlan:
+    """How a load fits a memory budget: the index stride and whether channels are binned."""
+
+    stride: int
+    binned: bool
+    channel_budget: int
+
+    @classmethod
+    def for_size(
+        cls, size_bytes: int, budget: int, stride: int = 50, record_bytes: float = MIN_RECORD_BYTES
+    ) -> "MemoryPlan":
+        """Plan for a log of ``size_bytes`` whose records are ``record_bytes`` long on average."""
+        records = int(size_bytes / max(record_bytes, 1)) + 1
+        index_budget = max(int(budget * INDEX_SHARE), INDEX_ENTRY_BYTES)
+        stride = max(stride, -(-records * INDEX_ENTRY_BYTES // index_budget))
+        channel_budget = budget - index_budget
+        return cls(stride, records * RECORD_BYTES > channel_budget, channel_budget)
+
+
+@dataclass(eq=False)
+class LoadBatch:
+    """Progress of a load: how far the scan got and what it found so far.
+
+    ``start_time``/``end_time`` are provisional until the final batch and
+    ``chunks`` holds, per watched channel, only the samples decoded since
+    the previous batch.
+    """
+
+    bytes_done: int
+    bytes_total: int
+    messages: int
+    start_time: float
+    end_time: float
+    chunks: Dict[str, "TimeSeries"] = field(default_factory=dict)
+    final: bool = False
+
+    @property
+    def fraction(self) -> float:
+        return min(self.bytes_done / self.bytes_total, 1.0) if self.bytes_total else 0.0
+
+
+class ScanSubscriber(ABC):
+    """Consumer of a :class:`LogScan` pass.
+
+    Subscribers never iterate the log themselves; the scan pushes every
+    message to them and calls :meth:`finish` once the pass is over. A
+    subscriber that needs no further messages sets ``done`` so the scan can
+    stop early when nobody is listening any more.
+    """
+
+    done = False
+
+    @abstractmethod
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        """Receive one message; ``msg`` may be a view that is only valid during the call."""
+
+    def finish(self) -> None:
+        pass
+
+
+class SummaryBuilder(ScanSubscriber):
     def __init__(self, path: Path) -> None:
         self.path = path
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.count = 0
+        self.result: Optional[LogInfo] = None
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        if self.count == 0:
+            self.start_time = timestamp
+        self.end_time = timestamp
+        self.count = msg_index + 1
+
+    def finish(self) -> None:
+        self.result = LogInfo(
+            path=self.path,
+            size_bytes=self.path.stat().st_size,
+            message_count=self.count,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            log_type="DataFlash",
+        )
+
+
+_UNSEEN = object()
+
+
+class ChannelBuilder(ScanSubscriber):
+    """Fills a :class:`ChannelStore` with per-type times and record offsets."""
+
+    def __init__(self, parser: "DataFlashParser", reader: Optional[Callable[[], Iterable]] = None) -> None:
+        from .channels import ChannelStore
+
+        self.result = ChannelStore(parser.path, reader=reader or parser.iter_records)
+        # Whether record offsets point into ``parser.path`` (not for compressed containers).
+        self.mapped = not parser.compressed
+        self._by_format: Dict[object, Optional[MessageColumns]] = {}
+        self._raw = False
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        columns = self._by_format.get(msg.fmt, _UNSEEN)
+        if columns is _UNSEEN:
+            self._raw = self.mapped and isinstance(msg, RecordView)
+            columns = self._register(msg.fmt)
+        if columns is not None:
+            columns.append(timestamp, msg.offset if self._raw else -1)
+
+    def finish(self) -> None:
+        self.result.flush()
+
+    def _register(self, fmt) -> Optional[MessageColumns]:
+        from .channels import MessageColumns
+
+        columns = self.result.get_type(fmt.name)
+        if columns is None:
+            columns = MessageColumns(fmt.name, fmt.columns, fmt.format, fmt if self._raw else None)
+            self.result.add_type(columns)
+        elif columns.format != fmt.format:
+            logger.warning("Ignoring %s records after its format changed to %s", fmt.name, fmt.format)
+            columns = None
+        self._by_format[fmt] = columns
+        return columns
+
+
+class BinnedChannelBuilder(ScanSubscriber):
+    """Streams every numeric field into a :class:`BinnedChannelStore` of ``budget`` bytes."""
+
+    def __init__(self, parser: "DataFlashParser", budget: int) -> None:
+        from .channels import BinnedChannelStore
+
+        self.result = BinnedChannelStore(parser.path, budget)
+        self.mapped = not parser.compressed
+        self._by_format: Dict[object, Optional[BinnedColumns]] = {}
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        columns = self._by_format.get(msg.fmt, _UNSEEN)
+        if columns is _UNSEEN:
+            columns = self._register(msg)
+        if columns is not None:
+            columns.append(timestamp, msg)
+
+    def finish(self) -> None:
+        self.result.close()
+
+    def _register(self, msg) -> Optional[BinnedColumns]:
+        fmt = msg.fmt
+        columns = self.result.get_type(fmt.name)
+        if columns is None:
+            columns = self.result.add_type(fmt, self.mapped and isinstance(msg, RecordView))
+        elif columns.format != fmt.format:
+            logger.warning("Ignoring %s records after its format changed to %s", fmt.name, fmt.format)
+            columns = None
+        self._by_format[fmt] = columns
+        return columns
+
+
+class MemoryProbe(ScanSubscriber):
+    """Samples the resident size every ``MEMORY_CHECK`` messages and keeps the peak."""
+
+    def __init__(self) -> None:
+        self.peak = current_rss_bytes()
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        if msg_index % MEMORY_CHECK == 0:
+            self._sample()
+
+    def finish(self) -> None:
+        self._sample()
+
+    def _sample(self) -> None:
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+class IndexBuilder(ScanSubscriber):
+    def __init__(self, stride: int = 50, offsets: bool = True) -> None:
+        self.stride = stride
+        self.offsets = offsets
+        self.result = LogIndex(stride=stride)
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        index = self.result
+        raw = self.offsets and isinstance(msg, RecordView)
+        if msg_index % self.stride == 0:
+            index.timestamps.append(timestamp)
+            index.message_numbers.append(msg_index)
+            index.min_times.append(timestamp)
+            index.max_times.append(timestamp)
+            index.pinned.append(False)
+            if raw:
+                index.offsets.append(msg.offset)
+        elif timestamp < index.min_times[-1]:
+            index.min_times[-1] = timestamp
+        elif timestamp > index.max_times[-1]:
+            index.max_times[-1] = timestamp
+        msg_type = msg.get_type()
+        counts = index.type_counts
+        counts[msg_type] = counts.get(msg_type, 0) + 1
+        if msg_type in HEADER_TYPES:
+            index.pinned[-1] = True
+        if raw:
+            index.end_offset = msg.offset + msg.fmt.length
+        index.end_time = timestamp
+
+
+class ProgressPublisher(ScanSubscriber):
+    """Hands :class:`LoadBatch` updates to ``callback`` while a load scan runs.
+
+    Subscribe it after the summary and channel builders. It reads the clock
+    every ``PROGRESS_CHECK`` messages and publishes at most every
+    ``interval`` seconds, decoding only the new samples of the ``watch``
+    channels, so the work per batch is bounded by the batch itself. A
+    binned store hands over the samples it decoded for its bins instead.
+    ``sent`` counts the samples of each channel already handed out, by a
+    parallel scan that gave up part way.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[LoadBatch], None],
+        summary: SummaryBuilder,
+        channels: Union[ChannelBuilder, BinnedChannelBuilder],
+        watch: Sequence[str] = (),
+        interval: Optional[float] = None,
+        sent: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.callback = callback
+        self.summary = summary
+        self.store = channels.result
+        self.mapped = channels.mapped
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.bytes_total = summary.path.stat().st_size
+        self._binned = isinstance(channels, BinnedChannelBuilder)
+        if self._binned:
+            self.store.stream(watch)
+        self._sent = {channel: (sent or {}).get(channel, 0) for channel in watch}
+        self._check_every = PROGRESS_CHECK
+        self._next_check = self._check_every
+        self._last = time.perf_counter()
+
+    def on_message(self, msg_index: int, timestamp: float, msg: object) -> None:
+        if msg_index < self._next_check:
+            return
+        self._next_check = msg_index + self._check_every
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._publish(getattr(msg, "offset", 0) if self.mapped else 0, final=False)
+
+    def finish(self) -> None:
+        self._publish(self.bytes_total, final=True)
+
+    def _publish(self, bytes_done: int, final: bool) -> None:
+        summary = self.summary
+        self.callback(
+            LoadBatch(
+                bytes_done=bytes_done,
+                bytes_total=self.bytes_total,
+                messages=summary.count,
+                start_time=summary.start_time,
+                end_time=summary.end_time,
+                chunks=self.store.take_streamed() if self._binned else _new_samples(self.store, self._sent),
+                final=final,
+            )
+        )
+
+
+def _new_samples(store: ChannelStore, sent: Dict[str, int]) -> Dict[str, TimeSeries]:
+    """Decode the samples of each channel in ``sent`` past the count recorded there, and advance it."""
+    chunks = {}
+    for channel, done in sent.items():
+        msg_type, _, field_name = channel.partition(".")
+        columns = store.get_type(msg_type)
+        if columns is None or columns.fmt is None or field_name not in columns.fields:
+            continue
+        columns.flush()
+        available = len(columns.times)
+        if available > done:
+            chunks[channel] = store.decode_slice(msg_type, field_name, done, available)
+            sent[channel] = available
+    return chunks
+
+
+Subscriber = TypeVar("Subscriber", bound=ScanSubscriber)
+
+
+class LogScan:
+    """One decoding pass over a log, fanned out to any number of subscribers."""
+
+    def __init__(self, parser: "DataFlashParser") -> None:
+        self.parser = parser
+        self._subscribers: List[ScanSubscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def run(self) -> None:
+        active = list(self._subscribers)
+        if active:
+            for msg_index, timestamp, msg in self.parser.iter_records():
+                for subscriber in active:
+                    subscriber.on_message(msg_index, timestamp, msg)
+                if any(subscriber.done for subscriber in active):
+                    active = [subscriber for subscriber in active if not subscriber.done]
+                    if not active:
+                        break
+        for subscriber in self._subscribers:
+            subscriber.finish()
+
+
+class LogFollower:
+    """Keeps a :class:`LoadedLog` current while its file is still being written.
+
+    Every :meth:`poll` maps the file again and scans only the bytes past
+    the end of the last complete record, with the FMT definitions met so
+    far, then extends the summary, index and channel store in place. A
+    record cut off at the end of the file is picked up whole by a later
+    poll. Series and pyramids handed out by the store grow on their next
+    request (see :meth:`ChannelStore.values`), so each poll costs time in
+    proportion to the appended bytes, not the log.
+
+    Given the ``loaded`` result of an earlier load, the follower extends
+    that in place and starts after its last record; ``stride`` is then the
+    index's own.
+    """
+
+    def __init__(
+        self,
+        parser: "DataFlashParser",
+        stride: int = 50,
+        watch: Sequence[str] = (),
+        loaded: Optional[LoadedLog] = None,
+    ) -> None:
+        if parser.compressed or not parser.raw_scanner:
+            raise ValueError(f"Cannot follow {parser.path}: it must be an uncompressed log read by the raw scanner")
+        self.parser = parser
+        # End of the last complete record; the next poll scans from here.
+        self.offset = 0
+        self._formats: Optional[Dict[int, MessageFormat]] = None
+        self._summary = SummaryBuilder(parser.path)
+        self._channels = ChannelBuilder(parser)
+        self._index = IndexBuilder(loaded.index.stride if loaded is not None else stride)
+        self._subscribers = (self._summary, self._channels, self._index)
+        self._sent = {channel: 0 for channel in watch}
+        self.loaded = LoadedLog(
+            info=LogInfo(parser.path, 0, 0, 0.0, 0.0, "DataFlash"),
+            channels=self._channels.result,
+            index=self._index.result,
+        )
+        if loaded is not None:
+            self._resume(loaded)
+
+    def poll(self) -> LoadBatch:
+        """Scan whatever was appended since the last poll.
+
+        The batch reports the totals so far and, for the ``watch``
+        channels, only the samples this poll found.
+        """
+        path = self.parser.path
+        size = path.stat().st_size
+        if size < self.offset:
+            raise DataFlashFormatError(f"{path} shrank from {self.offset} to {size} bytes; open it again")
+        before = self._summary.count
+        if size - self.offset >= 3:
+            self._scan()
+        info = self.loaded.info
+        info.size_bytes = size
+        info.message_count = self._summary.count
+        info.start_time = self._summary.start_time
+        info.end_time = self._summary.end_time
+        return LoadBatch(
+            bytes_done=self.offset,
+            bytes_total=size,
+            messages=self._summary.count,
+            start_time=info.start_time,
+            end_time=info.end_time,
+            chunks=_new_samples(self._channels.result, self._sent) if self._summary.count > before else {},
+        )
+
+    def _resume(self, loaded: LoadedLog) -> None:
+        from .channels import ChannelStore
+
+        index = loaded.index
+        if not isinstance(loaded.channels, ChannelStore) or not index.has_offsets:
+            raise ValueError(f"Cannot follow {self.parser.path} from a binned load or one without record offsets")
+        summary = self._summary
+        summary.count = loaded.info.message_count
+        summary.start_time, summary.end_time = loaded.info.start_time, loaded.info.end_time
+        self._channels.result = loaded.channels
+        self._index.result = index
+        self.offset = index.end_offset
+        self.loaded = loaded
+        for channel in self._sent:
+            msg_type, _, field_name = channel.partition(".")
+            if field_name in loaded.channels.fields(msg_type):
+                self._sent[channel] = len(loaded.channels.times(msg_type))
+        # Replay the blocks holding FMT records, as read_window does, so the
+        # follower decodes with exactly the formats the load ended with.
+        with DataFlashScanner(self.parser.path) as scanner:
+            for block, pinned in enumerate(index.pinned):
+                if pinned:
+                    start, end = index.block_span(block)
+                    for _ in scanner.iter_records(start, end):
+                        pass
+            self._formats = scanner.formats
+
+    def _scan(self) -> None:
+        with METRICS.run("follow", self.parser.path) as metrics:
+            first, start = self._summary.count, self.offset
+            with DataFlashScanner(self.parser.path, self._formats) as scanner:
+                self._formats = scanner.formats
+                view = None
+                for msg_index, timestamp, view in scanner.iter_records(self.offset, first_index=first):
+                    for subscriber in self._subscribers:
+                        subscriber.on_message(msg_index, timestamp, view)
+                if view is not None:
+                    self.offset = view.offset + view.fmt.length
+            self._channels.finish()
+            # Appends may widen the last block's time range without adding a block.
+            self._index.result._bounds = None
+            metrics.messages = self._summary.count - first
+            metrics.bytes = self.offset - start
+
+
+class DataFlashParser:
+    def __init__(self, path: Path, raw_scanner: bool = True) -> None:
+        self.path = path
+        self.raw_scanner = raw_scanner
+        self._compressed: Optional[bool] = None
+
+    @property
+    def compressed(self) -> bool:
+        """Whether the log is a block-compressed container (see :mod:`core.compressed`)."""
+        if self._compressed is None:
+            from .compressed import is_block_compressed
+
+            self._compressed = is_block_compressed(self.path)
+        return self._compressed
+
+    def iter_records(self, first_block: int = 0) -> Iterable[Tuple[int, float, object]]:
+        """Yield ``(index, timestamp, record)`` using the fastest available reader.
+
+        The raw :class:`DataFlashScanner` is used by default; the yielded
+        record is a view that is only valid until the next iteration. If the
+        file cannot be scanned natively, this falls back to
+        :meth:`iter_messages` and pymavlink ``DFMessage`` objects.
+        Block-compressed containers are decompressed block by block, starting
+        at ``first_block``; their records carry no file offsets.
+        """
+        if self.compressed:
+            from .compressed import BlockReader
+
+            with BlockReader(self.path) as reader:
+                yield from reader.iter_records(first_block)
+            return
+        if self.raw_scanner:
+            try:
+                scanner = DataFlashScanner(self.path)
+            except DataFlashFormatError as exc:
+                logger.warning("Raw scanner unavailable for %s, using DFReader: %s", self.path, exc)
+            else:
+                with scanner:
+                    yield from scanner.iter_records()
+                return
+        yield from self.iter_messages()
 
     def iter_messages(self) -> Iterable[Tuple[int, float, object]]:
+        from pymavlink import DFReader
+
         reader = DFReader.DFReader_binary(str(self.path))
         msg_index = 0
         while True:
@@ -60,88 +686,267 @@ class DataFlashParser:
             yield msg_index, timestamp, msg
             msg_index += 1
 
-    def build_index(self, stride: int = 50) -> LogIndex:
-        timestamps: List[float] = []
-        message_numbers: List[int] = []
-        for msg_index, timestamp, _ in self.iter_messages():
-            if msg_index % stride == 0:
-                timestamps.append(timestamp)
-                message_numbers.append(msg_index)
-        if timestamps and timestamps[-1] != timestamp:
-            timestamps.append(timestamp)
-            message_numbers.append(msg_index)
-        return LogIndex(timestamps=timestamps, message_numbers=message_numbers)
+    def scan(self) -> LogScan:
+        return LogScan(self)
 
-    def summarize(self) -> LogInfo:
-        size_bytes = self.path.stat().st_size
-        start_time = 0.0
-        end_time = 0.0
-        count = 0
-        for msg_index, timestamp, _ in self.iter_messages():
-            if count == 0:
-                start_time = timestamp
-            end_time = timestamp
-            count = msg_index + 1
-        log_type = "DataFlash"
+    def follow(self, stride: int = 50, watch: Sequence[str] = (), loaded: Optional[LoadedLog] = None) -> LogFollower:
+        """Return a :class:`LogFollower`.
+
+        Its first :meth:`~LogFollower.poll` reads what is there so far, or
+        only what was appended since ``loaded`` was loaded.
+        """
+        return LogFollower(self, stride, watch, loaded)
+
+    def load(
+        self,
+        stride: int = 50,
+        cache: Optional["IndexCache"] = None,
+        workers: Optional[int] = 1,
+        progress: Optional[Callable[[LoadBatch], None]] = None,
+        watch: Sequence[str] = (),
+        memory_budget: Optional[int] = None,
+    ) -> LoadedLog:
+        """Summarize, collect channels and index the log in a single pass.
+
+        With a ``cache``, the sidecar of an unchanged file replaces the
+        scan: it holds the index and the per-type time and offset columns
+        of the channel store. A sidecar with the index only (one written by
+        :meth:`build_index`, say) leaves the pass the channel store to fill,
+        and gains the columns afterwards.
+        With ``workers`` other than 1 (``None`` meaning one per CPU), large
+        logs missing from the cache are scanned in parallel chunks by
+        :func:`parallel_load`, which yields the same result.
+
+        ``progress`` receives :class:`LoadBatch` updates while the log is
+        scanned, carrying new samples of the ``watch`` channels
+        (``"TYPE.Field"``); a parallel scan reports one batch per chunk.
+        A load from the cache only sends the final batch.
+
+        ``memory_budget`` bounds, in bytes, what the result keeps (see
+        :class:`MemoryPlan`): the index stride grows with the file, and a
+        log whose records would not fit (counted from the mean record
+        length at its start, see :meth:`mean_record_bytes`) is loaded into a
+        :class:`BinnedChannelStore` in a serial scan. The run's metrics
+        then report what was kept and the resident peak.
+
+        ``info.types`` receives a :class:`TypeTable` of per-type counts,
+        bytes and rates; rates of binned channels are only as fine as their bins.
+        """
+        with METRICS.run("open", self.path) as metrics:
+            plan = None
+            if memory_budget is not None:
+                size = self._raw_size()
+                plan = MemoryPlan.for_size(size, memory_budget, stride)
+                if plan.binned:
+                    # Only sample when the smallest possible records would not fit.
+                    with metrics.stage("sample"):
+                        plan = MemoryPlan.for_size(size, memory_budget, stride, self.mean_record_bytes())
+                stride = plan.stride
+            loaded = self._load(stride, cache, workers, metrics, progress, watch, plan)
+            from .type_stats import TypeTable
+
+            info = loaded.info
+            with metrics.stage("types"):
+                if plan is not None and plan.binned:
+                    info.types = TypeTable.from_binned(loaded.channels, info.start_time, info.end_time)
+                else:
+                    info.types = TypeTable.from_channels(loaded.channels, info.start_time, info.end_time)
+            metrics.messages = loaded.info.message_count
+            metrics.bytes = loaded.info.size_bytes
+            metrics.type_counts = dict(loaded.index.type_counts)
+            if plan is not None:
+                metrics.retained_bytes = loaded.channels.memory_bytes() + loaded.index.memory_bytes()
+                if loaded.info.types is not None:
+                    metrics.retained_bytes += loaded.info.types.memory_bytes()
+        return loaded
+
+    def _load(
+        self,
+        stride: int,
+        cache: Optional["IndexCache"],
+        workers: Optional[int],
+        metrics: RunMetrics,
+        progress: Optional[Callable[[LoadBatch], None]],
+        watch: Sequence[str],
+        plan: Optional[MemoryPlan] = None,
+    ) -> LoadedLog:
+        binned = plan is not None and plan.binned
+        cached = None
+        restored = None
+        if cache is not None:
+            from .channels import ChannelStore
+
+            # A binned load needs every value, so only a full store can come from the cache.
+            restored = None if binned else ChannelStore(self.path, reader=self.iter_records)
+            with metrics.stage("cache lookup"):
+                try:
+                    cached = cache.load(self.path, stride, restored)
+                except OSError as exc:
+                    logger.warning("Index cache lookup failed for %s: %s", self.path, exc)
+        if cached is not None and restored is not None and restored.all_types():
+            info = self.info_from_index(cached)
+            if progress is not None:
+                size = info.size_bytes
+                progress(LoadBatch(size, size, info.message_count, info.start_time, info.end_time, final=True))
+            return LoadedLog(info=info, channels=restored, index=cached)
+        # Samples of the watched channels handed out so far, shared by the parallel and serial scans.
+        sent = {channel: 0 for channel in watch}
+        if cached is None and workers != 1 and self.raw_scanner and not self.compressed and not binned:
+            from .parallel_scan import parallel_load
+
+            with metrics.stage("parallel scan"):
+                loaded = parallel_load(self, stride, workers, progress=progress, sent=sent)
+            if loaded is not None:
+                with metrics.stage("cache store"):
+                    self._store_index(cache, loaded.index, loaded.channels)
+                return loaded
+        # A cached index without channel columns leaves the pass only the channel store to fill.
+        scan = self.scan()
+        summary = scan.subscribe(SummaryBuilder(self.path))
+        if binned:
+            channels = scan.subscribe(BinnedChannelBuilder(self, plan.channel_budget))
+        else:
+            channels = scan.subscribe(ChannelBuilder(self))
+        index = scan.subscribe(IndexBuilder(stride, offsets=not self.compressed)) if cached is None else None
+        if progress is not None:
+            scan.subscribe(ProgressPublisher(progress, summary, channels, watch, sent=sent))
+        probe = scan.subscribe(MemoryProbe()) if plan is not None else None
+        with metrics.stage("scan"):
+            scan.run()
+        if probe is not None:
+            metrics.run_peak_rss_bytes = probe.peak
+        stored = None if binned else channels.result
+        if cached is not None:
+            if stored is not None and self.raw_scanner and not self.compressed:
+                with metrics.stage("cache store"):
+                    self._store_index(cache, cached, stored)
+            return LoadedLog(info=self.info_from_index(cached), channels=channels.result, index=cached)
+        with metrics.stage("cache store"):
+            self._store_index(cache, index.result, stored)
+        return LoadedLog(info=summary.result, channels=channels.result, index=index.result)
+
+    def mean_record_bytes(self, sample_bytes: int = SAMPLE_BYTES) -> float:
+        """Mean length of the records in the first ``sample_bytes`` of the log, header types aside.
+
+        The FMT and parameter records at the start of a log say little about
+        the rest of it, so they are left out. Returns ``MIN_RECORD_BYTES``
+        for logs the raw scanner cannot read directly.
+        """
+        if self.compressed or not self.raw_scanner:
+            return MIN_RECORD_BYTES
+        count = total = 0
+        try:
+            with DataFlashScanner(self.path) as scanner:
+                for _, _, record in scanner.iter_records(0, sample_bytes):
+                    if record.fmt.name not in HEADER_TYPES:
+                        count += 1
+                        total += record.fmt.length
+        except DataFlashFormatError:
+            return MIN_RECORD_BYTES
+        return total / count if count else MIN_RECORD_BYTES
+
+    def _raw_size(self) -> int:
+        """Size of the log itself, also for a block-compressed container."""
+        if self.compressed:
+            from .compressed import BlockReader
+
+            with BlockReader(self.path) as reader:
+                return reader.raw_size
+        return self.path.stat().st_size
+
+    def _store_index(
+        self, cache: Optional["IndexCache"], index: LogIndex, channels: Optional["ChannelStore"] = None
+    ) -> None:
+        if cache is None:
+            return
+        try:
+            cache.store(self.path, index, channels)
+        except OSError as exc:
+            logger.warning("Could not cache index for %s: %s", self.path, exc)
+
+    def info_from_index(self, index: LogIndex) -> LogInfo:
+        """Summarize the log from an index built over it, without reading any records."""
         return LogInfo(
             path=self.path,
-            size_bytes=size_bytes,
-            message_count=count,
-            start_time=start_time,
-            end_time=end_time,
-            log_type=log_type,
+            size_bytes=self.path.stat().st_size,
+            message_count=index.message_count,
+            start_time=index.start,
+            end_time=index.end,
+            log_type="DataFlash",
         )
 
-    def collect_series(self, max_points: int = 6000) -> Dict[str, TimeSeries]:
-        series: Dict[str, TimeSeries] = {
-            "ALT": TimeSeries("ALT", [], []),
-            "GPS_SPEED": TimeSeries("GPS Speed", [], []),
-            "ATT_ROLL": TimeSeries("ATT Roll", [], []),
-            "ATT_PITCH": TimeSeries("ATT Pitch", [], []),
-            "ATT_YAW": TimeSeries("ATT Yaw", [], []),
-            "THR": TimeSeries("Throttle", [], []),
-        }
-        total = 0
-        for _, timestamp, msg in self.iter_messages():
-            total += 1
-            if total % 2 == 0:
-                # light downsampling
-                _append_series(series, timestamp, msg)
-            if total >= max_points:
-                break
-        return series
+    def build_index(self, stride: int = 50) -> LogIndex:
+        with METRICS.run("index", self.path) as metrics:
+            scan = self.scan()
+            index = scan.subscribe(IndexBuilder(stride, offsets=not self.compressed))
+            scan.run()
+            metrics.messages = index.result.message_count
+            metrics.bytes = index.result.end_offset or self.path.stat().st_size
+            metrics.type_counts = dict(index.result.type_counts)
+        return index.result
 
+    def read_window(
+        self, t0: float, t1: float, types: Optional[Collection[str]] = None, index: Optional[LogIndex] = None
+    ) -> ChannelStore:
+        """Decode only the messages timed within ``[t0, t1]``, optionally of ``types`` only.
 
-def _append_series(series: Dict[str, TimeSeries], timestamp: float, msg: object) -> None:
-    msg_type = msg.get_type()
-    if msg_type == "BARO":
-        value = getattr(msg, "Alt", None)
-        if value is not None:
-            series["ALT"].times.append(timestamp)
-            series["ALT"].values.append(float(value))
-    elif msg_type == "GPS":
-        value = getattr(msg, "Spd", None)
-        if value is not None:
-            series["GPS_SPEED"].times.append(timestamp)
-            series["GPS_SPEED"].values.append(float(value))
-    elif msg_type == "ATT":
-        roll = getattr(msg, "Roll", None)
-        pitch = getattr(msg, "Pitch", None)
-        yaw = getattr(msg, "Yaw", None)
-        if roll is not None:
-            series["ATT_ROLL"].times.append(timestamp)
-            series["ATT_ROLL"].values.append(float(roll))
-        if pitch is not None:
-            series["ATT_PITCH"].times.append(timestamp)
-            series["ATT_PITCH"].values.append(float(pitch))
-        if yaw is not None:
-            series["ATT_YAW"].times.append(timestamp)
-            series["ATT_YAW"].values.append(float(yaw))
-    elif msg_type == "RCOU":
-        thr = getattr(msg, "C3", None)
-        if thr is not None:
-            series["THR"].times.append(timestamp)
-            series["THR"].values.append(float(thr))
+        With an ``index`` holding record offsets, the read bisects to the
+        window's first block and stops after its last one; earlier blocks
+        are visited only when pinned, to pick up FMT records. Values are
+        gathered from the mapped file when first requested, as with
+        :meth:`load`. Without an index one is built first, which reads the
+        whole log once; compressed containers and DFReader fallbacks are
+        scanned in full.
+        """
+        if index is None:
+            index = self.build_index()
+        wanted = None if types is None else frozenset(types)
+        with METRICS.run("window", self.path, f"{t0:g}-{t1:g}s") as metrics:
+            channels = ChannelBuilder(self, reader=lambda: self._iter_window(t0, t1, wanted, index))
+            for msg_index, timestamp, msg in self._iter_window(t0, t1, wanted, index):
+                channels.on_message(msg_index, timestamp, msg)
+                metrics.messages += 1
+            channels.finish()
+            blocks = index.blocks_between(t0, t1)
+            if index.has_offsets and not self.compressed and blocks:
+                metrics.bytes = index.block_span(blocks[-1])[1] - index.block_span(blocks[0])[0]
+            else:
+                metrics.bytes = self.path.stat().st_size
+        return channels.result
+
+    def _iter_window(
+        self, t0: float, t1: float, types: Optional[Collection[str]], index: LogIndex
+    ) -> Iterable[Tuple[int, float, object]]:
+        if not index.has_offsets or self.compressed or not self.raw_scanner:
+            records = self.iter_records()
+        else:
+            records = self._iter_blocks(index, index.blocks_between(t0, t1))
+        for msg_index, timestamp, msg in records:
+            if t0 <= timestamp <= t1 and (types is None or msg.get_type() in types):
+                yield msg_index, timestamp, msg
+
+    def _iter_blocks(self, index: LogIndex, blocks: range) -> Iterable[Tuple[int, float, RecordView]]:
+        with DataFlashScanner(self.path) as scanner:
+            for block in range(blocks.start):
+                if index.pinned[block]:
+                    start, end = index.block_span(block)
+                    for _ in scanner.iter_records(start, end):
+                        pass
+            for block in blocks:
+                start, end = index.block_span(block)
+                yield from scanner.iter_records(start, end, index.message_numbers[block])
+
+    def summarize(self) -> LogInfo:
+        scan = self.scan()
+        summary = scan.subscribe(SummaryBuilder(self.path))
+        scan.run()
+        return summary.result
+
+    def collect_channels(self) -> ChannelStore:
+        scan = self.scan()
+        channels = scan.subscribe(ChannelBuilder(self))
+        scan.run()
+        return channels.result
 
 
 def extract_timestamp(msg: object, fallback_index: int) -> float:
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, List
+
+# Records kept in memory for the Diagnostics dialog.
+DEFAULT_CAPACITY = 1000
+# Bytes read per step when tailing a log file from its end.
+TAIL_BLOCK = 64 * 1024
+
+
+@dataclass(frozen=True)
+class LogEntry:
+    """One log record, reduced to plain values when it is emitted."""
+
+    created: float
+    level: int
+    level_name: str
+    logger: str
+    message: str
+    thread: str = ""
+
+    def format(self) -> str:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+        return f"{stamp} [{self.level_name}] {self.logger} - {self.message}"
+
+
+Listener = Callable[[LogEntry], None]
+
+
+class LogBuffer(logging.Handler):
+    """Logging handler that keeps the most recent records in a bounded ring.
+
+    Listeners are called with every new :class:`LogEntry` on the thread
+    that logged it, so a GUI must hop to its own thread before touching
+    widgets.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self._entries: Deque[LogEntry] = deque(maxlen=capacity)
+        self._listeners: List[Listener] = []
+        self._guard = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message += "\n" + logging.Formatter().formatException(record.exc_info)
+            entry = LogEntry(record.created, record.levelno, record.levelname, record.name, message, record.threadName)
+        except Exception:  # noqa: BLE001 - logging must never raise
+            self.handleError(record)
+            return
+        with self._guard:
+            self._entries.append(entry)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(entry)
+            except Exception:  # noqa: BLE001
+                self.handleError(record)
+
+    @property
+    def capacity(self) -> int:
+        return self._entries.maxlen
+
+    def entries(self) -> List[LogEntry]:
+        """Return the buffered records, oldest first."""
+        with self._guard:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._guard:
+            self._entries.clear()
+
+    def subscribe(self, listener: Listener) -> None:
+        with self._guard:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._guard:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+def tail_lines(path: Path, count: int, block: int = TAIL_BLOCK) -> List[str]:
+    """Return the last ``count`` lines of ``path``, reading backwards from its end.
+
+    Only the blocks holding those lines are read, however large the file.
+    """
+    if count <= 0:
+        return []
+    with open(path, "rb") as fp:
+        position = fp.seek(0, os.SEEK_END)
+        data = b""
+        # One more newline than lines wanted, unless the file starts first.
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block, position)
+            position -= step
+            fp.seek(position)
+            data = fp.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-count:]
+
+
+LOG_BUFFER = LogBuffer()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import mmap
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = mmap.PAGESIZE
+
+# Runs kept for the Diagnostics dialog.
+DEFAULT_CAPACITY = 50
+
+
+@dataclass
+class RunMetrics:
+    """Timings and counters of one open, index, series or export run.
+
+    Counters are filled from totals the run already has (summary counts,
+    index type counts, array lengths), never per message, so recording a
+    run costs a few clock reads.
+    """
+
+    kind: str
+    path: str
+    detail: str = ""
+    started_at: float = field(default_factory=time.time)
+    seconds: float = 0.0
+    status: str = "running"
+    messages: int = 0
+    bytes: int = 0
+    stages: Dict[str, float] = field(default_factory=dict)
+    type_counts: Dict[str, int] = field(default_factory=dict)
+    peak_rss_bytes: Optional[int] = None
+    # Bytes the run's result keeps (channels, index) and the resident size sampled at its peak, when measured.
+    retained_bytes: Optional[int] = None
+    run_peak_rss_bytes: Optional[int] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / (1024 * 1024) / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        data["messages_per_second"] = self.messages_per_second
+        data["mb_per_second"] = self.mb_per_second
+        return data
+
+
+class MetricsLog:
+    """Thread-safe ring of the most recent :class:`RunMetrics`."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.enabled = True
+        self._runs: Deque[RunMetrics] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, kind: str, path: Path, detail: str = "") -> Iterator[RunMetrics]:
+        """Time the enclosed block as one run and record it, even if it fails."""
+        metrics = RunMetrics(kind=kind, path=str(path), detail=detail)
+        started = time.perf_counter()
+        try:
+            yield metrics
+        except BaseException as exc:
+            metrics.status = type(exc).__name__
+            raise
+        else:
+            metrics.status = "ok"
+        finally:
+            metrics.seconds = time.perf_counter() - started
+            metrics.peak_rss_bytes = peak_rss_bytes()
+            if self.enabled:
+                with self._lock:
+                    self._runs.append(metrics)
+
+    def recent(self) -> List[RunMetrics]:
+        """Return the recorded runs, newest first."""
+        with self._lock:
+            return list(reversed(self._runs))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._runs.clear()
+
+    def to_json(self) -> str:
+        return json.dumps([run.to_dict() for run in self.recent()], indent=2)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, on platforms with ``/proc``."""
+    try:
+        with open("/proc/self/statm", "rb") as fp:
+            resident_pages = int(fp.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * _PAGE_SIZE
+
+
+METRICS = MetricsLog()
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .channels import NUMERIC_CHARS, ChannelStore, MessageColumns, TimeSeries, gather_field
+from .dataflash import (
+    FMT_FORMAT,
+    FMT_LENGTH,
+    FMT_TYPE,
+    HEADER,
+    HEADER_TYPES,
+    DataFlashFormatError,
+    DataFlashScanner,
+    MessageFormat,
+    find_sync,
+)
+
+if TYPE_CHECKING:
+    from .log_parser import DataFlashParser, LoadBatch, LoadedLog
+
+logger = logging.getLogger(__name__)
+
+# Files are only split when every worker gets at least this many bytes.
+MIN_CHUNK_BYTES = 16 * 1024 * 1024
+# Ranges cut per worker, so chunks finish one after another and progress can be reported in file order.
+CHUNKS_PER_WORKER = 4
+
+# (type id, name, length, format, columns): a FMT record in picklable form.
+Definition = Tuple[int, str, int, str, Tuple[str, ...]]
+
+
+@dataclass
+class ChunkResult:
+    """Records of one byte range in file order, as flat typed arrays."""
+
+    type_ids: np.ndarray
+    offsets: np.ndarray
+    times: np.ndarray
+    fmt_offsets: List[int]
+    stop_offset: int
+
+
+def read_format_table(buf) -> List[Tuple[int, Definition]]:
+    """Locate every well-formed FMT record with a byte search, without walking records.
+
+    Candidates may include false hits inside other records' payloads;
+    :func:`parallel_load` checks them against the FMT records the chunk
+    scans actually meet.
+    """
+    table = []
+    pattern = HEADER + bytes((FMT_TYPE,))
+    size = len(buf)
+    offset = buf.find(pattern)
+    while offset != -1 and offset + FMT_LENGTH <= size:
+        type_id, length, name, fmt, columns = FMT_FORMAT.decode(buf, offset)
+        definition = (type_id, name, length, fmt, tuple(columns.split(",")) if columns else ())
+        try:
+            MessageFormat(*definition)
+        except DataFlashFormatError:
+            pass
+        else:
+            table.append((offset, definition))
+        offset = buf.find(pattern, offset + 1)
+    return table
+
+
+def scan_chunk(path: str, start: int, end: int, definitions: Sequence[Definition]) -> ChunkResult:
+    """Scan the records starting in ``[start, end)`` given the FMTs defined before ``start``.
+
+    Runs in a worker process. Records are numbered from zero, so types
+    without a time field get chunk-local fallback timestamps that the
+    merge shifts.
+    """
+    type_ids = array("B")
+    offsets = array("q")
+    times = array("d")
+    fmt_offsets = []
+    with DataFlashScanner(path) as scanner:
+        for definition in definitions:
+            scanner.formats[definition[0]] = MessageFormat(*definition)
+        for _, timestamp, record in scanner.iter_records(start, end):
+            type_id = record.fmt.type_id
+            if type_id == FMT_TYPE:
+                fmt_offsets.append(record.offset)
+            type_ids.append(type_id)
+            offsets.append(record.offset)
+            times.append(timestamp)
+        stop_offset = scanner.stop_offset
+    return ChunkResult(
+        type_ids=np.frombuffer(type_ids, dtype=np.uint8),
+        offsets=np.frombuffer(offsets, dtype=np.int64),
+        times=np.frombuffer(times, dtype=np.float64),
+        fmt_offsets=fmt_offsets,
+        stop_offset=stop_offset,
+    )
+
+
+def parallel_load(
+    parser: "DataFlashParser",
+    stride: int = 50,
+    workers: Optional[int] = None,
+    min_chunk_bytes: int = MIN_CHUNK_BYTES,
+    progress: Optional[Callable[["LoadBatch"], None]] = None,
+    sent: Optional[Dict[str, int]] = None,
+) -> Optional["LoadedLog"]:
+    """Load a log by scanning byte ranges in a process pool.
+
+    The FMT table is read first, the file is cut into up to
+    ``CHUNKS_PER_WORKER`` ranges per worker whose boundaries are moved to
+    validated record headers, and each range is scanned into flat arrays.
+    The merge concatenates those arrays and derives the summary, index and
+    channel columns from them with NumPy, so the result equals
+    :meth:`DataFlashParser.load`. Returns ``None`` when the log is too
+    small to split or the chunks disagree with a serial scan (redefined
+    formats, false boundaries); callers then scan serially.
+
+    ``progress`` receives a :class:`LoadBatch` as each range is checked,
+    in file order, with the new samples of every channel in ``sent``,
+    whose counts advance as with :class:`ProgressPublisher`. Only checked
+    ranges are reported, so after a ``None`` a serial scan can carry on
+    streaming from the same ``sent``.
+    """
+    workers = workers or os.cpu_count() or 1
+    sent = {} if sent is None else sent
+    with DataFlashScanner(parser.path) as scanner:
+        buf = scanner._map
+        size = scanner.size
+        pieces = size // max(min_chunk_bytes, 1)
+        if min(workers, pieces) < 2:
+            return None
+        chunks = min(workers * CHUNKS_PER_WORKER, pieces)
+        table = read_format_table(buf)
+        definitions: Dict[int, Definition] = {FMT_TYPE: (FMT_TYPE, "FMT", FMT_LENGTH, "BBnNZ", tuple(FMT_FORMAT.columns))}
+        for _, definition in table:
+            if definitions.setdefault(definition[0], definition) != definition:
+                logger.info("Serial scan for %s: type %d is redefined", parser.path, definition[0])
+                return None
+        if len({definition[1] for definition in definitions.values()}) != len(definitions):
+            logger.info("Serial scan for %s: a message name is reused", parser.path)
+            return None
+        lengths = {type_id: definition[2] for type_id, definition in definitions.items()}
+        bounds = [0]
+        for chunk in range(1, chunks):
+            sync = find_sync(buf, size * chunk // chunks, lengths)
+            if sync > bounds[-1]:
+                bounds.append(sync)
+        bounds.append(size)
+
+    ranges = list(zip(bounds, bounds[1:]))
+    path = str(parser.path)
+    formats = {type_id: MessageFormat(*definition) for type_id, definition in definitions.items()}
+    stream = _ChunkStream(parser, formats, size, progress, sent) if progress is not None else None
+    results: List[ChunkResult] = []
+    # Workers are spawned, not forked: the caller may be one thread of many (a GUI loader), and a
+    # forked child would inherit locks those other threads held.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        futures = [
+            pool.submit(scan_chunk, path, start, end, [d for offset, d in table if offset < start])
+            for start, end in ranges
+        ]
+        # Every range is checked on its own: together the checks equal one over the whole file.
+        for (start, end), future in zip(ranges, futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool as exc:
+                logger.warning("Serial scan for %s: scan workers failed: %s", parser.path, exc)
+                break
+            if result.stop_offset != end:
+                logger.info("Serial scan for %s: chunk boundary %d is not a record start", parser.path, end)
+                break
+            if sorted(result.fmt_offsets) != [offset for offset, _ in table if start <= offset < end]:
+                logger.info("Serial scan for %s: FMT table does not match the scanned records", parser.path)
+                break
+            results.append(result)
+            if stream is not None:
+                stream.publish(result, end)
+        if len(results) < len(futures):
+            for future in futures:
+                future.cancel()
+            return None
+
+    loaded = _merge(parser, results, formats, stride)
+    if stream is not None:
+        stream.finish(loaded)
+    return loaded
+
+
+class _ChunkStream:
+    """Turns the checked chunks of a parallel load into :class:`LoadBatch` updates."""
+
+    def __init__(
+        self,
+        parser: "DataFlashParser",
+        formats: Dict[int, MessageFormat],
+        size: int,
+        callback: Callable[["LoadBatch"], None],
+        sent: Dict[str, int],
+    ) -> None:
+        self.path = parser.path
+        self.size = size
+        self.callback = callback
+        self.sent = sent
+        self.untimed = _untimed_mask(formats)
+        self.watched: Dict[str, Tuple[MessageFormat, str]] = {}
+        by_name = {fmt.name: fmt for fmt in formats.values()}
+        for channel in sent:
+            msg_type, _, field_name = channel.partition(".")
+            fmt = by_name.get(msg_type)
+            if fmt is not None and field_name in fmt.columns and fmt.field_layout(field_name)[2] in NUMERIC_CHARS:
+                self.watched[channel] = (fmt, field_name)
+        self.messages = 0
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def publish(self, result: ChunkResult, bytes_done: int) -> None:
+        from .log_parser import LoadBatch
+
+        times = _shift_untimed(result.times, result.type_ids, self.untimed, self.messages)
+        if len(times):
+            if not self.messages:
+                self.start_time = float(times[0])
+            self.end_time = float(times[-1])
+        chunks = {}
+        if self.watched and len(times):
+            with open(self.path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                raw = np.frombuffer(mapped, dtype=np.uint8)
+                try:
+                    for channel, (fmt, field_name) in self.watched.items():
+                        members = np.flatnonzero(result.type_ids == fmt.type_id)
+                        if len(members):
+                            values = gather_field(raw, fmt, field_name, result.offsets[members])
+                            chunks[channel] = TimeSeries(channel, times[members], values)
+                            self.sent[channel] += len(members)
+                finally:
+                    del raw
+        self.messages += len(times)
+        self.callback(
+            LoadBatch(
+                bytes_done=bytes_done,
+                bytes_total=self.size,
+                messages=self.messages,
+                start_time=self.start_time,
+                end_time=self.end_time,
+                chunks=chunks,
+            )
+        )
+
+    def finish(self, loaded: "LoadedLog") -> None:
+        from .log_parser import LoadBatch
+
+        info = loaded.info
+        self.callback(
+            LoadBatch(
+                bytes_done=self.size,
+                bytes_total=self.size,
+                messages=info.message_count,
+                start_time=info.start_time,
+                end_time=info.end_time,
+                final=True,
+            )
+        )
+
+
+def _untimed_mask(formats: Dict[int, MessageFormat]) -> np.ndarray:
+    untimed = np.zeros(256, dtype=bool)
+    for type_id, fmt in formats.items():
+        untimed[type_id] = not fmt.has_time
+    return untimed
+
+
+def _shift_untimed(times: np.ndarray, type_ids: np.ndarray, untimed: np.ndarray, base: int) -> np.ndarray:
+    """Renumber the chunk-local fallback timestamps of untimed types from message ``base`` on."""
+    local = np.flatnonzero(untimed[type_ids])
+    if not len(local) or not base:
+        return times
+    times = times.copy()
+    times[local] = local + base
+    return times
+
+
+def _merge(
+    parser: "DataFlashParser", results: List[ChunkResult], formats: Dict[int, MessageFormat], stride: int
+) -> "LoadedLog":
+    from .log_parser import LoadedLog, LogIndex, LogInfo
+
+    untimed = _untimed_mask(formats)
+    pinned = np.zeros(256, dtype=bool)
+    lengths = np.zeros(256, dtype=np.int64)
+    for type_id, fmt in formats.items():
+        pinned[type_id] = fmt.name in HEADER_TYPES
+        lengths[type_id] = fmt.length
+
+    times_parts = []
+    base = 0
+    for result in results:
+        times_parts.append(_shift_untimed(result.times, result.type_ids, untimed, base))
+        base += len(result.times)
+    type_ids = np.concatenate([result.type_ids for result in results])
+    offsets = np.concatenate([result.offsets for result in results])
+    times = np.concatenate(times_parts)
+    count = len(times)
+
+    index = LogIndex(stride=stride)
+    channels = ChannelStore(parser.path, reader=parser.iter_records)
+    if count:
+        starts = np.arange(0, count, stride)
+        index.timestamps.frombytes(times[starts].tobytes())
+        index.message_numbers.frombytes(starts.astype(np.int64).tobytes())
+        index.min_times.frombytes(np.minimum.reduceat(times, starts).tobytes())
+        index.max_times.frombytes(np.maximum.reduceat(times, starts).tobytes())
+        index.pinned.frombytes(np.logical_or.reduceat(pinned[type_ids], starts).astype(np.uint8).tobytes())
+        index.offsets.frombytes(offsets[starts].tobytes())
+        index.end_offset = int(offsets[-1] + lengths[type_ids[-1]])
+        index.end_time = float(times[-1])
+
+        # Group records by type with a stable (radix) sort, keeping each type in file order.
+        order = np.argsort(type_ids, kind="stable")
+        grouped = type_ids[order]
+        edges = np.flatnonzero(np.diff(grouped)) + 1
+        group_starts = np.concatenate(([0], edges))
+        group_ends = np.concatenate((edges, [count]))
+        groups = sorted(zip(group_starts, group_ends), key=lambda span: order[span[0]])
+        for lo, hi in groups:
+            fmt = formats[int(grouped[lo])]
+            members = order[lo:hi]
+            index.type_counts[fmt.name] = int(hi - lo)
+            columns = MessageColumns(fmt.name, fmt.columns, fmt.format, fmt)
+            columns.extend(times[members], offsets[members])
+            channels.add_type(columns)
+
+    info = LogInfo(
+        path=parser.path,
+        size_bytes=parser.path.stat().st_size,
+        message_count=count,
+        start_time=float(times[0]) if count else 0.0,
+        end_time=float(times[-1]) if count else 0.0,
+        log_type="DataFlash",
+    )
+    return LoadedLog(info=info, channels=channels, index=index)
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+# Samples per bucket in the finest pyramid level; finer views use raw samples.
+BASE_BUCKET = 8
+
+
+@dataclass(eq=False)
+class LodSlice:
+    """Samples of one channel over a time window at a chosen resolution.
+
+    ``bucket`` is the number of raw samples aggregated per entry; ``1``
+    means the slice holds raw data and ``mins``/``maxs``/``means`` are the
+    sample values themselves. ``times`` holds each bucket's first sample time.
+    """
+
+    times: np.ndarray
+    mins: np.ndarray
+    maxs: np.ndarray
+    means: np.ndarray
+    bucket: int
+
+    def envelope(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return plot-ready ``(x, y)`` tracing the min/max of every bucket."""
+        if self.bucket == 1:
+            return self.times, self.mins
+        return np.repeat(self.times, 2), np.column_stack((self.mins, self.maxs)).ravel()
+
+
+@dataclass(eq=False)
+class _Level:
+    bucket: int
+    mins: np.ndarray
+    maxs: np.ndarray
+    sums: np.ndarray
+
+
+class MinMaxPyramid:
+    """Min/max/mean buckets of one channel at power-of-two resolutions.
+
+    Level ``k`` aggregates ``BASE_BUCKET * 2**k`` consecutive samples, so the
+    pyramid costs about a quarter of the samples per aggregate array.
+    Bucket times are not stored; they are the times of each bucket's first
+    sample. :meth:`select` answers any window with at most about ``2 *
+    pixels`` points using two binary searches and one slice.
+    """
+
+    def __init__(self, times: np.ndarray, values: np.ndarray, base_bucket: int = BASE_BUCKET) -> None:
+        self.times = times
+        self.values = np.asarray(values, dtype=np.float64)
+        self.base_bucket = base_bucket
+        self.levels: List[_Level] = []
+        if len(self.values) <= base_bucket:
+            return
+        level = _reduce_raw(self.values, base_bucket)
+        self.levels.append(level)
+        while len(level.mins) > 1:
+            level = _reduce_level(level)
+            self.levels.append(level)
+
+    def extend(self, times: np.ndarray, values: np.ndarray) -> None:
+        """Adopt ``times``/``values`` that grew by appending, reducing only the new samples.
+
+        The buckets before the first one the new samples touch are kept as
+        they are at every level, so the reduction costs time proportional
+        to the new samples (plus copying the aggregates).
+        """
+        kept = len(self.values)
+        self.times = times
+        self.values = np.asarray(values, dtype=np.float64)
+        if not self.levels:
+            if len(self.values) > self.base_bucket:
+                self.__init__(times, values, self.base_bucket)
+            return
+        first = kept // self.base_bucket
+        fresh = _reduce_raw(self.values[first * self.base_bucket :], self.base_bucket)
+        level = self.levels[0] = _join(self.levels[0], first, fresh)
+        depth = 1
+        while len(level.mins) > 1:
+            # Pairs before the first changed bucket of the level below are unchanged; a new level starts whole.
+            first = first // 2 if depth < len(self.levels) else 0
+            tail = _Level(level.bucket, level.mins[2 * first :], level.maxs[2 * first :], level.sums[2 * first :])
+            fresh = _reduce_level(tail)
+            if depth < len(self.levels):
+                level = self.levels[depth] = _join(self.levels[depth], first, fresh)
+            else:
+                level = fresh
+                self.levels.append(level)
+            depth += 1
+
+    @property
+    def start(self) -> float:
+        return float(self.times[0]) if len(self.times) else 0.0
+
+    @property
+    def end(self) -> float:
+        return float(self.times[-1]) if len(self.times) else 0.0
+
+    def memory_bytes(self) -> int:
+        return sum(level.mins.nbytes + level.maxs.nbytes + level.sums.nbytes for level in self.levels)
+
+    def select(self, t0: float, t1: float, pixels: int) -> LodSlice:
+        lo = int(np.searchsorted(self.times, t0, side="left"))
+        hi = int(np.searchsorted(self.times, t1, side="right"))
+        samples = hi - lo
+        pixels = max(pixels, 1)
+        if samples <= 2 * pixels or not self.levels:
+            raw = self.values[lo:hi]
+            return LodSlice(self.times[lo:hi], raw, raw, raw, 1)
+        level = self.levels[-1]
+        for candidate in self.levels:
+            if candidate.bucket * pixels >= samples:
+                level = candidate
+                break
+        size = level.bucket
+        b0 = lo // size
+        b1 = -(-hi // size)
+        counts = np.full(b1 - b0, size, dtype=np.float64)
+        if b1 == len(level.mins):
+            counts[-1] = len(self.values) - (b1 - 1) * size
+        return LodSlice(
+            times=self.times[b0 * size : b1 * size : size],
+            mins=level.mins[b0:b1],
+            maxs=level.maxs[b0:b1],
+            means=level.sums[b0:b1] / counts,
+            bucket=size,
+        )
+
+
+class MinMaxBins:
+    """Min/max summary of a series that arrives in chunks, in at most ``capacity`` bins.
+
+    Samples are folded into bins of ``bucket`` samples; whenever the bins
+    outgrow ``capacity``, neighbours are merged and ``bucket`` doubles. The
+    bin still filling up keeps only its first time, minimum and maximum.
+    Each append therefore costs time proportional to the chunk, and memory
+    and :meth:`envelope` stay bounded however long the series grows.
+    """
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self.capacity = max(capacity, 2)
+        self.bucket = 1
+        self.count = 0
+        self.times = np.empty(0, dtype=np.float64)
+        self.mins = np.empty(0, dtype=np.float64)
+        self.maxs = np.empty(0, dtype=np.float64)
+        # The partial bin: its first time, minimum, maximum and sample count.
+        self._partial = (0.0, 0.0, 0.0)
+        self._partial_count = 0
+
+    def __len__(self) -> int:
+        return len(self.mins) + (self._partial_count > 0)
+
+    def append(self, times: np.ndarray, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if not count:
+            return
+        self.count += count
+        size = self.bucket
+        start = 0
+        if self._partial_count:
+            start = min(size - self._partial_count, count)
+            first, low, high = self._partial
+            head = values[:start]
+            low = float(np.fmin(low, np.fmin.reduce(head)))
+            high = float(np.fmax(high, np.fmax.reduce(head)))
+            self._partial = (first, low, high)
+            self._partial_count += start
+            if self._partial_count < size:
+                return
+            self._push(*self._partial)
+            self._partial_count = 0
+        full = (count - start) // size * size
+        if full:
+            body = values[start : start + full].reshape(-1, size)
+            self.times = np.concatenate((self.times, times[start : start + full : size]))
+            self.mins = np.concatenate((self.mins, np.fmin.reduce(body, axis=1)))
+            self.maxs = np.concatenate((self.maxs, np.fmax.reduce(body, axis=1)))
+        tail = values[start + full :]
+        if len(tail):
+            self._partial = (float(times[start + full]), float(np.fmin.reduce(tail)), float(np.fmax.reduce(tail)))
+            self._partial_count = len(tail)
+        while len(self.mins) > self.capacity:
+            self._merge_pairs()
+
+    def set_capacity(self, capacity: int) -> None:
+        """Shrink (or grow) the bin limit, merging bins now if there are too many."""
+        self.capacity = max(capacity, 2)
+        while len(self.mins) > self.capacity:
+            self._merge_pairs()
+
+    def envelope(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return plot-ready ``(x, y)`` tracing every bin's min and max, the partial bin last."""
+        times, mins, maxs = self.times, self.mins, self.maxs
+        if self._partial_count:
+            first, low, high = self._partial
+            times, mins, maxs = np.append(times, first), np.append(mins, low), np.append(maxs, high)
+        if self.bucket == 1:
+            return times, mins
+        return np.repeat(times, 2), np.column_stack((mins, maxs)).ravel()
+
+    def first_times(self) -> np.ndarray:
+        """Return the first time of every bin, the partial bin last."""
+        return np.append(self.times, self._partial[0]) if self._partial_count else self.times
+
+    def memory_bytes(self) -> int:
+        return self.times.nbytes + self.mins.nbytes + self.maxs.nbytes
+
+    def _push(self, first: float, low: float, high: float) -> None:
+        self.times = np.append(self.times, first)
+        self.mins = np.append(self.mins, low)
+        self.maxs = np.append(self.maxs, high)
+
+    def _merge_pairs(self) -> None:
+        # An odd last bin stays as it is and simply covers fewer samples.
+        self.times = self.times[::2]
+        self.mins = _pairwise(self.mins, np.fmin, self.mins[-1])
+        self.maxs = _pairwise(self.maxs, np.fmax, self.maxs[-1])
+        self.bucket *= 2
+
+
+def _reduce_raw(values: np.ndarray, size: int) -> _Level:
+    full = len(values) // size * size
+    body = values[:full].reshape(-1, size)
+    mins = np.fmin.reduce(body, axis=1)
+    maxs = np.fmax.reduce(body, axis=1)
+    sums = body.sum(axis=1)
+    if full < len(values):
+        tail = values[full:]
+        mins = np.append(mins, np.fmin.reduce(tail))
+        maxs = np.append(maxs, np.fmax.reduce(tail))
+        sums = np.append(sums, tail.sum())
+    return _Level(size, mins, maxs, sums)
+
+
+def _reduce_level(level: _Level) -> _Level:
+    return _Level(
+        level.bucket * 2,
+        _pairwise(level.mins, np.fmin, level.mins[-1]),
+        _pairwise(level.maxs, np.fmax, level.maxs[-1]),
+        _pairwise(level.sums, np.add, 0.0),
+    )
+
+
+def _join(level: _Level, keep: int, fresh: _Level) -> _Level:
+    return _Level(
+        level.bucket,
+        np.concatenate((level.mins[:keep], fresh.mins)),
+        np.concatenate((level.maxs[:keep], fresh.maxs)),
+        np.concatenate((level.sums[:keep], fresh.sums)),
+    )
+
+
+def _pairwise(values: np.ndarray, combine, pad: float) -> np.ndarray:
+    if len(values) % 2:
+        values = np.append(values, pad)
+    return combine(values[0::2], values[1::2])
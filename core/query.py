@@ -0,0 +1,340 @@
+"""Conditions over channel data that select time ranges of a log.
+
+A query compares channels with constants and combines the comparisons::
+
+    BARO.Alt < 2 and GPS.Spd < 0.5 for > 5s
+    MODE == RTL
+    not (ATT.Roll > -30 and ATT.Roll < 30) or RCOU.C3 >= 1900 for >= 500ms
+
+Channels are ``TYPE.Field``; a bare ``TYPE`` names the field of the same
+name (``MODE`` is ``MODE.Mode``). Flight mode names stand for their mode
+numbers, which differ between vehicles; without a known vehicle only
+mode numbers may be used. ``and`` binds tighter than ``or``; ``for`` keeps only the ranges
+of the expression before it whose duration passes the test, and binds
+loosest of all (use parentheses to apply it to a part).
+
+Every sample holds until the next sample of its channel, the last one
+until the end of the log. Each comparison therefore turns into a list of
+time ranges with a few vectorized NumPy operations, however many samples
+the channel has, and the ranges are combined as sorted interval arrays.
+That needs the raw samples: a :class:`BinnedChannelStore` only keeps each
+channel's min/max envelope, so queries refuse it.
+"""
+from __future__ import annotations
+
+import operator
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .segments import Segment, normalize_segments
+
+if TYPE_CHECKING:
+    from .channels import ChannelStore
+
+# Mode numbers by name, per vehicle (ArduPilot's Plane and Copter mode enums).
+MODE_NUMBERS: Dict[str, Dict[str, int]] = {
+    "plane": {
+        "MANUAL": 0, "CIRCLE": 1, "STABILIZE": 2, "TRAINING": 3, "ACRO": 4, "FBWA": 5, "FBWB": 6, "CRUISE": 7,
+        "AUTOTUNE": 8, "AUTO": 10, "RTL": 11, "LOITER": 12, "TAKEOFF": 13, "AVOID_ADSB": 14, "GUIDED": 15,
+        "QSTABILIZE": 17, "QHOVER": 18, "QLOITER": 19, "QLAND": 20, "QRTL": 21, "QAUTOTUNE": 22, "QACRO": 23,
+        "THERMAL": 24, "LOITER_ALT_QLAND": 25,
+    },
+    "copter": {
+        "STABILIZE": 0, "ACRO": 1, "ALT_HOLD": 2, "AUTO": 3, "GUIDED": 4, "LOITER": 5, "RTL": 6, "CIRCLE": 7,
+        "LAND": 9, "DRIFT": 11, "SPORT": 13, "FLIP": 14, "AUTOTUNE": 15, "POSHOLD": 16, "BRAKE": 17, "THROW": 18,
+        "AVOID_ADSB": 19, "GUIDED_NOGPS": 20, "SMART_RTL": 21, "FLOWHOLD": 22, "FOLLOW": 23, "ZIGZAG": 24,
+        "SYSTEMID": 25, "AUTOROTATE": 26, "AUTO_RTL": 27,
+    },
+}
+
+COMPARISONS: Dict[str, Callable] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "sec": 1.0, "min": 60.0}
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?P<unit>ms|sec|min|s)?\b"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?)"
+    r"|(?P<op><=|>=|==|!=|<|>|=)"
+    r"|(?P<paren>[()]))"
+)
+KEYWORDS = frozenset({"and", "or", "not", "for"})
+
+Spans = Tuple[np.ndarray, np.ndarray]
+
+
+class QueryError(ValueError):
+    pass
+
+
+@dataclass
+class _Context:
+    channels: ChannelStore
+    start: float
+    end: float
+    vehicle: Optional[str]
+    modes: Optional[Dict[str, int]]
+    samples: int = 0
+
+
+@dataclass(frozen=True)
+class Compare:
+    channel: str
+    op: str
+    value: Union[float, str]
+
+    def spans(self, ctx: _Context) -> Spans:
+        msg_type, _, field = self.channel.partition(".")
+        if not field:
+            fields = {name.lower(): name for name in _fields(ctx.channels, msg_type)}
+            field = fields.get(msg_type.lower(), "")
+        channel = f"{msg_type}.{field}"
+        if channel not in ctx.channels:
+            raise QueryError(f"Unknown channel {self.channel!r}")
+        value = self.value
+        if isinstance(value, str):
+            if ctx.modes is None:
+                vehicle = f"a {ctx.vehicle} log" if ctx.vehicle else "a log that does not name its vehicle"
+                raise QueryError(f"Mode names have no numbers in {vehicle}; compare {self.channel} with a mode number")
+            if value.upper() not in ctx.modes:
+                raise QueryError(f"Unknown value {value!r}; only flight mode names may be used as values")
+            value = ctx.modes[value.upper()]
+        series = ctx.channels.series(channel)
+        times, values = series.times, series.values
+        ctx.samples += len(times)
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[order]
+        return _held(times, COMPARISONS[self.op](values, value), ctx.end)
+
+
+@dataclass(frozen=True)
+class Not:
+    term: "Node"
+
+    def spans(self, ctx: _Context) -> Spans:
+        return _complement(self.term.spans(ctx), ctx.start, ctx.end)
+
+
+@dataclass(frozen=True)
+class And:
+    terms: Tuple["Node", ...]
+
+    def spans(self, ctx: _Context) -> Spans:
+        result = self.terms[0].spans(ctx)
+        for term in self.terms[1:]:
+            result = _intersect(result, term.spans(ctx))
+        return result
+
+
+@dataclass(frozen=True)
+class Or:
+    terms: Tuple["Node", ...]
+
+    def spans(self, ctx: _Context) -> Spans:
+        starts, ends = zip(*(term.spans(ctx) for term in self.terms))
+        return _union(np.concatenate(starts), np.concatenate(ends))
+
+
+@dataclass(frozen=True)
+class Lasting:
+    term: "Node"
+    op: str
+    seconds: float
+
+    def spans(self, ctx: _Context) -> Spans:
+        starts, ends = self.term.spans(ctx)
+        keep = COMPARISONS[self.op](ends - starts, self.seconds)
+        return starts[keep], ends[keep]
+
+
+Node = Union[Compare, Not, And, Or, Lasting]
+
+
+@dataclass(frozen=True)
+class Query:
+    text: str
+    root: Node
+
+    def evaluate(
+        self,
+        channels: ChannelStore,
+        start: float,
+        end: float,
+        vehicle: Optional[str] = None,
+        stats: Optional[Dict] = None,
+    ) -> List[Segment]:
+        """Return the normalized time ranges within ``[start, end]`` where the query holds.
+
+        ``vehicle`` picks the mode numbers that mode names stand for; with
+        no table for it, mode names raise :class:`QueryError`. When
+        given, ``stats["samples"]`` receives the number of samples compared.
+        """
+        from .channels import BinnedChannelStore
+
+        if isinstance(channels, BinnedChannelStore):
+            raise QueryError(
+                "Queries need the raw samples, but this log was loaded as min/max bins to fit the memory budget"
+            )
+        ctx = _Context(channels, start, end, vehicle, MODE_NUMBERS.get(vehicle or ""))
+        starts, ends = self.root.spans(ctx)
+        starts, ends = np.maximum(starts, start), np.minimum(ends, end)
+        if stats is not None:
+            stats["samples"] = ctx.samples
+        return normalize_segments(Segment(float(lo), float(hi)) for lo, hi in zip(starts, ends) if hi > lo)
+
+
+def parse_query(text: str) -> Query:
+    """Parse ``text`` (see the module docstring), raising :class:`QueryError` on bad syntax."""
+    parser = _Parser(_tokenize(text))
+    root = parser.query()
+    if parser.peek() is not None:
+        raise QueryError(f"Unexpected {parser.peek()[1]!r} in query {text!r}")
+    return Query(text, root)
+
+
+def _tokenize(text: str) -> List[Tuple[str, object]]:
+    tokens: List[Tuple[str, object]] = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Cannot read query at {text[position:].strip()!r}")
+        position = match.end()
+        if match["number"] is not None:
+            number = float(match["number"])
+            if match["unit"]:
+                tokens.append(("duration", number * DURATION_UNITS[match["unit"]]))
+            else:
+                tokens.append(("number", number))
+        elif match["name"] is not None:
+            word = match["name"]
+            tokens.append(("keyword", word.lower()) if word.lower() in KEYWORDS else ("name", word))
+        elif match["op"] is not None:
+            tokens.append(("op", match["op"]))
+        else:
+            tokens.append(("paren", match["paren"]))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over this grammar::
+
+        query  := either ("for" OP DURATION)*
+        either := both ("or" both)*
+        both   := unary ("and" unary)*
+        unary  := "not" unary | "(" query ")" | CHANNEL OP VALUE
+    """
+
+    def __init__(self, tokens: List[Tuple[str, object]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, object]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, kind: str, value: object = None) -> object:
+        token = self.peek()
+        if token is None or token[0] != kind or (value is not None and token[1] != value):
+            found = "the end" if token is None else repr(token[1])
+            raise QueryError(f"Expected {value or kind}, found {found}")
+        self.position += 1
+        return token[1]
+
+    def accept(self, kind: str, value: object) -> bool:
+        if self.peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def query(self) -> Node:
+        node = self.either()
+        while self.accept("keyword", "for"):
+            op = self.take("op")
+            token = self.peek()
+            seconds = self.take("number" if token is not None and token[0] == "number" else "duration")
+            node = Lasting(node, op, float(seconds))
+        return node
+
+    def either(self) -> Node:
+        terms = [self.both()]
+        while self.accept("keyword", "or"):
+            terms.append(self.both())
+        return terms[0] if len(terms) == 1 else Or(tuple(terms))
+
+    def both(self) -> Node:
+        terms = [self.unary()]
+        while self.accept("keyword", "and"):
+            terms.append(self.unary())
+        return terms[0] if len(terms) == 1 else And(tuple(terms))
+
+    def unary(self) -> Node:
+        if self.accept("keyword", "not"):
+            return Not(self.unary())
+        if self.accept("paren", "("):
+            node = self.query()
+            self.take("paren", ")")
+            return node
+        channel = self.take("name")
+        op = self.take("op")
+        token = self.peek()
+        value = self.take("name" if token is not None and token[0] == "name" else "number")
+        return Compare(str(channel), str(op), value)
+
+
+def _fields(channels: ChannelStore, msg_type: str) -> List[str]:
+    return channels.fields(msg_type) if msg_type in channels.message_types() else []
+
+
+def _held(times: np.ndarray, mask: np.ndarray, end: float) -> Spans:
+    """Ranges where ``mask`` is true, each sample holding until the next one (the last until ``end``)."""
+    if not len(times):
+        return np.empty(0), np.empty(0)
+    until = np.append(times[1:], max(end, times[-1]))
+    first = np.flatnonzero(mask & ~np.concatenate(([False], mask[:-1])))
+    last = np.flatnonzero(mask & ~np.concatenate((mask[1:], [False])))
+    starts, ends = times[first], until[last]
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def _union(starts: np.ndarray, ends: np.ndarray) -> Spans:
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    heads = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+    return starts[heads], np.maximum.reduceat(ends, heads)
+
+
+def _intersect(a: Spans, b: Spans) -> Spans:
+    """Overlaps of two sorted lists of disjoint ranges, from a sweep over their boundaries."""
+    points = np.concatenate((a[0], a[1], b[0], b[1]))
+    steps = np.concatenate((np.ones(len(a[0])), -np.ones(len(a[1])), np.ones(len(b[0])), -np.ones(len(b[1]))))
+    # Ends sort before starts at the same time, so touching ranges do not overlap.
+    order = np.lexsort((steps, points))
+    points, depth = points[order], np.cumsum(steps[order])
+    inside = np.flatnonzero(depth[:-1] == 2)
+    starts, ends = points[inside], points[inside + 1]
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def _complement(spans: Spans, start: float, end: float) -> Spans:
+    starts, ends = spans
+    gaps_start = np.concatenate(([start], ends))
+    gaps_end = np.concatenate((starts, [end]))
+    gaps_start, gaps_end = np.maximum(gaps_start, start), np.minimum(gaps_end, end)
+    keep = gaps_end > gaps_start
+    return gaps_start[keep], gaps_end[keep]
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
 
 @dataclass(frozen=True)
@@ -58,6 +59,87 @@ def remove_contains_time(segments: Iterable[Segment], ts: float) -> bool:
     return False
 
 
+class SegmentSet:
+    """Normalized segments with sorted boundary arrays for binary search.
+
+    Membership matches :func:`contains_time` (segments are closed
+    intervals) in O(log n); :meth:`cursor` answers time-ordered streams in
+    amortized O(1).
+    """
+
+    def __init__(self, segments: Iterable[Segment] = ()) -> None:
+        self.segments = normalize_segments(segments)
+        self.starts = [seg.start for seg in self.segments]
+        self.ends = [seg.end for seg in self.segments]
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def __iter__(self) -> Iterator[Segment]:
+        return iter(self.segments)
+
+    def __contains__(self, ts: float) -> bool:
+        return self.contains(ts)
+
+    def contains(self, ts: float) -> bool:
+        pos = bisect_right(self.starts, ts) - 1
+        return pos >= 0 and ts <= self.ends[pos]
+
+    def overlaps(self, lo: float, hi: float) -> bool:
+        """Whether any segment intersects ``[lo, hi]``."""
+        pos = bisect_right(self.starts, hi) - 1
+        return pos >= 0 and self.ends[pos] >= lo
+
+    def covers(self, lo: float, hi: float) -> bool:
+        """Whether a single segment contains all of ``[lo, hi]``."""
+        pos = bisect_right(self.starts, lo) - 1
+        return pos >= 0 and hi <= self.ends[pos]
+
+    def cursor(self) -> "SegmentCursor":
+        return SegmentCursor(self)
+
+
+class SegmentCursor:
+    """Stateful membership test for a stream of mostly non-decreasing times.
+
+    Each call only advances past segments that ended before the queried
+    time, so a sorted stream costs amortized O(1) per query. A time earlier
+    than the previous one re-seeks with a binary search.
+    """
+
+    def __init__(self, segment_set: SegmentSet) -> None:
+        self._starts = segment_set.starts
+        self._ends = segment_set.ends
+        self._pos = 0
+        self._last = float("-inf")
+
+    def contains(self, ts: float) -> bool:
+        ends = self._ends
+        if ts < self._last:
+            self._pos = bisect_left(ends, ts)
+        else:
+            pos = self._pos
+            count = len(ends)
+            while pos < count and ends[pos] < ts:
+                pos += 1
+            self._pos = pos
+        self._last = ts
+        return self._pos < len(ends) and self._starts[self._pos] <= ts
+
+    def next_boundary(self) -> float:
+        """Time at which the answer for the last queried time next changes.
+
+        Inside a segment this is the segment's end, and every later time up
+        to and including it is inside too. Outside, it is the start of the
+        next segment (infinity if none), and every time before it is outside.
+        """
+        if self._pos >= len(self._ends):
+            return float("inf")
+        if self._starts[self._pos] <= self._last:
+            return self._ends[self._pos]
+        return self._starts[self._pos]
+
+
 def validate_segments(segments: Iterable[Segment], min_time: float, max_time: float) -> None:
     for seg in segments:
         seg.validate(min_time, max_time)
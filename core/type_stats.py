@@ -0,0 +1,166 @@
+"""Per-message-type accounting: what each type of a log costs and how often it is written."""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+
+from .dataflash import record_length
+
+if TYPE_CHECKING:
+    from .channels import BinnedChannelStore, ChannelStore
+
+# Width of the time bins that rates and range costs are counted in, and the most
+# bins a table keeps; longer logs get proportionally wider bins.
+BIN_SECONDS = 1.0
+MAX_BINS = 8192
+
+
+@dataclass(frozen=True)
+class TypeStats:
+    """Totals of one message type.
+
+    ``peak_hz`` is the rate in the busiest bin, so it is averaged over
+    :attr:`TypeTable.bin_seconds`. Untimed types have no rates.
+    """
+
+    name: str
+    count: int
+    bytes: int
+    first_time: float
+    last_time: float
+    peak_hz: float
+
+    @property
+    def mean_hz(self) -> float:
+        span = self.last_time - self.first_time
+        return (self.count - 1) / span if span > 0 else 0.0
+
+
+@dataclass(eq=False)
+class TypeTable:
+    """:class:`TypeStats` of every type, plus per-type record counts prefix-summed over time bins.
+
+    ``cumulative[name][k]`` is the number of ``name`` records timed before
+    ``origin + k * bin_seconds``, so :meth:`range_bytes` prices any time
+    range with two lookups per type instead of a rescan. Within a bin
+    records are assumed evenly spread.
+    """
+
+    types: Dict[str, TypeStats]
+    origin: float
+    bin_seconds: float
+    cumulative: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_channels(
+        cls, store: "ChannelStore", start: float, end: float, bin_seconds: float = BIN_SECONDS
+    ) -> "TypeTable":
+        """Count the records of every type in ``store`` with one vectorized pass per type."""
+        bins, bin_seconds = _grid(start, end, bin_seconds)
+        types: Dict[str, TypeStats] = {}
+        cumulative: Dict[str, np.ndarray] = {}
+        for name in store.all_types():
+            columns = store.get_type(name)
+            times = columns.times
+            count = len(times)
+            if not count:
+                continue
+            length = columns.fmt.length if columns.fmt is not None else record_length(columns.format)
+            if columns.fmt is not None and not columns.fmt.has_time:
+                # Timed by message number only: there is no rate to report.
+                types[name] = TypeStats(name, count, count * length, math.nan, math.nan, 0.0)
+                continue
+            slots = np.clip(((times - start) / bin_seconds).astype(np.int64), 0, bins - 1)
+            counts = np.bincount(slots, minlength=bins)
+            cumulative[name] = np.concatenate(([0], np.cumsum(counts)))
+            types[name] = TypeStats(
+                name,
+                count,
+                count * length,
+                float(times.min()),
+                float(times.max()),
+                float(counts.max()) / bin_seconds,
+            )
+        return cls(types, start, bin_seconds, cumulative)
+
+    @classmethod
+    def from_binned(
+        cls, store: "BinnedChannelStore", start: float, end: float, bin_seconds: float = BIN_SECONDS
+    ) -> "TypeTable":
+        """Count the records of every type in a binned ``store``.
+
+        Counts, bytes and time ranges are exact. The record times are gone,
+        so the prefix sums are interpolated between the first times of the
+        min/max bins of each type's first field, which hold about
+        ``bucket`` records each; rates are only as fine as those bins. The
+        prefix sums keep no more entries than the store keeps bins, so the
+        table stays within the load's memory budget too.
+        """
+        bins, bin_seconds = _grid(start, end, bin_seconds, min(store.capacity, MAX_BINS))
+        types: Dict[str, TypeStats] = {}
+        cumulative: Dict[str, np.ndarray] = {}
+        for name in store.all_types():
+            columns = store.get_type(name)
+            count = columns.count
+            if not count:
+                continue
+            length = columns.fmt.length if columns.fmt is not None else record_length(columns.format)
+            if not columns.fields or (columns.fmt is not None and not columns.fmt.has_time):
+                types[name] = TypeStats(name, count, count * length, math.nan, math.nan, 0.0)
+                continue
+            field_bins = columns.bins[columns.fields[0]]
+            firsts = field_bins.first_times()
+            times = np.maximum.accumulate(np.append(firsts, columns.last_time))
+            before = np.append(np.minimum(np.arange(len(firsts)) * field_bins.bucket, count), count)
+            edges = start + np.arange(bins + 1) * bin_seconds
+            prefix = np.round(np.interp(edges, times, before)).astype(np.int64)
+            # Records outside [start, end] count in the first or last bin, as in from_channels.
+            prefix[0], prefix[-1] = 0, count
+            cumulative[name] = prefix
+            types[name] = TypeStats(
+                name,
+                count,
+                count * length,
+                columns.first_time,
+                columns.last_time,
+                float(np.diff(prefix).max()) / bin_seconds,
+            )
+        return cls(types, start, bin_seconds, cumulative)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(stats.bytes for stats in self.types.values())
+
+    def by_bytes(self) -> List[TypeStats]:
+        """Every type, the largest byte share first."""
+        return sorted(self.types.values(), key=lambda stats: (-stats.bytes, stats.name))
+
+    def byte_share(self, name: str) -> float:
+        total = self.total_bytes
+        return self.types[name].bytes / total if total else 0.0
+
+    def range_bytes(self, t0: float, t1: float) -> Dict[str, int]:
+        """Estimated bytes each timed type has within ``[t0, t1]``, to the bin resolution."""
+        costs = {}
+        positions = (np.array([t0, t1]) - self.origin) / self.bin_seconds
+        for name, prefix in self.cumulative.items():
+            edges = np.arange(len(prefix))
+            low, high = np.interp(positions, edges, prefix)
+            stats = self.types[name]
+            costs[name] = round(max(high - low, 0.0) * stats.bytes / stats.count)
+        return costs
+
+    def memory_bytes(self) -> int:
+        return sum(prefix.nbytes for prefix in self.cumulative.values())
+
+
+def _grid(start: float, end: float, bin_seconds: float, max_bins: int = MAX_BINS) -> Tuple[int, float]:
+    """Return how many bins cover ``[start, end]`` and their width, widened to keep at most ``max_bins``."""
+    bins = max(1, math.ceil((end - start) / bin_seconds))
+    if bins > max_bins:
+        bin_seconds *= bins / max_bins
+        bins = max_bins
+    return bins, bin_seconds
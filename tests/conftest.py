@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import MESSAGE_FORMATS, MessageMix, write_log
+
+__all__ = ["MESSAGE_FORMATS", "write_dataflash_log"]
+
+
+def write_dataflash_log(path: Path, seconds: float = 20.0, imu_hz: int = 50) -> Path:
+    """Write a small, deterministic ArduPilot-style DataFlash log."""
+    mix = MessageMix(imu_hz=imu_hz, att_hz=imu_hz / 5, baro_hz=imu_hz / 5, rcou_hz=imu_hz / 5, gps_hz=imu_hz / 10)
+    return write_log(path, seconds, mix)
+
+
+@pytest.fixture
+def sample_log(tmp_path: Path) -> Path:
+    return write_dataflash_log(tmp_path / "sample.bin")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_log
+from core.channels import BinnedChannelStore, GrowableArray
+from core.log_parser import DataFlashParser
+
+
+def _decoded(path, channel):
+    msg_type, field = channel.split(".")
+    return [(ts, getattr(msg, field)) for _, ts, msg in DataFlashParser(path).iter_messages() if msg.get_type() == msg_type]
+
+
+def test_store_exposes_every_numeric_field(sample_log):
+    channels = DataFlashParser(sample_log).collect_channels()
+    assert channels.message_types() == ["ATT", "BARO", "GPS", "IMU", "MODE", "RCOU"]
+    assert "IMU.AccZ" in channels and "RCOU.C3" in channels
+    assert "PARM.Name" not in channels
+
+
+def test_lazy_fields_match_dfreader(sample_log):
+    channels = DataFlashParser(sample_log).collect_channels()
+    assert channels.get_type("GPS").values == {}
+    for channel in ("BARO.Alt", "ATT.Roll", "GPS.Lat", "GPS.Spd", "RCOU.C3", "MODE.Mode"):
+        series = channels.series(channel)
+        expected = _decoded(sample_log, channel)
+        assert series.times.tolist() == [ts for ts, _ in expected]
+        assert series.values.tolist() == [value for _, value in expected]
+    assert channels.values("ATT", "Roll").dtype == np.float64
+    assert channels.values("RCOU", "C3").dtype == np.uint16
+
+
+def test_dfreader_fallback_rescans_for_values(sample_log):
+    channels = DataFlashParser(sample_log, raw_scanner=False).collect_channels()
+    assert channels.series("BARO.Alt").values.tolist() == [value for _, value in _decoded(sample_log, "BARO.Alt")]
+
+
+def test_growable_array_amortizes_appends():
+    column = GrowableArray(np.float64, capacity=4)
+    for start in range(0, 100, 7):
+        column.extend(range(start, min(start + 7, 100)))
+    assert column.view().tolist() == list(range(100))
+
+
+@pytest.mark.parametrize("raw_scanner", [True, False])
+def test_binned_load_keeps_extremes_within_budget(tmp_path, raw_scanner):
+    path = write_log(tmp_path / "long.bin", 120.0)
+    full = DataFlashParser(path).collect_channels()
+    loaded = DataFlashParser(path, raw_scanner=raw_scanner).load(memory_budget=128 * 1024)
+    binned = loaded.channels
+    assert isinstance(binned, BinnedChannelStore)
+    assert binned.channels() == full.channels()
+    assert binned.memory_bytes() + loaded.index.memory_bytes() <= 128 * 1024
+    for channel in ("IMU.AccX", "BARO.Alt", "GPS.Spd", "RCOU.C3"):
+        envelope, values = binned.series(channel), full.series(channel)
+        assert len(envelope.values) < len(values.values)
+        assert envelope.values.min() == values.values.min() and envelope.values.max() == values.values.max()
+        assert envelope.times[0] == values.times[0] and np.all(np.diff(envelope.times) >= 0)
@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+
+from core.cli import main
+from core.compressed import BlockReader
+from core.exporter import DataFlashExporter, TypePolicy
+from core.segments import Segment
+
+
+def test_trim_matches_exporter(sample_log, tmp_path, capsys):
+    out_dir = tmp_path / "out"
+    assert main(["trim", str(sample_log), "--remove", "2:4", "--remove", "3:6", "-o", str(out_dir)]) == 0
+    report = json.loads(capsys.readouterr().out)
+    expected = tmp_path / "expected.bin"
+    DataFlashExporter(sample_log).export(expected, [Segment(2.0, 6.0)])
+    assert report["status"] == "ok" and report["removed"] == [[2.0, 6.0]]
+    assert (out_dir / "sample_trimmed.bin").read_bytes() == expected.read_bytes()
+
+
+def test_trim_reads_per_log_json_spec(sample_log, tmp_path, capsys):
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps([{"log": str(sample_log), "keep": [{"start": 5, "end": 10}]}]))
+    assert main(["trim", "--segments", str(spec), "--relative", "-o", str(tmp_path / "out")]) == 0
+    report = json.loads(capsys.readouterr().out)
+    start = report["removed"][0][1] - 5
+    assert report["removed"][1][0] == start + 10
+
+
+def test_trim_applies_type_rules_from_spec_and_command_line(sample_log, tmp_path, capsys):
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps({"types": {"IMU": "drop", "ATT": 5}}))
+    out_dir = tmp_path / "out"
+    assert main(["trim", str(sample_log), "--segments", str(spec), "--type", "ATT=keep", "-o", str(out_dir)]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["types"] == {"IMU": 0.0, "ATT": None}
+    expected = tmp_path / "expected.bin"
+    DataFlashExporter(sample_log).export(expected, [], policy=TypePolicy.parse(["IMU=drop"]))
+    assert (out_dir / "sample_trimmed.bin").read_bytes() == expected.read_bytes()
+    assert report["output_bytes"] < sample_log.stat().st_size / 2
+
+
+def test_failures_are_reported_per_log(sample_log, tmp_path, capsys):
+    missing = tmp_path / "missing.bin"
+    assert main(["summarize", str(sample_log), str(missing)]) == 1
+    reports = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [report["status"] for report in reports] == ["ok", "error"]
+
+
+def test_cli_does_not_import_gui_packages():
+    code = "import sys, core.cli; print(sorted(m for m in ('PySide6', 'pyqtgraph') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_trim_can_write_a_compressed_container(sample_log, tmp_path, capsys):
+    out_dir = tmp_path / "out"
+    assert main(["trim", str(sample_log), "--remove", "2:6", "--compress", "zlib", "-o", str(out_dir)]) == 0
+    report = json.loads(capsys.readouterr().out)
+    output = out_dir / "sample_trimmed.bin.ltbz"
+    assert report["compression"] == "zlib" and report["output"] == str(output)
+    expected = tmp_path / "expected.bin"
+    DataFlashExporter(sample_log).export(expected, [Segment(2.0, 6.0)])
+    with BlockReader(output) as reader:
+        assert reader.read(0, reader.raw_size) == expected.read_bytes()
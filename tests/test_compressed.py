@@ -0,0 +1,66 @@
+import pytest
+
+from core.compressed import BlockReader, BlockWriter, is_block_compressed
+from core.dataflash import DataFlashFormatError
+from core.exporter import DataFlashExporter
+from core.log_parser import DataFlashParser
+from core.segments import Segment
+
+
+def _records(parser, **kwargs):
+    return [(timestamp, msg.get_msgbuf()) for _, timestamp, msg in parser.iter_records(**kwargs)]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+@pytest.mark.parametrize("byte_ranges", [True, False])
+def test_compressed_export_reads_back_like_plain_export(sample_log, tmp_path, codec, byte_ranges):
+    plain = tmp_path / "plain.bin"
+    packed = tmp_path / "packed.ltbz"
+    exporter = DataFlashExporter(sample_log)
+    cuts = [Segment(3.0, 7.5)]
+    exporter.export(plain, cuts, byte_ranges=byte_ranges)
+    exporter.export(packed, cuts, byte_ranges=byte_ranges, compression=codec)
+    assert is_block_compressed(packed) and not is_block_compressed(plain)
+    assert packed.stat().st_size < plain.stat().st_size / 2
+    assert _records(DataFlashParser(packed)) == _records(DataFlashParser(plain))
+    with BlockReader(packed) as reader:
+        assert reader.codec == codec and reader.raw_size == plain.stat().st_size
+        assert reader.read(0, reader.raw_size) == plain.read_bytes()
+
+
+def test_reader_seeks_by_block_and_resyncs(sample_log, tmp_path):
+    data = sample_log.read_bytes()
+    packed = tmp_path / "small-blocks.ltbz"
+    with open(packed, "wb") as fp, BlockWriter(fp, block_size=4096, workers=3) as writer:
+        # Odd write sizes so records straddle block boundaries.
+        for start in range(0, len(data), 1000):
+            writer.write(data[start : start + 1000])
+    full = _records(DataFlashParser(sample_log))
+    with BlockReader(packed) as reader:
+        assert reader.block_count == -(-len(data) // 4096)
+        assert reader.read(5000, 300) == data[5000:5300]
+        assert reader.block_of(5000) == 1
+        for block in (0, 1, reader.block_count // 2, reader.block_count - 1):
+            tail = [(timestamp, msg.get_msgbuf()) for _, timestamp, msg in reader.iter_records(block)]
+            assert tail and tail == full[len(full) - len(tail) :]
+            assert sum(len(raw) for _, raw in tail) >= len(data) - reader.raw_starts[block] - 255
+
+
+def test_compressed_log_loads_without_offsets(sample_log, tmp_path):
+    packed = tmp_path / "packed.ltbz"
+    DataFlashExporter(sample_log).export(packed, [], compression="zlib")
+    plain = DataFlashParser(sample_log).load()
+    loaded = DataFlashParser(packed).load()
+    assert loaded.info.message_count == plain.info.message_count
+    assert not loaded.index.has_offsets
+    assert list(loaded.channels.values("BARO", "Alt")) == list(plain.channels.values("BARO", "Alt"))
+
+
+def test_unclosed_container_is_rejected(tmp_path):
+    broken = tmp_path / "broken.ltbz"
+    with open(broken, "wb") as fp:
+        writer = BlockWriter(fp)
+        writer.write(b"\xa3\x95" * 10)
+        writer.abort()
+    with pytest.raises(DataFlashFormatError):
+        BlockReader(broken)
@@ -0,0 +1,92 @@
+import mmap
+from dataclasses import replace
+
+import pytest
+
+from benchmarks.synthetic import seconds_for_size, write_log
+from core import dataflash
+from core.dataflash import DataFlashScanner, find_sync
+from core.log_parser import DataFlashParser
+from core.metrics import current_rss_bytes
+
+
+def _fields(msg) -> dict:
+    return {name: getattr(msg, name) for name in msg.fmt.columns}
+
+
+def _assert_matches_dfreader(path) -> None:
+    parser = DataFlashParser(path)
+    legacy = list(parser.iter_messages())
+    raw = [(index, ts, msg.get_type(), _fields(msg), msg.get_msgbuf()) for index, ts, msg in parser.iter_records()]
+    assert len(raw) == len(legacy)
+    for (index, ts, msg), (raw_index, raw_ts, raw_type, raw_fields, raw_buf) in zip(legacy, raw):
+        assert (index, ts, msg.get_type()) == (raw_index, raw_ts, raw_type)
+        assert raw_fields == _fields(msg)
+        if msg.get_type() != "FMT":
+            assert raw_buf == msg.get_msgbuf()
+
+
+def test_raw_scanner_matches_dfreader(sample_log):
+    _assert_matches_dfreader(sample_log)
+
+
+def test_raw_scanner_resyncs_after_garbage(sample_log):
+    data = bytearray(sample_log.read_bytes())
+    data[5000:5000] = b"\x00\xa3\x95\xff" * 8
+    data += b"\xa3\x95\x83\x01"
+    sample_log.write_bytes(bytes(data))
+    _assert_matches_dfreader(sample_log)
+
+
+def test_find_sync_skips_false_headers(sample_log):
+    with DataFlashScanner(sample_log) as scanner:
+        offsets = [record.offset for _, _, record in scanner.iter_records()]
+        lengths = {type_id: fmt.length for type_id, fmt in scanner.formats.items()}
+        sync = find_sync(scanner._map, offsets[500] + 1, lengths)
+    assert sync == offsets[501]
+
+
+def test_decode_only_requested_fields(sample_log):
+    with DataFlashScanner(sample_log) as scanner:
+        for _, _, record in scanner.iter_records():
+            if record.get_type() == "ATT":
+                yaw, roll = record.decode(("Yaw", "Roll"))
+                assert (yaw, roll) == (record.Yaw, record.Roll)
+                assert isinstance(roll, float)
+                break
+        baro = scanner.format_by_name("BARO")
+        assert baro.has_time
+        assert scanner.format_by_name("FMT").has_time is False
+
+
+def test_load_matches_dfreader_fallback(sample_log):
+    raw = DataFlashParser(sample_log).load()
+    legacy = DataFlashParser(sample_log, raw_scanner=False).load()
+    assert raw.info == legacy.info
+    assert raw.channels.channels() == legacy.channels.channels()
+    assert raw.index.has_offsets and not legacy.index.has_offsets
+    assert replace(raw.index, offsets=legacy.index.offsets, end_offset=0) == legacy.index
+
+
+def test_record_slices_are_zero_copy_views_of_the_map(sample_log):
+    with DataFlashScanner(sample_log) as scanner:
+        for _, _, record in scanner.iter_records():
+            view = record.get_msgview()
+            assert isinstance(view.obj, mmap.mmap)
+            assert view == record.get_msgbuf()
+        # Slices outlive the flyweight and do not keep the scanner from closing.
+        assert bytes(view[:2]) == b"\xa3\x95"
+
+
+def test_scan_resident_size_does_not_grow_with_the_log(tmp_path, monkeypatch):
+    if current_rss_bytes() is None:
+        pytest.skip("resident size is not available on this platform")
+    monkeypatch.setattr(dataflash, "RELEASE_BYTES", 1024 * 1024)
+    path = write_log(tmp_path / "large.bin", seconds_for_size(12 * 1024 * 1024))
+    with DataFlashScanner(path) as scanner:
+        baseline = peak = current_rss_bytes()
+        for index, _, record in scanner.iter_records():
+            record.get_msgview()
+            if index % 20_000 == 0:
+                peak = max(peak, current_rss_bytes())
+    assert peak - baseline < 4 * 1024 * 1024
@@ -0,0 +1,178 @@
+import math
+import os
+import tracemalloc
+from collections import Counter
+
+import pytest
+
+from benchmarks.synthetic import seconds_for_size, write_log
+from core import dataflash, exporter
+from core.exporter import CancelToken, DataFlashExporter, ExportCancelled, SplitOutput, TypePolicy
+from core.log_parser import DataFlashParser
+from core.metrics import current_rss_bytes
+from core.segments import Segment, SegmentCursor
+
+
+@pytest.mark.parametrize(
+    "remove",
+    [
+        [],
+        [Segment(0.0, 5.0)],
+        [Segment(3.3, 7.71), Segment(12.0, 12.5)],
+        [Segment(0.0, 100.0)],
+    ],
+)
+def test_byte_range_export_matches_streaming(sample_log, tmp_path, remove):
+    exporter = DataFlashExporter(sample_log)
+    streamed = tmp_path / "streamed.bin"
+    ranged = tmp_path / "ranged.bin"
+    exporter.export(streamed, remove, byte_ranges=False)
+    exporter.export(ranged, remove, byte_ranges=True)
+    assert ranged.read_bytes() == streamed.read_bytes()
+
+
+def test_streaming_export_queries_segments_only_at_boundaries(sample_log, tmp_path, monkeypatch):
+    calls = Counter()
+    contains = SegmentCursor.contains
+
+    def counted(self, ts):
+        calls["contains"] += 1
+        return contains(self, ts)
+
+    monkeypatch.setattr(SegmentCursor, "contains", counted)
+    remove = [Segment(3.3, 7.71), Segment(12.0, 12.5)]
+    destination = tmp_path / "trimmed.bin"
+    DataFlashExporter(sample_log).export(destination, remove, byte_ranges=False)
+    assert calls["contains"] < 20
+    for _, timestamp, msg in DataFlashParser(destination).iter_messages():
+        if msg.get_type() not in ("FMT", "PARM"):
+            assert not any(seg.start <= timestamp <= seg.end for seg in remove)
+
+
+def test_export_keeps_headers_and_drops_removed_time(sample_log, tmp_path):
+    destination = tmp_path / "trimmed.bin"
+    DataFlashExporter(sample_log).export(destination, [Segment(0.0, 10.0)])
+    types = set()
+    for _, timestamp, msg in DataFlashParser(destination).iter_messages():
+        types.add(msg.get_type())
+        if msg.get_type() not in ("FMT", "PARM"):
+            assert timestamp > 10.0
+    assert {"FMT", "PARM", "BARO", "IMU"} <= types
+
+
+def test_export_without_cuts_copies_source(sample_log, tmp_path):
+    destination = tmp_path / "copy.bin"
+    DataFlashExporter(sample_log).export(destination, [])
+    assert destination.read_bytes() == sample_log.read_bytes()
+
+
+@pytest.mark.parametrize("byte_ranges", [True, False])
+def test_cancelled_export_leaves_no_output(sample_log, tmp_path, byte_ranges):
+    destination = tmp_path / "out" / "trimmed.bin"
+    destination.parent.mkdir()
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(ExportCancelled):
+        DataFlashExporter(sample_log).export(destination, [Segment(2.0, 4.0)], byte_ranges=byte_ranges, cancel_token=token)
+    assert list(destination.parent.iterdir()) == []
+
+
+def test_export_progress_is_throttled_and_completes(sample_log, tmp_path):
+    updates = []
+    DataFlashExporter(sample_log).export(tmp_path / "trimmed.bin", [Segment(2.0, 4.0)], progress_cb=updates.append)
+    assert 1 <= len(updates) <= 3
+    assert updates[-1].fraction == 1.0
+    assert updates[-1].bytes_done == sample_log.stat().st_size
+
+
+@pytest.mark.parametrize("byte_ranges", [True, False])
+def test_type_policy_drops_and_decimates_in_the_same_pass(sample_log, tmp_path, byte_ranges):
+    destination = tmp_path / "filtered.bin"
+    policy = TypePolicy.parse(["IMU=drop", "ATT=2", "RC*=1hz"])
+    DataFlashExporter(sample_log).export(destination, [Segment(0.0, 5.0)], byte_ranges=byte_ranges, policy=policy)
+    counts = Counter()
+    times = {}
+    for _, timestamp, msg in DataFlashParser(destination).iter_messages():
+        counts[msg.get_type()] += 1
+        times.setdefault(msg.get_type(), []).append(timestamp)
+    source = DataFlashParser(sample_log).build_index().type_counts
+    assert "IMU" not in counts
+    assert counts["FMT"] == source["FMT"] and counts["PARM"] == source["PARM"]
+    assert counts["BARO"] == sum(1 for t in times["BARO"] if t >= 5.0) and counts["GPS"] > 0
+    # The log runs from 1 s to 21 s, so 16 s remain: one ATT record per 0.5 s, one RCOU per second.
+    assert counts["ATT"] == 32 and counts["RCOU"] == 16
+    assert len({math.floor(t / 0.5) for t in times["ATT"]}) == counts["ATT"]
+
+
+@pytest.mark.parametrize("byte_ranges", [True, False])
+def test_split_fills_every_output_in_one_read(sample_log, tmp_path, monkeypatch, byte_ranges):
+    ranges = {"first.bin": (Segment(2.0, 6.0),), "second.bin": (Segment(9.0, 14.0), Segment(15.0, 16.5))}
+    index = DataFlashParser(sample_log).build_index()
+    opened = []
+
+    class CountingScanner(dataflash.DataFlashScanner):
+        def __init__(self, path):
+            opened.append(path)
+            super().__init__(path)
+
+    monkeypatch.setattr(exporter, "DataFlashScanner", CountingScanner)
+    monkeypatch.setattr(dataflash, "DataFlashScanner", CountingScanner)
+    monkeypatch.setattr("core.log_parser.DataFlashScanner", CountingScanner)
+    outputs = [SplitOutput(tmp_path / name, keep) for name, keep in ranges.items()]
+    DataFlashExporter(sample_log).export_split(outputs, index=index, byte_ranges=byte_ranges)
+    assert len(opened) == 1
+
+    for output in outputs:
+        expected = bytearray()
+        for _, timestamp, msg in DataFlashParser(sample_log).iter_records():
+            if msg.get_type() in dataflash.HEADER_TYPES or any(seg.start <= timestamp <= seg.end for seg in output.keep):
+                expected += msg.get_msgbuf()
+        assert output.destination.read_bytes() == expected
+
+
+def test_type_policy_parsing():
+    policy = TypePolicy.parse(["PID*=drop", "PIDR=keep", "IMU=25Hz"])
+    assert policy.rate_for("PIDP") == 0.0 and policy.rate_for("PIDR") is None
+    assert policy.rate_for("IMU") == 25.0 and policy.rate_for("FMT") is None
+    assert not policy.affects(["ATT", "PIDR", "PARM"])
+    for bad in ("IMU", "IMU=fast", "IMU=0"):
+        with pytest.raises(ValueError):
+            TypePolicy.parse([bad])
+
+
+@pytest.mark.parametrize("byte_ranges", [True, False])
+def test_export_resident_size_does_not_grow_with_the_log(tmp_path, monkeypatch, byte_ranges):
+    if current_rss_bytes() is None:
+        pytest.skip("resident size is not available on this platform")
+    monkeypatch.setattr(dataflash, "RELEASE_BYTES", 1024 * 1024)
+    monkeypatch.setattr(exporter, "COPY_CHUNK", 1024 * 1024)
+    monkeypatch.setattr(exporter, "PROGRESS_INTERVAL", 0.0)
+    # Force the mapped-slice copy instead of in-kernel file-to-file copies.
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    path = write_log(tmp_path / "large.bin", seconds_for_size(12 * 1024 * 1024))
+    index = DataFlashParser(path).build_index()
+    cuts = [Segment(index.start + 10.0, index.start + 20.0)]
+    baseline = current_rss_bytes()
+    samples = []
+    DataFlashExporter(path).export(
+        tmp_path / "out.bin",
+        cuts,
+        progress_cb=lambda _: samples.append(current_rss_bytes()),
+        index=index,
+        byte_ranges=byte_ranges,
+    )
+    assert len(samples) > 2
+    assert max(samples) - baseline < 4 * 1024 * 1024
+
+
+def test_streaming_export_keeps_no_record_copies(tmp_path):
+    path = write_log(tmp_path / "log.bin", seconds_for_size(1024 * 1024))
+    tracemalloc.start()
+    try:
+        DataFlashExporter(path).export(tmp_path / "out.bin", [], byte_ranges=False)
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert traced_peak < 256 * 1024
+    assert (tmp_path / "out.bin").read_bytes() == path.read_bytes()
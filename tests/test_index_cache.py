@@ -0,0 +1,100 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from core.channels import ChannelStore
+from core.index_cache import MAGIC, VERSION, IndexCache
+from core.log_parser import DataFlashParser, IndexBuilder
+
+
+def test_second_load_uses_cached_index(sample_log, tmp_path, monkeypatch):
+    cache = IndexCache(tmp_path / "cache")
+    first = DataFlashParser(sample_log).load(cache=cache)
+
+    def fail_scan(self):
+        raise AssertionError("log scanned on cached open")
+
+    monkeypatch.setattr(DataFlashParser, "scan", fail_scan)
+    second = DataFlashParser(sample_log).load(cache=cache)
+    assert (second.info, second.index) == (first.info, first.index)
+    assert second.info.types.types == first.info.types.types
+    assert second.channels.channels() == first.channels.channels()
+    for name in first.channels.all_types():
+        assert np.array_equal(second.channels.times(name), first.channels.times(name))
+    assert np.array_equal(second.channels.values("BARO", "Alt"), first.channels.values("BARO", "Alt"))
+    assert second.index.type_counts["IMU"] == 1000
+
+
+def test_index_only_sidecar_gains_channel_columns(sample_log, tmp_path, monkeypatch):
+    cache = IndexCache(tmp_path / "cache")
+    parser = DataFlashParser(sample_log)
+    cache.store(sample_log, parser.build_index())
+
+    def fail_index(self, msg_index, timestamp, msg):
+        raise AssertionError("log re-indexed on cached open")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(IndexBuilder, "on_message", fail_index)
+        first = parser.load(cache=cache)
+    restored = ChannelStore(sample_log)
+    assert cache.load(sample_log, stride=50, channels=restored) == first.index
+    assert restored.channels() == first.channels.channels()
+
+
+def test_cache_misses_when_log_changes(sample_log, tmp_path):
+    cache = IndexCache(tmp_path / "cache")
+    DataFlashParser(sample_log).load(cache=cache)
+    assert cache.load(sample_log, stride=50) is not None
+    assert cache.load(sample_log, stride=10) is None
+    sample_log.write_bytes(sample_log.read_bytes()[:-100])
+    assert cache.load(sample_log, stride=50) is None
+
+
+def test_sidecar_next_to_log(sample_log, tmp_path):
+    cache = IndexCache(tmp_path / "cache", next_to_log=True)
+    stored = cache.store(sample_log, DataFlashParser(sample_log).build_index())
+    assert stored.parent == sample_log.parent
+    assert cache.load(sample_log, stride=50) is not None
+
+
+def test_eviction_keeps_cache_under_cap(sample_log, tmp_path):
+    cache = IndexCache(tmp_path / "cache")
+    index = DataFlashParser(sample_log).build_index()
+    paths = []
+    for n in range(4):
+        copy = tmp_path / f"log{n}.bin"
+        copy.write_bytes(sample_log.read_bytes() + bytes(n))
+        paths.append(cache.store(copy, index))
+        os.utime(paths[-1], (n, n))
+    cache.max_bytes = paths[0].stat().st_size * 2
+    cache.evict()
+    assert [path.exists() for path in paths] == [False, False, True, True]
+
+
+def _only_sidecar(cache):
+    (sidecar,) = cache.directory.glob("*.lti")
+    return sidecar
+
+
+def test_truncated_sidecar_is_discarded(sample_log, tmp_path):
+    cache = IndexCache(tmp_path / "cache")
+    first = DataFlashParser(sample_log).load(cache=cache)
+    sidecar = _only_sidecar(cache)
+    sidecar.write_bytes(sidecar.read_bytes()[:2])
+    again = DataFlashParser(sample_log).load(cache=cache)
+    assert again.index == first.index
+    # The rescan stored a fresh sidecar in place of the broken one.
+    assert cache.load(sample_log, stride=50) == first.index
+
+
+def test_sidecar_missing_a_header_key_is_discarded(sample_log, tmp_path):
+    cache = IndexCache(tmp_path / "cache")
+    first = DataFlashParser(sample_log).load(cache=cache)
+    sidecar = _only_sidecar(cache)
+    header = json.dumps({"stride": 50}).encode()
+    sidecar.write_bytes(struct.pack("<4sII", MAGIC, VERSION, len(header)) + header)
+    assert cache.load(sample_log, stride=50) is None
+    assert not sidecar.exists()
+    assert DataFlashParser(sample_log).load(cache=cache).index == first.index
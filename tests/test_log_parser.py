@@ -0,0 +1,249 @@
+import os
+import struct
+from array import array
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import seconds_for_size, write_log
+from core import channels, dataflash, log_parser
+from core.dataflash import HEADER_TYPES, DataFlashScanner
+from core.index_cache import IndexCache
+from core.log_parser import DataFlashParser, LogIndex, LogScan, MemoryPlan, ScanSubscriber
+from core.metrics import METRICS, current_rss_bytes
+
+
+class _Recorder(ScanSubscriber):
+    def __init__(self) -> None:
+        self.seen = 0
+        self.finished = False
+
+    def on_message(self, msg_index, timestamp, msg) -> None:
+        self.seen += 1
+
+    def finish(self) -> None:
+        self.finished = True
+
+
+def test_load_matches_separate_passes(sample_log):
+    parser = DataFlashParser(sample_log)
+    loaded = parser.load()
+    assert loaded.info == parser.summarize()
+    assert loaded.index == parser.build_index()
+    assert loaded.channels.channels() == parser.collect_channels().channels()
+    assert loaded.info.message_count > 1000
+
+
+def test_scan_decodes_log_once(sample_log, monkeypatch):
+    parser = DataFlashParser(sample_log)
+    passes = []
+    original = DataFlashParser.iter_records
+
+    def counting_iter(self):
+        passes.append(self)
+        return original(self)
+
+    monkeypatch.setattr(DataFlashParser, "iter_records", counting_iter)
+    scan = LogScan(parser)
+    first = scan.subscribe(_Recorder())
+    second = scan.subscribe(_Recorder())
+    scan.run()
+    assert len(passes) == 1
+    assert first.seen == second.seen == parser.summarize().message_count
+    assert first.finished and second.finished
+
+
+class _FirstMessages(_Recorder):
+    def on_message(self, msg_index, timestamp, msg) -> None:
+        super().on_message(msg_index, timestamp, msg)
+        self.done = self.seen >= 100
+
+
+def test_scan_stops_when_all_subscribers_done(sample_log):
+    scan = LogScan(DataFlashParser(sample_log))
+    first = scan.subscribe(_FirstMessages())
+    scan.run()
+    assert first.seen == 100 and first.finished
+
+
+def test_progressive_load_streams_watched_channels(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_parser, "PROGRESS_CHECK", 500)
+    monkeypatch.setattr(log_parser, "PROGRESS_INTERVAL", 0.0)
+    path = write_log(tmp_path / "long.bin", 60.0)
+    batches = []
+    parser = DataFlashParser(path)
+    loaded = parser.load(progress=batches.append, watch=["BARO.Alt", "NOPE.Field"])
+    assert len(batches) > 5 and not batches[0].final
+    assert batches[-1].final and batches[-1].fraction == 1.0
+    assert batches[-1].messages == loaded.info.message_count
+    assert [batch.bytes_done for batch in batches] == sorted(batch.bytes_done for batch in batches)
+    streamed = np.concatenate([batch.chunks["BARO.Alt"].values for batch in batches if "BARO.Alt" in batch.chunks])
+    assert np.array_equal(streamed, loaded.channels.values("BARO", "Alt"))
+    assert loaded.index == parser.build_index()
+
+
+def test_binned_load_streams_watched_channels(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_parser, "PROGRESS_CHECK", 500)
+    monkeypatch.setattr(log_parser, "PROGRESS_INTERVAL", 0.0)
+    path = write_log(tmp_path / "long.bin", 60.0)
+    batches = []
+    binned = DataFlashParser(path).load(progress=batches.append, watch=["BARO.Alt"], memory_budget=16 * 1024)
+    assert isinstance(binned.channels, channels.BinnedChannelStore)
+    chunks = [batch.chunks["BARO.Alt"] for batch in batches if "BARO.Alt" in batch.chunks]
+    assert len(chunks) > 2
+    full = DataFlashParser(path).load().channels.series("BARO.Alt")
+    np.testing.assert_array_equal(np.concatenate([chunk.values for chunk in chunks]), full.values)
+    np.testing.assert_array_equal(np.concatenate([chunk.times for chunk in chunks]), full.times)
+
+
+def test_follow_resumes_after_an_earlier_load(tmp_path):
+    source = write_log(tmp_path / "full.bin", 30.0).read_bytes()
+    with DataFlashScanner(tmp_path / "full.bin") as scanner:
+        offsets = [record.offset for _, _, record in scanner.iter_records()]
+    middle = offsets[len(offsets) // 3]
+    # A type defined before the resume point whose only record comes after it.
+    late_fmt = b"\xa3\x95\x80" + struct.pack("<BB4s16s64s", 150, 4, b"EVT", b"B", b"Id")
+    source = source[:middle] + late_fmt + source[middle:] + b"\xa3\x95\x96\x07"
+    growing = tmp_path / "growing.bin"
+    growing.write_bytes(source[: len(source) // 2 + 7])
+    cache = IndexCache(tmp_path / "cache")
+    DataFlashParser(growing).load(stride=20, cache=cache)
+    loaded = DataFlashParser(growing).load(stride=20, cache=cache)
+    before = len(loaded.channels.values("BARO", "Alt"))
+    follower = DataFlashParser(growing).follow(watch=["BARO.Alt"], loaded=loaded)
+    assert follower.loaded is loaded and follower.offset == loaded.index.end_offset
+    METRICS.clear()
+    streamed = []
+    for cut in (len(source) * 3 // 4, len(source)):
+        with open(growing, "ab") as fp:
+            fp.write(source[growing.stat().st_size : cut])
+        batch = follower.poll()
+        streamed.extend(batch.chunks["BARO.Alt"].values)
+    assert follower.offset == len(source)
+    assert sum(run.bytes for run in METRICS.recent() if run.kind == "follow") < len(source) * 3 // 4
+
+    full = DataFlashParser(growing).load(stride=20)
+    assert loaded.info == full.info and loaded.index == full.index
+    assert loaded.channels.channels() == full.channels.channels()
+    assert loaded.channels.values("EVT", "Id").tolist() == [7]
+    expected = full.channels.values("BARO", "Alt")
+    np.testing.assert_array_equal(streamed, expected[before:])
+    np.testing.assert_array_equal(loaded.channels.values("BARO", "Alt"), expected)
+
+
+def test_read_window_decodes_only_the_window(tmp_path):
+    log = write_log(tmp_path / "long.bin", 60.0)
+    parser = DataFlashParser(log)
+    index = parser.build_index(stride=20)
+    full = parser.load().channels
+    METRICS.clear()
+    window = parser.read_window(40.0, 41.0, types=["BARO", "GPS"], index=index)
+    assert window.message_types() == ["BARO", "GPS"]
+    for channel in ("BARO.Alt", "GPS.Spd"):
+        msg_type = channel.partition(".")[0]
+        times = full.times(msg_type)
+        inside = (times >= 40.0) & (times <= 41.0)
+        np.testing.assert_array_equal(window.series(channel).times, times[inside])
+        np.testing.assert_array_equal(window.series(channel).values, full.series(channel).values[inside])
+    (run,) = [run for run in METRICS.recent() if run.kind == "window"]
+    # One second of sixty, plus a block of slack at either end.
+    assert run.bytes < log.stat().st_size / 30
+
+
+def test_index_blocks_tolerate_out_of_order_timestamps():
+    index = LogIndex(min_times=array("d", [0, 5, 3, 9]), max_times=array("d", [4, 6, 8, 12]))
+    assert index.blocks_between(5.5, 7.0) == range(1, 3)
+    assert index.blocks_between(20.0, 30.0) == range(4, 4)
+    assert index.blocks_between(0.0, 100.0) == range(0, 4)
+
+
+def test_memory_plan_scales_stride_and_bins_large_logs():
+    small = MemoryPlan.for_size(1024 * 1024, 256 * 1024 * 1024)
+    assert small == MemoryPlan(50, False, small.channel_budget)
+    huge = MemoryPlan.for_size(5 * 1024**3, 256 * 1024 * 1024)
+    assert huge.binned and huge.stride > 50
+    entries = 5 * 1024**3 // log_parser.MIN_RECORD_BYTES // huge.stride
+    assert entries * log_parser.INDEX_ENTRY_BYTES <= 256 * 1024 * 1024 * log_parser.INDEX_SHARE
+
+
+def test_memory_plan_counts_records_at_their_sampled_length(sample_log):
+    record_bytes = DataFlashParser(sample_log).mean_record_bytes()
+    loaded = DataFlashParser(sample_log).load()
+    flight = {name: count for name, count in loaded.index.type_counts.items() if name not in HEADER_TYPES}
+    flight_bytes = sum(loaded.info.types.types[name].bytes for name in flight)
+    assert record_bytes == pytest.approx(flight_bytes / sum(flight.values()))
+    # A 900 MB log only fits a 1 GiB budget once its records are known to be longer than the minimum.
+    assert MemoryPlan.for_size(900 * 1024**2, 1024**3).binned
+    assert not MemoryPlan.for_size(900 * 1024**2, 1024**3, record_bytes=record_bytes).binned
+
+
+def test_budgeted_load_stays_under_a_resident_ceiling(tmp_path, monkeypatch):
+    """Set LOG_TRIMMER_MEMORY_TEST_MB=5120 to run this against a 5 GB log."""
+    if current_rss_bytes() is None:
+        pytest.skip("resident size is not available on this platform")
+    size_mb = float(os.environ.get("LOG_TRIMMER_MEMORY_TEST_MB", "32"))
+    budget = 1024 * 1024
+    monkeypatch.setattr(dataflash, "RELEASE_BYTES", 1024 * 1024)
+    path = write_log(tmp_path / "large.bin", seconds_for_size(int(size_mb * 1024 * 1024)))
+    # Warm up imports and allocator pools so they do not count against the load.
+    DataFlashParser(write_log(tmp_path / "warm.bin", 5.0)).load(memory_budget=budget)
+    METRICS.clear()
+    baseline = current_rss_bytes()
+    loaded = DataFlashParser(path).load(memory_budget=budget)
+    (run,) = METRICS.recent()
+    assert run.retained_bytes <= budget
+    # The scanner's release window, the gather's fault window at either end, the budget and some slack.
+    ceiling = dataflash.RELEASE_BYTES + 2 * channels.FAULT_WINDOW + budget + 4 * 1024 * 1024
+    assert run.run_peak_rss_bytes - baseline < ceiling
+    assert loaded.info.message_count == loaded.index.message_count
+
+
+def test_index_snapshot_does_not_grow_with_a_followed_log(tmp_path):
+    source = write_log(tmp_path / "full.bin", 30.0).read_bytes()
+    growing = tmp_path / "growing.bin"
+    growing.write_bytes(source[: len(source) // 2])
+    follower = DataFlashParser(growing).follow(stride=20, watch=["BARO.Alt"])
+    follower.poll()
+    index = follower.loaded.index
+    snapshot = index.snapshot()
+    assert snapshot == index and snapshot.timestamps is not index.timestamps
+    with open(growing, "ab") as fp:
+        fp.write(source[len(source) // 2 :])
+    follower.poll()
+    assert len(index.offsets) > len(snapshot.offsets) == len(snapshot.timestamps)
+    assert snapshot.end_offset < index.end_offset
+    assert snapshot.message_count < index.message_count
+
+
+def test_follow_scans_only_appended_bytes(tmp_path):
+    source = write_log(tmp_path / "full.bin", 30.0).read_bytes()
+    growing = tmp_path / "growing.bin"
+    growing.write_bytes(b"")
+    follower = DataFlashParser(growing).follow(stride=20, watch=["BARO.Alt"])
+    loaded = follower.loaded
+    assert follower.poll().messages == 0
+    METRICS.clear()
+    streamed, pyramid = [], None
+    # Cuts fall mid-record, so every poll but the last leaves a partial record behind.
+    for cut in range(0, len(source), 4_999):
+        with open(growing, "ab") as fp:
+            fp.write(source[cut : cut + 4_999])
+        batch = follower.poll()
+        streamed.extend(batch.chunks["BARO.Alt"].values if "BARO.Alt" in batch.chunks else ())
+        assert batch.bytes_done <= batch.bytes_total == growing.stat().st_size
+        pyramid = loaded.channels.pyramid("BARO.Alt")
+        assert len(pyramid.values) == len(loaded.channels.times("BARO"))
+    assert follower.offset == len(source)
+    assert sum(run.bytes for run in METRICS.recent() if run.kind == "follow") == len(source)
+
+    full = DataFlashParser(growing).load(stride=20)
+    assert loaded.info == full.info and loaded.index == full.index
+    assert loaded.index.blocks_between(10.0, 11.0) == full.index.blocks_between(10.0, 11.0)
+    assert loaded.channels.channels() == full.channels.channels()
+    expected = full.channels.values("BARO", "Alt")
+    np.testing.assert_array_equal(streamed, expected)
+    np.testing.assert_array_equal(loaded.channels.values("BARO", "Alt"), expected)
+    fresh = full.channels.pyramid("BARO.Alt")
+    assert loaded.channels.pyramid("BARO.Alt") is pyramid
+    for grown, built in zip(pyramid.levels, fresh.levels, strict=True):
+        np.testing.assert_array_equal(grown.maxs, built.maxs)
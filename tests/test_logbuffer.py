@@ -0,0 +1,63 @@
+import logging
+
+from core.logbuffer import LogBuffer, tail_lines
+
+
+def test_buffer_keeps_the_latest_records_and_feeds_listeners():
+    buffer = LogBuffer(capacity=3)
+    log = logging.getLogger("tests.logbuffer")
+    log.addHandler(buffer)
+    log.setLevel(logging.INFO)
+    seen = []
+    buffer.subscribe(seen.append)
+    try:
+        for number in range(5):
+            log.info("step %d", number)
+        buffer.unsubscribe(seen.append)
+        log.warning("unheard")
+    finally:
+        log.removeHandler(buffer)
+    entries = buffer.entries()
+    assert [entry.message for entry in entries] == ["step 3", "step 4", "unheard"]
+    assert entries[-1].level == logging.WARNING and entries[-1].logger == "tests.logbuffer"
+    assert entries[-1].format().endswith("[WARNING] tests.logbuffer - unheard")
+    assert [entry.message for entry in seen] == [f"step {number}" for number in range(5)]
+
+
+def test_tail_reads_only_the_end_of_a_large_file(tmp_path, monkeypatch):
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"line {number}\n" for number in range(200_000)), encoding="utf-8")
+    read = []
+    original = open
+
+    class CountingFile:
+        def __init__(self, fp):
+            self.fp = fp
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.fp.close()
+
+        def seek(self, *args):
+            return self.fp.seek(*args)
+
+        def read(self, size):
+            data = self.fp.read(size)
+            read.append(len(data))
+            return data
+
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: CountingFile(original(*args, **kwargs)))
+    lines = tail_lines(path, 200, block=1024)
+    assert lines == [f"line {number}" for number in range(199_800, 200_000)]
+    assert sum(read) < 4 * 1024
+
+
+def test_tail_handles_short_files_without_a_final_newline(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("first\nsecond\nthird", encoding="utf-8")
+    assert tail_lines(path, 2, block=4) == ["second", "third"]
+    assert tail_lines(path, 10, block=4) == ["first", "second", "third"]
+    path.write_text("", encoding="utf-8")
+    assert tail_lines(path, 5) == []
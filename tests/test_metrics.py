@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from core.exporter import CancelToken, DataFlashExporter, ExportCancelled
+from core.log_parser import DataFlashParser
+from core.metrics import METRICS, MetricsLog
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    METRICS.clear()
+    yield
+    METRICS.clear()
+
+
+def test_open_and_series_runs_are_recorded(sample_log):
+    loaded = DataFlashParser(sample_log).load()
+    loaded.channels.values("BARO", "Alt")
+    series, opened = METRICS.recent()
+    assert opened.kind == "open" and opened.status == "ok"
+    assert opened.messages == loaded.info.message_count
+    assert opened.type_counts == loaded.index.type_counts
+    assert "scan" in opened.stages and opened.messages_per_second > 0
+    assert series.kind == "series" and series.detail == "BARO.Alt"
+    assert series.messages == len(loaded.channels.times("BARO"))
+
+
+def test_failed_runs_keep_their_status(sample_log, tmp_path):
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(ExportCancelled):
+        DataFlashExporter(sample_log).export(tmp_path / "out.bin", [], cancel_token=token)
+    statuses = {run.kind: run.status for run in METRICS.recent()}
+    assert statuses == {"export": "ExportCancelled", "index": "ok"}
+
+
+def test_metrics_log_is_bounded_and_exports_json(tmp_path):
+    metrics = MetricsLog(capacity=3)
+    for number in range(5):
+        with metrics.run("index", tmp_path / f"{number}.bin") as run:
+            run.messages = number
+    assert [run.messages for run in metrics.recent()] == [4, 3, 2]
+    exported = json.loads(metrics.to_json())
+    assert exported[0]["path"].endswith("4.bin") and "messages_per_second" in exported[0]
+    metrics.enabled = False
+    with metrics.run("index", tmp_path / "5.bin"):
+        pass
+    assert len(metrics.recent()) == 3
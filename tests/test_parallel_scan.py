@@ -0,0 +1,100 @@
+import struct
+from functools import partial
+
+import numpy as np
+
+from core.dataflash import DataFlashScanner
+from core.index_cache import IndexCache
+from core.log_parser import DataFlashParser
+from core import parallel_scan
+from core.parallel_scan import parallel_load
+
+
+def _assert_same_load(parallel, serial):
+    assert parallel.info == serial.info
+    assert parallel.index == serial.index
+    assert parallel.channels.channels() == serial.channels.channels()
+    for name in serial.channels.message_types() + ["FMT"]:
+        assert np.array_equal(parallel.channels.times(name), serial.channels.times(name))
+        assert np.array_equal(parallel.channels.get_type(name).offsets, serial.channels.get_type(name).offsets)
+    assert np.array_equal(parallel.channels.values("BARO", "Alt"), serial.channels.values("BARO", "Alt"))
+
+
+def _record_offsets(path):
+    with DataFlashScanner(path) as scanner:
+        return [record.offset for _, _, record in scanner.iter_records()]
+
+
+def test_parallel_load_matches_serial(sample_log):
+    parser = DataFlashParser(sample_log)
+    parallel = parallel_load(parser, workers=4, min_chunk_bytes=1024)
+    assert parallel is not None
+    _assert_same_load(parallel, parser.load())
+
+
+def test_parallel_load_handles_late_formats_and_garbage(sample_log, tmp_path):
+    data = sample_log.read_bytes()
+    offsets = _record_offsets(sample_log)
+    middle = offsets[len(offsets) // 2]
+    # An untimed type defined mid-log, so its fallback timestamps depend on the global message index.
+    body = struct.pack("<BB4s16s64s", 150, 4, b"EVT", b"B", b"Id")
+    late = b"\xa3\x95\x80" + body + b"\xa3\x95\x96\x07" + b"\xa3\x95\x96\x08"
+    path = tmp_path / "spliced.bin"
+    path.write_bytes(data[:middle] + b"\xa3\x95\xfejunk" + late + data[middle:])
+    parser = DataFlashParser(path)
+    parallel = parallel_load(parser, workers=6, min_chunk_bytes=1024)
+    serial = parser.load()
+    assert serial.channels.times("EVT").tolist()[0] > 100
+    assert parallel is not None
+    _assert_same_load(parallel, serial)
+    assert parser.load(workers=6).index == serial.index
+
+
+def _streamed(batches, channel):
+    return np.concatenate([batch.chunks[channel].values for batch in batches if channel in batch.chunks])
+
+
+def test_parallel_load_streams_a_batch_per_chunk(sample_log):
+    parser = DataFlashParser(sample_log)
+    batches, sent = [], {"BARO.Alt": 0, "NOPE.Field": 0}
+    parallel = parallel_load(parser, workers=4, min_chunk_bytes=1024, progress=batches.append, sent=sent)
+    assert len(batches) > 4 and batches[-1].final and not any(batch.final for batch in batches[:-1])
+    assert [batch.bytes_done for batch in batches] == sorted(batch.bytes_done for batch in batches)
+    assert batches[-2].messages == batches[-1].messages == parallel.info.message_count
+    assert batches[-2].end_time == parallel.info.end_time
+    expected = parser.load().channels.series("BARO.Alt")
+    assert np.array_equal(_streamed(batches, "BARO.Alt"), expected.values)
+    times = np.concatenate([batch.chunks["BARO.Alt"].times for batch in batches if "BARO.Alt" in batch.chunks])
+    assert np.array_equal(times, expected.times)
+    assert sent == {"BARO.Alt": len(expected.values), "NOPE.Field": 0}
+
+
+def test_serial_fallback_streams_on_where_the_chunks_stopped(sample_log, monkeypatch):
+    real_find_sync = parallel_scan.find_sync
+    boundaries = []
+
+    def misplaced_third_boundary(buf, start, lengths):
+        boundaries.append(start)
+        sync = real_find_sync(buf, start, lengths)
+        return sync + 1 if len(boundaries) == 3 else sync
+
+    monkeypatch.setattr(parallel_scan, "find_sync", misplaced_third_boundary)
+    monkeypatch.setattr(parallel_scan, "parallel_load", partial(parallel_load, min_chunk_bytes=1024))
+    batches = []
+    loaded = DataFlashParser(sample_log).load(workers=4, progress=batches.append, watch=["BARO.Alt"])
+    assert any(batch.chunks for batch in batches[:2])
+    assert np.array_equal(_streamed(batches, "BARO.Alt"), loaded.channels.values("BARO", "Alt"))
+
+
+def test_small_logs_are_not_split(sample_log):
+    assert parallel_load(DataFlashParser(sample_log), workers=4) is None
+
+
+def test_cached_logs_skip_the_parallel_scan(sample_log, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr("core.parallel_scan.parallel_load", lambda *args, **kwargs: calls.append(args))
+    cache = IndexCache(tmp_path / "cache")
+    first = DataFlashParser(sample_log).load(cache=cache, workers=4)
+    second = DataFlashParser(sample_log).load(cache=cache, workers=4)
+    assert len(calls) == 1
+    assert second.index == first.index
@@ -0,0 +1,56 @@
+import numpy as np
+
+from core.pyramid import MinMaxBins, MinMaxPyramid
+
+
+def _pyramid(n=100_003):
+    times = np.arange(n, dtype=np.float64) / 100.0
+    values = np.sin(times) + (np.arange(n) % 97 == 0) * 5.0
+    return times, values, MinMaxPyramid(times, values)
+
+
+def test_narrow_window_returns_raw_samples():
+    times, values, pyramid = _pyramid()
+    detail = pyramid.select(10.0, 12.0, pixels=800)
+    assert detail.bucket == 1
+    assert detail.times.tolist() == times[1000:1201].tolist()
+    assert detail.mins.tolist() == values[1000:1201].tolist()
+
+
+def test_full_window_fits_pixel_budget_and_keeps_extremes():
+    times, values, pyramid = _pyramid()
+    detail = pyramid.select(times[0], times[-1], pixels=500)
+    assert detail.bucket > 1
+    assert len(detail.times) <= 500
+    assert detail.maxs.max() == values.max()
+    assert detail.mins.min() == values.min()
+
+
+def test_bucket_aggregates_match_raw_data():
+    times, values, pyramid = _pyramid()
+    detail = pyramid.select(100.0, 300.0, pixels=100)
+    size = detail.bucket
+    first = int(detail.times[0] * 100 + 0.5)
+    for i in range(3):
+        chunk = values[first + i * size : first + (i + 1) * size]
+        assert detail.mins[i] == chunk.min() and detail.maxs[i] == chunk.max()
+        assert np.isclose(detail.means[i], chunk.mean())
+
+
+def test_channel_store_caches_pyramids(sample_log):
+    from core.log_parser import DataFlashParser
+
+    channels = DataFlashParser(sample_log).collect_channels()
+    assert channels.pyramid("IMU.AccZ") is channels.pyramid("IMU.AccZ")
+
+
+def test_streaming_bins_stay_bounded_and_keep_extremes():
+    times, values, _ = _pyramid()
+    bins = MinMaxBins(capacity=256)
+    for start in range(0, len(values), 777):
+        bins.append(times[start : start + 777], values[start : start + 777])
+        assert len(bins) <= 256 + bins.bucket
+    x, y = bins.envelope()
+    assert bins.count == len(values)
+    assert y.max() == values.max() and y.min() == values.min()
+    assert x[0] == times[0] and np.all(np.diff(x) >= 0)
@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import MessageMix, write_log
+from core.log_parser import DataFlashParser
+from core.query import And, Compare, Lasting, Or, QueryError, parse_query
+from core.segments import Segment, normalize_segments
+
+
+def _brute_force(loaded, channel, test, step=0.001):
+    """Sample-and-hold truth of ``test`` on a fine grid, as (start, end) runs."""
+    times = loaded.channels.times(channel.partition(".")[0])
+    values = loaded.channels.values(*channel.split("."))
+    grid = np.arange(loaded.info.start_time, loaded.info.end_time, step)
+    held = np.searchsorted(times, grid, side="right") - 1
+    truth = (held >= 0) & test(values[np.maximum(held, 0)])
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], truth.astype(np.int8), [0]))))
+    return grid, edges.reshape(-1, 2)
+
+
+def test_parse_query_precedence():
+    query = parse_query("BARO.Alt < 2 and GPS.Spd < 0.5 or MODE == RTL for > 5s")
+    assert query.root == Lasting(
+        Or((And((Compare("BARO.Alt", "<", 2.0), Compare("GPS.Spd", "<", 0.5))), Compare("MODE", "==", "RTL"))),
+        ">",
+        5.0,
+    )
+    assert parse_query("(ATT.Roll > -3e1) for >= 500ms").root == Lasting(Compare("ATT.Roll", ">", -30.0), ">=", 0.5)
+    for bad in ("BARO.Alt <", "BARO.Alt < 2 and", "BARO.Alt ! 2", "(BARO.Alt < 2", "BARO.Alt < 2)"):
+        with pytest.raises(QueryError):
+            parse_query(bad)
+
+
+def test_query_matches_a_sample_and_hold_reference(sample_log):
+    loaded = DataFlashParser(sample_log).load()
+    segments = loaded.query("GPS.Spd < 12.5 and BARO.Alt > 10")
+    assert segments == normalize_segments(segments) and segments
+    grid, runs = _brute_force(loaded, "GPS.Spd", lambda spd: spd < 12.5)
+    _, high = _brute_force(loaded, "BARO.Alt", lambda alt: alt > 10)
+    inside = np.zeros(len(grid), dtype=bool)
+    for seg in segments:
+        inside |= (grid >= seg.start) & (grid < seg.end)
+    expected = np.zeros(len(grid), dtype=bool)
+    low_speed = np.zeros(len(grid), dtype=bool)
+    for lo, hi in runs:
+        low_speed[lo:hi] = True
+    for lo, hi in high:
+        expected[lo:hi] = True
+    expected &= low_speed
+    # The two can only disagree within one grid step of a boundary.
+    assert np.count_nonzero(inside != expected) <= 2 * len(segments) + 2
+
+
+def test_mode_names_duration_filters_and_unknown_channels(tmp_path):
+    loaded = DataFlashParser(write_log(tmp_path / "plane.bin", mix=MessageMix(firmware="ArduPlane V4.5.1"))).load()
+    assert loaded.vehicle() == "plane"
+    # The synthetic log switches from AUTO (10) to RTL (11) half way through.
+    (rtl,) = loaded.query("MODE == RTL")
+    assert rtl.end == loaded.info.end_time and 10.0 < rtl.start < 12.0
+    assert loaded.query("MODE == RTL for < 5s") == []
+    assert loaded.query("not MODE == AUTO and MODE.ModeNum > 0") == [rtl]
+    with pytest.raises(QueryError):
+        loaded.query("NOPE.Field > 1")
+    with pytest.raises(QueryError):
+        loaded.query("BARO.Alt == FAST")
+
+
+def test_mode_names_follow_the_vehicle_the_log_names(tmp_path, sample_log):
+    copter = DataFlashParser(write_log(tmp_path / "copter.bin", mix=MessageMix(firmware="ArduCopter V4.5.1"))).load()
+    assert copter.vehicle() == "copter"
+    # Mode 11 is RTL on a plane but DRIFT on a copter, whose RTL (6) never occurs here.
+    assert copter.query("MODE == RTL") == []
+    assert copter.query("MODE == DRIFT") == copter.query("MODE == 11")
+    assert copter.query("MODE == RTL", vehicle="plane") == copter.query("MODE == 11")
+
+    unnamed = DataFlashParser(sample_log).load()
+    assert unnamed.vehicle() is None
+    with pytest.raises(QueryError, match="does not name its vehicle"):
+        unnamed.query("MODE == RTL")
+    assert unnamed.query("MODE == 11") == unnamed.query("MODE == RTL", vehicle="plane")
+
+
+def test_binned_channels_are_refused(sample_log):
+    binned = DataFlashParser(sample_log).load(memory_budget=16 * 1024)
+    with pytest.raises(QueryError, match="min/max bins"):
+        binned.query("BARO.Alt < 2")
+
+
+def test_query_over_a_long_flight_is_interactive(tmp_path):
+    loaded = DataFlashParser(write_log(tmp_path / "flight.bin", 1800.0)).load()
+    text = "BARO.Alt < 2 and GPS.Spd < 11.5 or IMU.AccZ < -9 and ATT.Roll > 500 for > 1s"
+    loaded.query(text)
+    started = time.perf_counter()
+    segments = loaded.query(text)
+    assert time.perf_counter() - started < 0.5
+    assert all(seg.end - seg.start > 1.0 for seg in segments)
+    assert all(isinstance(seg, Segment) for seg in segments)
@@ -1,6 +1,16 @@
+import random
+
 import pytest
 
-from core.segments import Segment, normalize_segments, remove_segments, validate_segments
+from core.segments import (
+    Segment,
+    SegmentSet,
+    contains_time,
+    normalize_segments,
+    remove_contains_time,
+    remove_segments,
+    validate_segments,
+)
 
 
 def test_normalize_segments_merges_overlaps():
@@ -20,3 +30,49 @@ def test_validate_segments_bounds():
         validate_segments([Segment(5, 3)], 0, 10)
     with pytest.raises(ValueError):
         validate_segments([Segment(-1, 2)], 0, 10)
+
+
+def _random_segments(rng, count):
+    segments = []
+    for _ in range(count):
+        start = rng.uniform(0, 100)
+        segments.append(Segment(start, start + rng.uniform(0, 5)))
+    return segments
+
+
+def test_segment_set_matches_linear_scan():
+    rng = random.Random(7)
+    for _ in range(50):
+        segments = _random_segments(rng, rng.randint(0, 30))
+        segment_set = SegmentSet(segments)
+        probes = [rng.uniform(-5, 110) for _ in range(200)]
+        probes += [seg.start for seg in segments] + [seg.end for seg in segments]
+        for ts in probes:
+            assert segment_set.contains(ts) == remove_contains_time(segments, ts) == contains_time(segments, ts)
+
+
+def test_segment_cursor_matches_segment_set():
+    rng = random.Random(11)
+    segments = _random_segments(rng, 200)
+    segment_set = SegmentSet(segments)
+    ordered = sorted(rng.uniform(-5, 110) for _ in range(2000))
+    shuffled = ordered[:500] + ordered[100:300] + ordered[500:]
+    for stream in (ordered, shuffled):
+        cursor = segment_set.cursor()
+        for ts in stream:
+            assert cursor.contains(ts) == segment_set.contains(ts)
+
+
+def test_segment_cursor_reports_next_boundary():
+    cursor = SegmentSet([Segment(2, 4), Segment(6, 7)]).cursor()
+    assert not cursor.contains(1) and cursor.next_boundary() == 2
+    assert cursor.contains(3) and cursor.next_boundary() == 4
+    assert not cursor.contains(5) and cursor.next_boundary() == 6
+    assert not cursor.contains(8) and cursor.next_boundary() == float("inf")
+
+
+def test_segment_set_range_queries():
+    segment_set = SegmentSet([Segment(2, 4), Segment(6, 7)])
+    assert segment_set.overlaps(3.5, 5) and segment_set.overlaps(4, 4)
+    assert not segment_set.overlaps(4.5, 5.5)
+    assert segment_set.covers(2, 4) and not segment_set.covers(3, 6.5)
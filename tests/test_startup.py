@@ -0,0 +1,37 @@
+import importlib.util
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ("numpy", "pymavlink", "pyqtgraph")
+# Cumulative import budgets in microseconds; generous so slow CI machines pass.
+CORE_BUDGET_US = 200_000
+UI_BUDGET_US = 1_000_000
+
+
+def _import_times(statement: str) -> dict:
+    """Run ``statement`` in a fresh interpreter and return cumulative -X importtime per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_core_import_defers_heavy_modules():
+    times = _import_times("import core, core.exporter, core.cli; core.Segment, core.DataFlashParser")
+    assert not [name for name in HEAVY if name in times]
+    assert times["core"] < CORE_BUDGET_US
+
+
+@pytest.mark.skipif(importlib.util.find_spec("PySide6") is None, reason="PySide6 not installed")
+def test_ui_import_defers_heavy_modules():
+    times = _import_times("import ui")
+    assert not [name for name in HEAVY if name in times]
+    assert times["ui"] < UI_BUDGET_US
@@ -0,0 +1,17 @@
+from benchmarks.synthetic import MessageMix, seconds_for_size, write_log
+from core.log_parser import DataFlashParser
+
+
+def test_generator_is_deterministic(tmp_path):
+    first = write_log(tmp_path / "a.bin", 5.0)
+    second = write_log(tmp_path / "b.bin", 5.0)
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_generator_honours_size_and_mix(tmp_path):
+    mix = MessageMix(imu_hz=100, gps_hz=10, rcou_hz=0, params=5)
+    path = write_log(tmp_path / "sized.bin", seconds_for_size(256 * 1024, mix), mix)
+    assert abs(path.stat().st_size - 256 * 1024) < 0.02 * 256 * 1024
+    counts = DataFlashParser(path).build_index().type_counts
+    assert "RCOU" not in counts and counts["PARM"] == 5
+    assert counts["GPS"] == -(-counts["IMU"] // 10)
@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_log
+from core.channels import BinnedChannelStore
+from core.log_parser import DataFlashParser
+from core.type_stats import TypeTable
+
+
+@pytest.mark.parametrize("raw_scanner", [True, False])
+def test_load_builds_a_type_table_sorted_by_bytes(sample_log, raw_scanner):
+    loaded = DataFlashParser(sample_log, raw_scanner=raw_scanner).load()
+    table = loaded.info.types
+    assert {name: stats.count for name, stats in table.types.items()} == loaded.index.type_counts
+    assert table.total_bytes == loaded.info.size_bytes
+    ranked = table.by_bytes()
+    assert [stats.bytes for stats in ranked] == sorted((stats.bytes for stats in ranked), reverse=True)
+    assert sum(table.byte_share(stats.name) for stats in ranked) == pytest.approx(1.0)
+    imu = table.types["IMU"]
+    assert imu.mean_hz == pytest.approx(50.0, rel=0.02)
+    assert imu.peak_hz == pytest.approx(50.0, abs=1.0)
+    assert imu.first_time == loaded.channels.times("IMU")[0]
+    if raw_scanner:
+        assert math.isnan(table.types["FMT"].first_time) and "FMT" not in table.cumulative
+
+
+def test_range_bytes_follow_the_prefix_sums(sample_log):
+    loaded = DataFlashParser(sample_log).load()
+    table = TypeTable.from_channels(loaded.channels, loaded.info.start_time, loaded.info.end_time)
+    whole = table.range_bytes(loaded.info.start_time - 1, loaded.info.end_time + 1)
+    assert whole == {name: table.types[name].bytes for name in table.cumulative}
+    for name in ("IMU", "GPS"):
+        times = loaded.channels.times(name)
+        exact = np.count_nonzero((times >= 5.0) & (times < 12.0)) * table.types[name].bytes // len(times)
+        per_bin = table.types[name].peak_hz * table.bin_seconds * table.types[name].bytes / len(times)
+        assert abs(table.range_bytes(5.0, 12.0)[name] - exact) <= per_bin
+    assert table.range_bytes(12.0, 5.0)["IMU"] == 0
+
+
+@pytest.mark.parametrize("raw_scanner", [True, False])
+def test_binned_load_builds_a_type_table(tmp_path, raw_scanner):
+    path = write_log(tmp_path / "long.bin", 120.0)
+    full = DataFlashParser(path).load().info.types
+    loaded = DataFlashParser(path, raw_scanner=raw_scanner).load(memory_budget=128 * 1024)
+    assert isinstance(loaded.channels, BinnedChannelStore)
+    table = loaded.info.types
+    assert {name: stats.count for name, stats in table.types.items()} == loaded.index.type_counts
+    assert table.total_bytes == loaded.info.size_bytes
+    assert [stats.name for stats in table.by_bytes()] == [stats.name for stats in full.by_bytes()]
+    for name in ("IMU", "GPS"):
+        binned, exact = table.types[name], full.types[name]
+        assert (binned.first_time, binned.last_time) == (exact.first_time, exact.last_time)
+        assert binned.peak_hz == pytest.approx(exact.peak_hz, rel=0.1)
+        assert table.range_bytes(30.0, 60.0)[name] == pytest.approx(full.range_bytes(30.0, 60.0)[name], rel=0.05)
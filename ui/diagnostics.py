@@ -1,32 +1,157 @@
 from __future__ import annotations
 
+import time
 from pathlib import Path
 
-from PySide6.QtWidgets import QDialog, QHBoxLayout, QLabel, QListWidget, QPushButton, QVBoxLayout
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import (
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QLabel,
+    QListWidget,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QTabWidget,
+    QVBoxLayout,
+    QWidget,
+)
+
+from core import LOG_BUFFER, METRICS, LogBuffer, LogEntry, MetricsLog, RunMetrics, tail_lines
+
+# Lines read from the end of the log file when nothing is buffered in memory.
+TAIL_LINES = 200
+
+RUN_COLUMNS = (
+    "Time",
+    "Run",
+    "File",
+    "Status",
+    "Duration",
+    "Messages",
+    "Msgs/s",
+    "MB/s",
+    "Peak MB",
+    "Kept MB",
+    "Stages",
+)
+
+
+class _EntryRelay(QObject):
+    """Carries log entries from whichever thread logged them to the dialog's thread."""
+
+    entry = Signal(object)
 
 
 class DiagnosticsDialog(QDialog):
-    def __init__(self, log_file: Path, parent=None) -> None:
+    def __init__(
+        self,
+        log_file: Path,
+        parent=None,
+        metrics: MetricsLog = METRICS,
+        log_buffer: LogBuffer = LOG_BUFFER,
+    ) -> None:
         super().__init__(parent)
         self.setWindowTitle("Diagnostics")
-        self.resize(560, 360)
+        self.resize(900, 420)
+        self.metrics = metrics
+        self.log_buffer = log_buffer
+        self._relay = _EntryRelay()
 
         layout = QVBoxLayout(self)
-        layout.addWidget(QLabel(f"Log file: {log_file}"))
+        tabs = QTabWidget()
+        layout.addWidget(tabs, 1)
+
+        self.runs_table = QTableWidget(0, len(RUN_COLUMNS))
+        self.runs_table.setHorizontalHeaderLabels(RUN_COLUMNS)
+        self.runs_table.verticalHeader().setVisible(False)
+        self.runs_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.runs_table.horizontalHeader().setStretchLastSection(True)
+        tabs.addTab(self.runs_table, "Recent runs")
 
+        log_tab = QWidget()
+        log_layout = QVBoxLayout(log_tab)
+        log_layout.addWidget(QLabel(f"Log file: {log_file}"))
         self.list_widget = QListWidget()
-        layout.addWidget(self.list_widget, 1)
+        log_layout.addWidget(self.list_widget, 1)
+        tabs.addTab(log_tab, "Log")
 
         button_row = QHBoxLayout()
+        export_btn = QPushButton("Export JSON…")
+        export_btn.clicked.connect(self._export_json)
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.accept)
+        button_row.addWidget(export_btn)
         button_row.addStretch(1)
         button_row.addWidget(close_btn)
         layout.addLayout(button_row)
 
-        if log_file.exists():
-            lines = log_file.read_text(errors="ignore").splitlines()[-200:]
-            for line in lines:
+        self._populate_runs()
+        entries = log_buffer.entries()
+        if entries:
+            for entry in entries:
+                self.list_widget.addItem(entry.format())
+        elif log_file.exists():
+            for line in tail_lines(log_file, TAIL_LINES):
                 self.list_widget.addItem(line)
         else:
             self.list_widget.addItem("No diagnostics available.")
+        self.list_widget.scrollToBottom()
+        # A bound slot of this dialog runs queued on the GUI thread when a worker logs.
+        self._relay.entry.connect(self._append_entry)
+        self._listener = self._relay.entry.emit
+        log_buffer.subscribe(self._listener)
+
+    def done(self, result: int) -> None:
+        self.log_buffer.unsubscribe(self._listener)
+        super().done(result)
+
+    def _append_entry(self, entry: LogEntry) -> None:
+        bar = self.list_widget.verticalScrollBar()
+        following = bar.value() == bar.maximum()
+        self.list_widget.addItem(entry.format())
+        while self.list_widget.count() > self.log_buffer.capacity:
+            self.list_widget.takeItem(0)
+        if following:
+            self.list_widget.scrollToBottom()
+
+    def _populate_runs(self) -> None:
+        runs = self.metrics.recent()
+        self.runs_table.setRowCount(len(runs))
+        for row, run in enumerate(runs):
+            for column, text in enumerate(_run_cells(run)):
+                self.runs_table.setItem(row, column, QTableWidgetItem(text))
+        self.runs_table.resizeColumnsToContents()
+
+    def _export_json(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Export Diagnostics", "log-trimmer-runs.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            Path(path).write_text(self.metrics.to_json(), encoding="utf-8")
+        except OSError as exc:
+            QMessageBox.critical(self, "Export failed", f"Could not write {path}: {exc}")
+
+
+def _run_cells(run: RunMetrics) -> tuple:
+    stages = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in run.stages.items())
+    # A budgeted load samples its own peak; other runs report the process's.
+    peak_bytes = run.run_peak_rss_bytes if run.run_peak_rss_bytes is not None else run.peak_rss_bytes
+    peak = f"{peak_bytes / (1024 * 1024):.0f}" if peak_bytes is not None else "–"
+    kept = f"{run.retained_bytes / (1024 * 1024):.1f}" if run.retained_bytes is not None else "–"
+    name = Path(run.path).name + (f" → {Path(run.detail).name}" if run.detail else "")
+    return (
+        time.strftime("%H:%M:%S", time.localtime(run.started_at)),
+        run.kind,
+        name,
+        run.status,
+        f"{run.seconds * 1000:.0f} ms",
+        f"{run.messages:,}",
+        f"{run.messages_per_second:,.0f}",
+        f"{run.mb_per_second:.1f}",
+        peak,
+        kept,
+        stages,
+    )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtWidgets import (
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QProgressBar,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from core import CancelToken, DataFlashExporter, DataFlashParser, ExportCancelled, ExportProgress, LogIndex, Segment
+
+logger = logging.getLogger(__name__)
+
+# Exports that run at once; further jobs wait in the queue.
+MAX_CONCURRENT_EXPORTS = 2
+
+JOB_COLUMNS = ("Output", "Status", "Progress", "MB/s", "")
+PROGRESS_STEPS = 1000
+
+
+class SharedIndex:
+    """One :class:`LogIndex` per source, built at most once however many jobs ask for it."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._indexes: Dict[Path, LogIndex] = {}
+
+    def put(self, source: Path, index: LogIndex) -> None:
+        with self._lock:
+            self._indexes[source] = index
+
+    def get(self, source: Path) -> LogIndex:
+        with self._lock:
+            index = self._indexes.get(source)
+            lock = self._locks.setdefault(source, threading.Lock())
+        if index is not None:
+            return index
+        # Jobs over other sources keep running while this one builds.
+        with lock:
+            with self._lock:
+                index = self._indexes.get(source)
+            if index is None:
+                index = DataFlashParser(source).build_index()
+                self.put(source, index)
+        return index
+
+
+class ExportJob(QObject):
+    """One queued export; runs on a pool thread through :class:`_JobRunnable`."""
+
+    progress = Signal(object)
+    finished = Signal(str)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(
+        self,
+        source: Path,
+        destination: Path,
+        segments: Sequence[Segment],
+        total_messages: int,
+        indexes: SharedIndex,
+    ) -> None:
+        super().__init__()
+        self.source = source
+        self.destination = destination
+        # A snapshot, so edits made after queueing do not leak into the job.
+        self.segments = tuple(segments)
+        self.total_messages = total_messages
+        self.indexes = indexes
+        self.token = CancelToken()
+
+    def run(self) -> None:
+        try:
+            self.token.check()
+            DataFlashExporter(self.source).export(
+                self.destination,
+                self.segments,
+                progress_cb=self.progress.emit,
+                total_messages=self.total_messages,
+                index=self.indexes.get(self.source),
+                cancel_token=self.token,
+            )
+        except ExportCancelled:
+            logger.info("Export to %s canceled", self.destination)
+            self.cancelled.emit()
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Export failed: %s", exc)
+            self.failed.emit(str(exc))
+        else:
+            self.finished.emit(str(self.destination))
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job: ExportJob) -> None:
+        super().__init__()
+        self.job = job
+        self.setAutoDelete(False)
+
+    def run(self) -> None:
+        self.job.run()
+
+
+class ExportQueuePanel(QWidget):
+    """Queued exports, each with its own progress, throughput and Cancel button.
+
+    Jobs run on a private thread pool of ``max_jobs`` threads; the rest
+    wait their turn. Jobs over the same source share one index.
+    """
+
+    job_finished = Signal(str)
+    job_failed = Signal(str, str)
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_EXPORTS, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_jobs)
+        self.indexes = SharedIndex()
+        self.jobs: List[ExportJob] = []
+        self._runnables: Dict[ExportJob, _JobRunnable] = {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        header = QHBoxLayout()
+        header.addWidget(QLabel("Exports"))
+        header.addStretch(1)
+        self.clear_btn = QPushButton("Clear finished")
+        self.clear_btn.clicked.connect(self.clear_finished)
+        header.addWidget(self.clear_btn)
+        layout.addLayout(header)
+
+        self.table = QTableWidget(0, len(JOB_COLUMNS))
+        self.table.setHorizontalHeaderLabels(JOB_COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionMode(QTableWidget.NoSelection)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table, 1)
+
+    def submit(
+        self,
+        source: Path,
+        destination: Path,
+        segments: Sequence[Segment],
+        total_messages: int,
+        index: Optional[LogIndex] = None,
+    ) -> ExportJob:
+        if index is not None:
+            # A followed log keeps growing its index on the GUI thread while jobs read it.
+            self.indexes.put(source, index.snapshot())
+        job = ExportJob(source, destination, segments, total_messages, self.indexes)
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, QTableWidgetItem(destination.name))
+        self.table.item(row, 0).setToolTip(str(destination))
+        self.table.setItem(row, 1, QTableWidgetItem("Queued"))
+        bar = QProgressBar()
+        bar.setRange(0, PROGRESS_STEPS)
+        self.table.setCellWidget(row, 2, bar)
+        self.table.setItem(row, 3, QTableWidgetItem("–"))
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(lambda: self.cancel(job))
+        self.table.setCellWidget(row, 4, cancel_btn)
+
+        # Bound methods of this widget run queued on the GUI thread; the job tells them apart by sender.
+        job.progress.connect(self._on_progress)
+        job.finished.connect(self._on_finished)
+        job.failed.connect(self._on_failed)
+        job.cancelled.connect(self._on_cancelled)
+        self.jobs.append(job)
+        runnable = self._runnables[job] = _JobRunnable(job)
+        self.pool.start(runnable)
+        return job
+
+    def cancel(self, job: ExportJob) -> None:
+        job.token.cancel()
+        if self.pool.tryTake(self._runnables[job]):
+            # It had not started, so nothing will report back.
+            self._finish(job, "Cancelled")
+        else:
+            self._set_status(job, "Cancelling…")
+
+    def active_jobs(self) -> List[ExportJob]:
+        return [job for job in self.jobs if job in self._runnables]
+
+    def clear_finished(self) -> None:
+        for job in [job for job in self.jobs if job not in self._runnables]:
+            self.table.removeRow(self.jobs.index(job))
+            self.jobs.remove(job)
+
+    def shutdown(self) -> None:
+        """Cancel every job and wait for the running ones to stop."""
+        for job in self.active_jobs():
+            job.token.cancel()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _row(self, job: ExportJob) -> int:
+        return self.jobs.index(job)
+
+    def _set_status(self, job: ExportJob, text: str, tooltip: str = "") -> None:
+        item = self.table.item(self._row(job), 1)
+        item.setText(text)
+        item.setToolTip(tooltip)
+
+    def _finish(self, job: ExportJob, status: str, tooltip: str = "") -> None:
+        self._runnables.pop(job, None)
+        self._set_status(job, status, tooltip)
+        button = self.table.cellWidget(self._row(job), 4)
+        if button is not None:
+            button.setEnabled(False)
+
+    def _on_progress(self, state: ExportProgress) -> None:
+        job = self.sender()
+        if job not in self._runnables:
+            return
+        row = self._row(job)
+        if not job.token.cancelled:
+            self._set_status(job, "Exporting")
+        self.table.cellWidget(row, 2).setValue(int(state.fraction * PROGRESS_STEPS))
+        self.table.item(row, 3).setText(f"{state.bytes_per_second / (1024 * 1024):.1f}")
+
+    def _on_finished(self, destination: str) -> None:
+        job = self.sender()
+        self.table.cellWidget(self._row(job), 2).setValue(PROGRESS_STEPS)
+        self._finish(job, "Done")
+        self.job_finished.emit(destination)
+
+    def _on_failed(self, message: str) -> None:
+        job = self.sender()
+        self._finish(job, "Failed", message)
+        self.job_failed.emit(str(job.destination), message)
+
+    def _on_cancelled(self) -> None:
+        self._finish(self.sender(), "Cancelled")
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import importlib
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-import pyqtgraph as pg
-from PySide6.QtCore import QObject, Qt, Signal, QThread
+from PySide6.QtCore import QObject, Qt, Signal, QThread, QTimer
 from PySide6.QtWidgets import (
     QComboBox,
     QFileDialog,
@@ -13,6 +14,7 @@ from PySide6.QtWidgets import (
     QGridLayout,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
     QListWidget,
     QMainWindow,
     QMessageBox,
@@ -25,8 +27,11 @@ from PySide6.QtWidgets import (
 )
 
 from core import (
-    DataFlashExporter,
     DataFlashParser,
+    IndexCache,
+    LoadBatch,
+    LoadedLog,
+    LogIndex,
     LogInfo,
     Segment,
     normalize_segments,
@@ -34,13 +39,44 @@ from core import (
     validate_segments,
 )
 from ui.diagnostics import DiagnosticsDialog
+from ui.export_queue import ExportQueuePanel
 from ui.widgets import RangeSelector
 
+if TYPE_CHECKING:
+    import pyqtgraph as pg
+
+    from core import ChannelStore, LogFollower, MinMaxBins, MinMaxPyramid
+
 logger = logging.getLogger(__name__)
 
+# Channels plotted by default; they are also streamed while a log loads.
+DEFAULT_CHANNELS = ("BARO.Alt", "GPS.Spd", "ATT.Roll")
+# Bins per preview curve while loading; caps the redraw work of every batch.
+PREVIEW_BINS = 2048
+# What a loaded log may keep in memory; larger logs are reduced to min/max bins.
+LOAD_MEMORY_BUDGET = 1024 * 1024 * 1024
+# How often a followed log is checked for appended records, in milliseconds.
+FOLLOW_INTERVAL_MS = 1000
+
+# Logs the viewer opens: plain DataFlash logs and the block-compressed containers the exporter writes.
+LOG_SUFFIXES = (".bin", ".ltbz")
+LOG_FILTER = "DataFlash (*.BIN *.bin *.ltbz)"
+
+# Imported in the background once the home view is up, so opening a log does not wait for them.
+HEAVY_MODULES = ("numpy", "core.channels", "core.parallel_scan", "pymavlink.DFReader", "pyqtgraph")
+
+
+def warm_imports(modules: Tuple[str, ...] = HEAVY_MODULES) -> None:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as exc:  # noqa: BLE001 - the real import reports it again when needed
+            logger.warning("Background import of %s failed: %s", name, exc)
+
 
 class LogLoadWorker(QObject):
-    finished = Signal(LogInfo, dict)
+    progress = Signal(object)
+    finished = Signal(LogInfo, object, LogIndex)
     failed = Signal(str)
 
     def __init__(self, path: Path) -> None:
@@ -49,10 +85,14 @@ class LogLoadWorker(QObject):
 
     def run(self) -> None:
         try:
-            parser = DataFlashParser(self.path)
-            log_info = parser.summarize()
-            series = parser.collect_series()
-            self.finished.emit(log_info, series)
+            loaded = DataFlashParser(self.path).load(
+                cache=IndexCache(),
+                workers=None,
+                progress=self.progress.emit,
+                watch=DEFAULT_CHANNELS,
+                memory_budget=LOAD_MEMORY_BUDGET,
+            )
+            self.finished.emit(loaded.info, loaded.channels, loaded.index)
         except Exception as exc:  # noqa: BLE001
             logger.exception("Failed to open log: %s", exc)
             self.failed.emit(str(exc))
@@ -67,23 +107,51 @@ class MainWindow(QMainWindow):
         self.log_file = log_file
         self.current_path: Optional[Path] = None
         self.log_info: Optional[LogInfo] = None
-        self.series: Dict[str, object] = {}
+        self.log_index: Optional[LogIndex] = None
+        self.channels: Optional[ChannelStore] = None
+        # Vehicle named by the loaded log, found on its first query; it picks what mode names mean.
+        self.vehicle: Optional[str] = None
+        self.plot_sources: Dict[pg.PlotWidget, Tuple[MinMaxPyramid, pg.PlotDataItem]] = {}
+        self.previews: Dict[str, Tuple[MinMaxBins, pg.PlotDataItem]] = {}
         self.remove_segments: List[Segment] = []
         self.history: List[List[Segment]] = []
         self.history_index = -1
         self.load_thread: Optional[QThread] = None
+        # Workers have no parent, so the window keeps them alive while their thread runs.
+        self.load_worker: Optional[LogLoadWorker] = None
         self.load_dialog: Optional[QProgressDialog] = None
+        # Set while a log that is still being written is followed (see _toggle_follow).
+        self.follower: Optional[LogFollower] = None
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(FOLLOW_INTERVAL_MS)
+        self.follow_timer.timeout.connect(self._poll_follow)
 
         self.stack = QStackedWidget()
         self.setCentralWidget(self.stack)
 
         self.home_view = self._build_home()
-        self.editor_view = self._build_editor()
         self.stack.addWidget(self.home_view)
-        self.stack.addWidget(self.editor_view)
+        # Built on first use: it is the only view that needs pyqtgraph.
+        self.editor_view: Optional[QWidget] = None
+        self._warmed = False
 
         self.setAcceptDrops(True)
 
+    def showEvent(self, event) -> None:  # noqa: N802
+        super().showEvent(event)
+        if not self._warmed:
+            self._warmed = True
+            QTimer.singleShot(0, self._warm_imports_in_background)
+
+    def _warm_imports_in_background(self) -> None:
+        threading.Thread(target=warm_imports, name="warm-imports", daemon=True).start()
+
+    def _ensure_editor(self) -> QWidget:
+        if self.editor_view is None:
+            self.editor_view = self._build_editor()
+            self.stack.addWidget(self.editor_view)
+        return self.editor_view
+
     def dragEnterEvent(self, event) -> None:  # noqa: N802
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
@@ -91,11 +159,11 @@ class MainWindow(QMainWindow):
     def dropEvent(self, event) -> None:  # noqa: N802
         for url in event.mimeData().urls():
             path = Path(url.toLocalFile())
-            if path.suffix.lower() == ".bin":
+            if path.suffix.lower() in LOG_SUFFIXES:
                 self.open_log(path)
                 break
         else:
-            QMessageBox.warning(self, "Unsupported file", "Please drop a .BIN DataFlash log file.")
+            QMessageBox.warning(self, "Unsupported file", "Please drop a .BIN or .ltbz DataFlash log file.")
 
     def _build_home(self) -> QWidget:
         widget = QWidget()
@@ -190,11 +258,39 @@ class MainWindow(QMainWindow):
             btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
             tool_layout.addWidget(btn)
 
+        tool_layout.addWidget(QLabel("Remove where"))
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("BARO.Alt < 2 and GPS.Spd < 0.5 for > 5s")
+        self.query_edit.setToolTip("Conditions on TYPE.Field channels, combined with and/or/not; MODE == RTL works too")
+        self.query_edit.returnPressed.connect(self._remove_matches)
+        tool_layout.addWidget(self.query_edit)
+        self.query_btn = QPushButton("Remove matches")
+        self.query_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.query_btn.clicked.connect(self._remove_matches)
+        tool_layout.addWidget(self.query_btn)
+
+        self.follow_btn = QPushButton("Follow growing log")
+        self.follow_btn.setCheckable(True)
+        self.follow_btn.setToolTip("Check the file every second and add what was appended, e.g. for a SITL log")
+        self.follow_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.follow_btn.toggled.connect(self._toggle_follow)
+        tool_layout.addWidget(self.follow_btn)
+
         tool_layout.addStretch(1)
 
+        queue_panel = self._panel()
+        queue_layout = QVBoxLayout(queue_panel)
+        self.export_queue = ExportQueuePanel()
+        self.export_queue.job_finished.connect(self._on_export_finished)
+        self.export_queue.job_failed.connect(self._on_export_failed)
+        queue_layout.addWidget(self.export_queue)
+
         layout.addWidget(self.info_panel, 0, 0, 2, 1)
         layout.addWidget(center_panel, 0, 1, 2, 2)
         layout.addWidget(self.tool_panel, 0, 3, 2, 1)
+        layout.addWidget(queue_panel, 2, 1, 1, 3)
+        layout.setRowStretch(0, 1)
+        layout.setRowStretch(1, 1)
 
         self.trim_btn.clicked.connect(self._trim)
         self.cut_btn.clicked.connect(self._remove)
@@ -218,24 +314,28 @@ class MainWindow(QMainWindow):
         return frame
 
     def _plot_widget(self) -> pg.PlotWidget:
+        import pyqtgraph as pg
+
         plot = pg.PlotWidget(background=None)
         plot.showGrid(x=True, y=True, alpha=0.2)
+        plot.sigXRangeChanged.connect(lambda *_: self._update_plot_detail(plot))
         return plot
 
     def _channel_combo(self) -> QComboBox:
         combo = QComboBox()
-        combo.addItems(["ALT", "GPS_SPEED", "ATT_ROLL", "ATT_PITCH", "ATT_YAW", "THR"])
+        combo.setMinimumContentsLength(12)
         return combo
 
     def _open_file_dialog(self) -> None:
-        path, _ = QFileDialog.getOpenFileName(self, "Open Log", str(Path.home()), "DataFlash (*.BIN *.bin)")
+        path, _ = QFileDialog.getOpenFileName(self, "Open Log", str(Path.home()), LOG_FILTER)
         if path:
             self.open_log(Path(path))
 
     def open_log(self, path: Path) -> None:
-        if path.suffix.lower() != ".bin":
-            QMessageBox.warning(self, "Unsupported file", "Only .BIN DataFlash logs are supported.")
+        if path.suffix.lower() not in LOG_SUFFIXES:
+            QMessageBox.warning(self, "Unsupported file", "Only .BIN and .ltbz DataFlash logs are supported.")
             return
+        self._stop_follow()
         self.load_dialog = QProgressDialog("Loading log…", None, 0, 0, self)
         self.load_dialog.setWindowTitle("Loading")
         self.load_dialog.setWindowModality(Qt.WindowModal)
@@ -243,9 +343,10 @@ class MainWindow(QMainWindow):
         self.load_dialog.show()
 
         self.load_thread = QThread()
-        worker = LogLoadWorker(path)
+        worker = self.load_worker = LogLoadWorker(path)
         worker.moveToThread(self.load_thread)
         self.load_thread.started.connect(worker.run)
+        worker.progress.connect(self._on_load_progress)
         worker.finished.connect(self._on_log_loaded)
         worker.failed.connect(self._on_log_failed)
         worker.finished.connect(self.load_thread.quit)
@@ -255,12 +356,72 @@ class MainWindow(QMainWindow):
         self.load_thread.finished.connect(self.load_thread.deleteLater)
         self.load_thread.start()
 
-    def _on_log_loaded(self, log_info: LogInfo, series: dict) -> None:
+    def _on_load_progress(self, batch: LoadBatch) -> None:
+        if batch.final:
+            return
+        if not self.previews:
+            self._start_preview()
+        if batch.end_time > batch.start_time:
+            self.timeline.set_range(batch.start_time, batch.end_time)
+        for channel, chunk in batch.chunks.items():
+            preview = self.previews.get(channel)
+            if preview:
+                bins, curve = preview
+                bins.append(chunk.times, chunk.values)
+                curve.setData(*bins.envelope())
+        self.statusBar().showMessage(f"Loading {batch.fraction:.0%} · {batch.messages:,} messages")
+
+    def _start_preview(self) -> None:
+        """Switch to the editor and plot the default channels as they stream in."""
+        from core import MinMaxBins
+        import pyqtgraph as pg
+
+        if self.load_dialog:
+            self.load_dialog.close()
+            self.load_dialog = None
+        editor = self._ensure_editor()
+        self.log_info = None
+        self.channels = None
+        self.info_items.clear()
+        self.info_items.addItem("Loading…")
+        for combo in (self.primary_combo, self.secondary_combo, self.tertiary_combo):
+            combo.clear()
+        for widget in (self.timeline, self.export_btn):
+            widget.setEnabled(False)
+        plots = (self.plot_primary, self.plot_secondary, self.plot_tertiary)
+        for plot, channel in zip(plots, DEFAULT_CHANNELS):
+            plot.clear()
+            self.plot_sources.pop(plot, None)
+            plot.enableAutoRange()
+            curve = plot.plot(pen=pg.mkPen(color="#3A7BFF", width=2))
+            self.previews[channel] = (MinMaxBins(PREVIEW_BINS), curve)
+        self.stack.setCurrentWidget(editor)
+
+    def _end_preview(self) -> None:
+        self.previews.clear()
+        self.statusBar().clearMessage()
+        if self.editor_view is not None:
+            for widget in (self.timeline, self.export_btn):
+                widget.setEnabled(True)
+
+    def _on_log_loaded(self, log_info: LogInfo, channels: ChannelStore, log_index: LogIndex) -> None:
+        from core import BinnedChannelStore
+
         if self.load_dialog:
             self.load_dialog.close()
+        self._end_preview()
         self.log_info = log_info
-        self.series = series
+        self.log_index = log_index
+        self.channels = channels
+        self.vehicle = None
         self.current_path = log_info.path
+        self._ensure_editor()
+        # Queries compare raw samples, which a binned load does not keep.
+        queryable = not isinstance(channels, BinnedChannelStore)
+        self.query_edit.setEnabled(queryable)
+        self.query_btn.setEnabled(queryable)
+        # Following extends the loaded channels in place, so it needs the raw store of a plain log.
+        self.follow_btn.setEnabled(queryable and log_info.path.suffix.lower() == ".bin")
         self._populate_info()
         self._load_series()
         self._set_history([])
@@ -269,6 +430,9 @@ class MainWindow(QMainWindow):
     def _on_log_failed(self, message: str) -> None:
         if self.load_dialog:
             self.load_dialog.close()
+        if self.previews:
+            self._end_preview()
+            self.stack.setCurrentWidget(self.home_view)
         QMessageBox.critical(self, "Open error", f"Failed to open log: {message}")
 
     def _populate_info(self) -> None:
@@ -282,14 +446,29 @@ class MainWindow(QMainWindow):
         self.info_items.addItem(f"Start: {info.start_time:.2f}s")
         self.info_items.addItem(f"End: {info.end_time:.2f}s")
         self.info_items.addItem(f"Type: {info.log_type}")
+        if info.types is None:
+            return
+        self.info_items.addItem("Message types by size:")
+        for stats in info.types.by_bytes():
+            rates = f" · {stats.mean_hz:.1f} Hz (peak {stats.peak_hz:.0f})" if stats.peak_hz else ""
+            self.info_items.addItem(
+                f"  {stats.name}: {info.types.byte_share(stats.name):.1%} · {stats.bytes / 1024:,.0f} KB"
+                f" · {stats.count:,} msgs{rates}"
+            )
 
     def _load_series(self) -> None:
-        if not self.series or not self.log_info:
+        if not self.channels or not self.log_info:
             return
         self.timeline.set_range(self.log_info.start_time, self.log_info.end_time)
-        self.primary_combo.setCurrentText("ALT")
-        self.secondary_combo.setCurrentText("GPS_SPEED")
-        self.tertiary_combo.setCurrentText("ATT_ROLL")
+        channels = self.channels.channels()
+        combos = (self.primary_combo, self.secondary_combo, self.tertiary_combo)
+        for combo, default in zip(combos, DEFAULT_CHANNELS):
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItems(channels)
+            if default in channels:
+                combo.setCurrentText(default)
+            combo.blockSignals(False)
         self._refresh_plots()
 
     def _refresh_plots(self) -> None:
@@ -299,14 +478,108 @@ class MainWindow(QMainWindow):
 
     def _plot_series(self, plot: pg.PlotWidget, key: str) -> None:
         plot.clear()
-        series = self.series.get(key)
-        if not series:
+        self.plot_sources.pop(plot, None)
+        if not self.channels or key not in self.channels:
+            return
+        import pyqtgraph as pg
+
+        pyramid = self.channels.pyramid(key)
+        curve = plot.plot(pen=pg.mkPen(color="#3A7BFF", width=2))
+        self.plot_sources[plot] = (pyramid, curve)
+        plot.enableAutoRange(x=False)
+        plot.setXRange(pyramid.start, pyramid.end, padding=0)
+        self._update_plot_detail(plot)
+
+    def _update_plot_detail(self, plot: pg.PlotWidget) -> None:
+        source = self.plot_sources.get(plot)
+        if not source:
             return
-        plot.plot(series.times, series.values, pen=pg.mkPen(color="#3A7BFF", width=2))
+        pyramid, curve = source
+        t0, t1 = plot.getViewBox().viewRange()[0]
+        # Fetch one extra view width on each side so short pans need no refetch to look complete.
+        span = t1 - t0
+        detail = pyramid.select(t0 - span, t1 + span, pixels=3 * max(plot.width(), 100))
+        curve.setData(*detail.envelope())
+
+    def _toggle_follow(self, checked: bool) -> None:
+        if not checked:
+            self._stop_follow()
+            return
+        if not self.log_info or not self.channels or not self.log_index:
+            self._stop_follow()
+            return
+        loaded = LoadedLog(self.log_info, self.channels, self.log_index)
+        try:
+            self.follower = DataFlashParser(self.log_info.path).follow(loaded=loaded)
+        except ValueError as exc:
+            self._stop_follow()
+            QMessageBox.warning(self, "Cannot follow log", str(exc))
+            return
+        self.follow_timer.start()
+        self.statusBar().showMessage("Following the log as it grows", 3000)
+
+    def _stop_follow(self) -> None:
+        self.follow_timer.stop()
+        self.follower = None
+        if self.editor_view is not None and self.follow_btn.isChecked():
+            self.follow_btn.blockSignals(True)
+            self.follow_btn.setChecked(False)
+            self.follow_btn.blockSignals(False)
+
+    def _poll_follow(self) -> None:
+        """Add what was appended to the followed log to the summary, timeline and plots."""
+        from core import TypeTable
+
+        if self.follower is None or not self.log_info:
+            return
+        info = self.log_info
+        before, old_end = info.message_count, info.end_time
+        try:
+            # Extends self.log_info, self.channels and self.log_index in place.
+            self.follower.poll()
+        except (OSError, ValueError) as exc:
+            self._stop_follow()
+            QMessageBox.warning(self, "Stopped following", str(exc))
+            return
+        if info.message_count == before:
+            return
+        if info.types is not None:
+            info.types = TypeTable.from_channels(self.channels, info.start_time, info.end_time)
+        self._populate_info()
+
+        start, end = self.timeline.selection()
+        self.timeline.set_range(info.start_time, info.end_time)
+        if (start, end) != (info.start_time, old_end):
+            self.timeline.set_selection(start, end)
+
+        channels = self.channels.channels()
+        combos = (self.primary_combo, self.secondary_combo, self.tertiary_combo)
+        if channels != [self.primary_combo.itemText(row) for row in range(self.primary_combo.count())]:
+            for combo in combos:
+                current = combo.currentText()
+                combo.blockSignals(True)
+                combo.clear()
+                combo.addItems(channels)
+                combo.setCurrentText(current)
+                combo.blockSignals(False)
+        for plot, combo in zip((self.plot_primary, self.plot_secondary, self.plot_tertiary), combos):
+            if plot not in self.plot_sources:
+                self._plot_series(plot, combo.currentText())
+                continue
+            # Grows the pyramid the plot already draws from.
+            self.channels.pyramid(combo.currentText())
+            t0, t1 = plot.getViewBox().viewRange()[0]
+            if t1 >= old_end:
+                # The view reached the old end, so keep it on the latest samples.
+                plot.setXRange(t0, info.end_time, padding=0)
+            self._update_plot_detail(plot)
 
     def _on_range_change(self, start: float, end: float) -> None:
         self.trim_btn.setEnabled(start < end)
         self.cut_btn.setEnabled(start < end)
+        if self.log_info and self.log_info.types is not None and start < end:
+            cost = sum(self.log_info.types.range_bytes(start, end).values())
+            self.statusBar().showMessage(f"Selection: about {cost / (1024 * 1024):.2f} MB", 3000)
 
     def _trim(self) -> None:
         if not self.log_info:
@@ -322,6 +595,27 @@ class MainWindow(QMainWindow):
         updated = normalize_segments(self.remove_segments + [Segment(start, end)])
         self._set_history(updated)
 
+    def _remove_matches(self) -> None:
+        from core import QueryError
+
+        text = self.query_edit.text().strip()
+        if not text or not self.log_info or not self.channels:
+            return
+        loaded = LoadedLog(self.log_info, self.channels, self.log_index)
+        try:
+            if self.vehicle is None:
+                self.vehicle = loaded.vehicle()
+            matches = loaded.query(text, self.vehicle)
+        except QueryError as exc:
+            QMessageBox.warning(self, "Invalid query", str(exc))
+            return
+        if not matches:
+            self.statusBar().showMessage("No ranges match the query", 5000)
+            return
+        self._set_history(normalize_segments(self.remove_segments + matches))
+        seconds = sum(seg.end - seg.start for seg in matches)
+        self.statusBar().showMessage(f"Removing {len(matches)} ranges matching the query ({seconds:.1f} s)", 5000)
+
     def _set_history(self, segments: List[Segment]) -> None:
         if self.history_index < len(self.history) - 1:
             self.history = self.history[: self.history_index + 1]
@@ -354,41 +648,38 @@ class MainWindow(QMainWindow):
         except ValueError as exc:
             QMessageBox.warning(self, "Invalid selection", str(exc))
             return
+        source = self.current_path
+        if source.suffix.lower() == ".ltbz":
+            # A container is named after the log it holds: <name>.BIN.ltbz.
+            source = source.with_suffix("")
         dest, _ = QFileDialog.getSaveFileName(
             self,
             "Export As…",
-            str(self.current_path.with_name(self.current_path.stem + "_trimmed.bin")),
+            str(source.with_name(source.stem + "_trimmed.bin")),
             "DataFlash (*.BIN *.bin)",
         )
         if not dest:
             return
 
-        progress = QProgressDialog("Exporting…", "Cancel", 0, 100, self)
-        progress.setWindowTitle("Export")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(0)
+        self.export_queue.submit(
+            self.current_path,
+            Path(dest),
+            self.remove_segments,
+            self.log_info.message_count,
+            self.log_index,
+        )
+        self.statusBar().showMessage(f"Queued export to {Path(dest).name}", 3000)
 
-        exporter = DataFlashExporter(self.current_path)
+    def _on_export_finished(self, destination: str) -> None:
+        self.statusBar().showMessage(f"Trimmed log exported to {destination}", 5000)
 
-        def on_progress(state) -> None:
-            if state.total:
-                progress.setValue(int(state.current / state.total * 100))
-            if progress.wasCanceled():
-                raise RuntimeError("Export canceled")
+    def _on_export_failed(self, destination: str, message: str) -> None:
+        QMessageBox.critical(self, "Export failed", f"Export to {destination} failed: {message}")
 
-        try:
-            exporter.export(
-                Path(dest),
-                self.remove_segments,
-                progress_cb=on_progress,
-                total_messages=self.log_info.message_count,
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("Export failed: %s", exc)
-            QMessageBox.critical(self, "Export failed", f"Export failed: {exc}")
-            return
-        progress.setValue(100)
-        QMessageBox.information(self, "Export complete", "Trimmed log exported successfully.")
+    def closeEvent(self, event) -> None:  # noqa: N802
+        if self.editor_view is not None:
+            self.export_queue.shutdown()
+        super().closeEvent(event)
 
     def _show_diagnostics(self) -> None:
         dialog = DiagnosticsDialog(self.log_file, self)